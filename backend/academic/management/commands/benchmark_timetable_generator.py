@@ -0,0 +1,148 @@
+import math
+from datetime import date, time
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.benchmarking import rolled_back, seed_school, format_table
+from accounts.models import TeacherProfile, User
+from academic.models import Class, ClassRoom, Period, Section, Subject, SubjectAssignment
+from academic.timetable_generator import generate_timetable
+
+
+# (name, periods per week, taught in a shared lab)
+CURRICULUM = [
+    ('Mathematics', 7, False),
+    ('English', 6, False),
+    ('Science', 6, False),
+    ('Social Studies', 5, False),
+    ('Second Language', 5, False),
+    ('Computer Science', 3, True),
+    ('Physical Education', 3, False),
+    ('Art', 2, False),
+]
+
+# Weekly lessons a synthetic teacher is given at most
+TEACHER_LOAD = 30
+SECTIONS_PER_CLASS = 4
+SECTIONS_PER_LAB = 10
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the timetable generator on a synthetic school'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sections', type=int, default=40, help='Sections in the school')
+        parser.add_argument('--periods', type=int, default=7, help='Teaching periods per day')
+        parser.add_argument('--days', type=int, default=6, help='Working days per week')
+        parser.add_argument('--time-budget', type=float, default=30, help='Solver time budget in seconds')
+        parser.add_argument('--seed', type=int, default=42, help='Solver random seed')
+
+    def handle(self, *args, **options):
+        n_sections = options['sections']
+        n_periods = options['periods']
+        days = list(range(1, options['days'] + 1))
+        academic_year = '2025-26'
+        rows = []
+
+        with rolled_back():
+            school, admin, class_obj, section = seed_school('BENCHTT', academic_year)
+            sections = self._seed_sections(school, class_obj, section, n_sections, academic_year)
+            n_lessons = self._seed_curriculum(school, sections, n_periods, academic_year)
+
+            for phase, apply in (('solve', False), ('solve + save', True)):
+                with CaptureQueriesContext(connection) as ctx:
+                    started = perf_counter()
+                    result = generate_timetable(
+                        school, academic_year,
+                        days=days,
+                        time_budget=options['time_budget'],
+                        seed=options['seed'],
+                        apply=apply,
+                        user=admin,
+                    )
+                    elapsed_ms = (perf_counter() - started) * 1000
+
+                stats = result['stats']
+                rows.append([
+                    phase, stats['outcome'], stats['placed'], stats['backtracks'],
+                    stats['restarts'], len(ctx.captured_queries), f'{elapsed_ms:.1f}',
+                ])
+
+        self.stdout.write(
+            f'{n_sections} sections x {len(days)} days x {n_periods} periods '
+            f'({n_lessons} lessons over {len(days) * n_periods} slots per section)'
+        )
+        self.stdout.write(format_table(
+            ['phase', 'outcome', 'placed', 'backtracks', 'restarts', 'queries', 'ms'], rows
+        ))
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(error['message']))
+
+    def _seed_sections(self, school, class_obj, section, n_sections, academic_year):
+        classes = [class_obj] + Class.objects.bulk_create([
+            Class(school=school, name=f'Class {i}', code=f'BC{i:02d}', academic_year=academic_year)
+            for i in range(1, math.ceil(n_sections / SECTIONS_PER_CLASS))
+        ])
+        sections = [section] + Section.objects.bulk_create([
+            Section(
+                school=school,
+                class_obj=classes[i // SECTIONS_PER_CLASS],
+                name=chr(ord('A') + i % SECTIONS_PER_CLASS),
+                code=f'BS{i:03d}'
+            )
+            for i in range(1, n_sections)
+        ])
+        return sections
+
+    def _seed_curriculum(self, school, sections, n_periods, academic_year):
+        Period.objects.bulk_create(
+            [
+                Period(
+                    school=school, name=f'Period {i}', order=i,
+                    start_time=time(8 + i), end_time=time(8 + i, 45)
+                )
+                for i in range(1, n_periods + 1)
+            ]
+            + [Period(school=school, name='Lunch', order=n_periods + 1, start_time=time(12), end_time=time(12, 30), is_break=True)]
+        )
+
+        labs = ClassRoom.objects.bulk_create([
+            ClassRoom(school=school, name=f'Lab {i}')
+            for i in range(math.ceil(len(sections) / SECTIONS_PER_LAB))
+        ])
+
+        assignments = []
+        for number, (name, per_week, in_lab) in enumerate(CURRICULUM):
+            subject = Subject.objects.create(school=school, name=name, code=f'SUB{number}', type='core')
+            sections_per_teacher = max(1, TEACHER_LOAD // per_week)
+            teachers = self._seed_teachers(school, number, math.ceil(len(sections) / sections_per_teacher))
+            for position, section in enumerate(sections):
+                assignments.append(SubjectAssignment(
+                    school=school,
+                    class_obj_id=section.class_obj_id,
+                    section=section,
+                    subject=subject,
+                    teacher=teachers[position // sections_per_teacher],
+                    room=labs[position // SECTIONS_PER_LAB] if in_lab else None,
+                    periods_per_week=per_week,
+                    academic_year=academic_year,
+                ))
+        SubjectAssignment.objects.bulk_create(assignments)
+        return sum(assignment.periods_per_week for assignment in assignments)
+
+    def _seed_teachers(self, school, subject_number, count):
+        users = User.objects.bulk_create([
+            User(
+                username=f'bench_tt_{school.code.lower()}_{subject_number}_{i}',
+                first_name='Teacher',
+                last_name=f'{subject_number}-{i}',
+                role='teacher',
+                school=school,
+            )
+            for i in range(count)
+        ])
+        return TeacherProfile.objects.bulk_create([
+            TeacherProfile(user=user, phone='0000000000', joining_date=date(2025, 4, 1))
+            for user in users
+        ])
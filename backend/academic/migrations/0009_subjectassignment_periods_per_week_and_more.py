@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-17 06:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0008_classroom_timetableentry_room_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subjectassignment',
+            name='periods_per_week',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Teaching periods per week, used by the timetable generator'),
+        ),
+        migrations.AddField(
+            model_name='subjectassignment',
+            name='room',
+            field=models.ForeignKey(blank=True, help_text='Room the subject must be taught in (e.g. a lab); optional', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='subject_assignments', to='academic.classroom'),
+        ),
+    ]
@@ -82,8 +82,17 @@ class Section(TenantAwareModel):
     def __str__(self):
         return f"{self.class_obj.name} - {self.name} - {self.school.name}"
     
+    @staticmethod
+    def with_current_strength(queryset):
+        """Annotate sections with active_student_count so strength checks need no extra query"""
+        return queryset.annotate(
+            active_student_count=models.Count('students', filter=models.Q(students__status='active'))
+        )
+    
     def get_current_strength(self):
         """Get current number of students in this section"""
+        if hasattr(self, 'active_student_count'):
+            return self.active_student_count
         return self.students.filter(status='active').count()
     
     def has_capacity(self):
@@ -161,6 +170,18 @@ class SubjectAssignment(TenantAwareModel):
     )
     academic_year = models.CharField(max_length=10, help_text="e.g., '2024-25'")
     max_marks = models.IntegerField(default=100, help_text="Maximum marks for this specific class assignment")
+    periods_per_week = models.PositiveSmallIntegerField(
+        default=1,
+        help_text="Teaching periods per week, used by the timetable generator"
+    )
+    room = models.ForeignKey(
+        'ClassRoom',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='subject_assignments',
+        help_text="Room the subject must be taught in (e.g. a lab); optional"
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     
     class Meta:
@@ -194,6 +215,8 @@ class SubjectAssignment(TenantAwareModel):
             raise ValidationError('Section must belong to the same school')
         if self.subject.school_id != self.school_id:
             raise ValidationError('Subject must belong to the same school')
+        if self.room_id and self.room.school_id != self.school_id:
+            raise ValidationError('Room must belong to the same school')
 
 
 class ClassRoom(TenantAwareModel):
@@ -329,28 +352,27 @@ class TimetableEntry(TenantAwareModel):
         if self.period.is_break:
             raise ValidationError("Cannot assign class during a break period.")
 
-        # 3. Check Teacher Availability (Conflict Detection)
-        # We need to ensure this teacher isn't assigned to ANOTHER section at the same day + period + year
-        teacher_conflict = TimetableEntry.objects.filter(
-            school=self.school_id,
-            teacher=self.teacher,
-            day_of_week=self.day_of_week,
-            period=self.period,
-            academic_year=self.academic_year
-        ).exclude(pk=self.pk).exists()
+        # 3. Check Teacher and Room Availability (Conflict Detection)
+        # One query loads everything booked in this day + period + year
+        from .timetable import TimetableConflictIndex
+        
+        index = TimetableConflictIndex.load(
+            self.school_id,
+            self.academic_year,
+            exclude_ids=[self.pk] if self.pk else (),
+            day=self.day_of_week,
+            period=self.period_id
+        )
+        conflicts = dict(index.conflicts_for({
+            'day_of_week': self.day_of_week,
+            'period': self.period_id,
+            'teacher': self.teacher_id,
+            'room': self.room_id,
+        }))
 
-        if teacher_conflict:
+        if 'teacher' in conflicts:
             raise ValidationError(f"Teacher {self.teacher.user.get_full_name()} is already assigned to another class for this period.")
 
         # 4. Check Room Availability (Conflict Detection)
-        if self.room:
-            room_conflict = TimetableEntry.objects.filter(
-                school=self.school_id,
-                room=self.room,
-                day_of_week=self.day_of_week,
-                period=self.period,
-                academic_year=self.academic_year
-            ).exclude(pk=self.pk).exists()
-
-            if room_conflict:
-                raise ValidationError(f"Room {self.room.name} is already occupied by another class for this period.")
+        if 'room' in conflicts:
+            raise ValidationError(f"Room {self.room.name} is already occupied by another class for this period.")
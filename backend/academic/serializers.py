@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.db import transaction
 from .models import Class, Section, Subject, SubjectAssignment, Period, TimetableEntry, ClassRoom
 from accounts.models import TeacherProfile
@@ -27,15 +28,17 @@ class ClassSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_sections(self, obj):
-        """Get all sections for this class with teacher and student count info"""
-        from .models import Section
-        sections = Section.objects.filter(class_obj=obj, school=obj.school)
+        """
+        Get all sections for this class with teacher and student count info.
+        Uses the sections prefetched (with strength annotated) by ClassViewSet when present.
+        """
+        sections = obj.sections.all()
         return [{
             'id': s.id, 
             'name': s.name, 
             'code': s.code,
-            'class_teacher': s.class_teacher.id if s.class_teacher else None,
-            'class_teacher_name': s.class_teacher.user.get_full_name() if s.class_teacher else None,
+            'class_teacher': s.class_teacher_id,
+            'class_teacher_name': s.class_teacher.user.get_full_name() if s.class_teacher_id else None,
             'current_strength': s.get_current_strength()
         } for s in sections]
     
@@ -170,13 +173,15 @@ class SubjectAssignmentSerializer(serializers.ModelSerializer):
     section_name = serializers.CharField(source='section.name', read_only=True)
     subject_name = serializers.CharField(source='subject.name', read_only=True)
     teacher_name = serializers.CharField(source='teacher.user.get_full_name', read_only=True)
+    room_name = serializers.CharField(source='room.name', read_only=True, default=None)
     
     class Meta:
         model = SubjectAssignment
         fields = [
             'id', 'class_obj', 'class_name', 'section', 'section_name',
             'subject', 'subject_name', 'teacher', 'teacher_name',
-            'academic_year', 'max_marks', 'status', 'created_at', 'updated_at'
+            'academic_year', 'max_marks', 'periods_per_week', 'room', 'room_name',
+            'status', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
@@ -186,6 +191,11 @@ class SubjectAssignmentSerializer(serializers.ModelSerializer):
         if teacher and teacher.status != 'active':
             raise serializers.ValidationError({"teacher": "Only active teachers can be assigned to subjects"})
         
+        room = attrs.get('room')
+        request = self.context.get('request')
+        if room and request and room.school_id != request.user.school_id:
+            raise serializers.ValidationError({"room": "Room does not belong to your school"})
+        
         # Check for duplicate assignment
         class_obj = attrs.get('class_obj')
         section = attrs.get('section')
@@ -255,3 +265,79 @@ class TimetableEntrySerializer(serializers.ModelSerializer):
         # The CurrentUserDefault/HiddenField usually handles school assignment in ViewSet perform_create
         
         return attrs
+
+
+class TimetableGridSerializer(serializers.Serializer):
+    """Serializer for validating a batch (e.g. a whole week) of timetable entries"""
+    academic_year = serializers.CharField(max_length=10)
+    entries = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False
+    )
+    replace_sections = serializers.BooleanField(
+        default=False,
+        help_text="Treat the entries as the complete week for their sections"
+    )
+    
+    def validate_entries(self, value):
+        required = {'section', 'day_of_week', 'period', 'subject', 'teacher'}
+        for position, entry in enumerate(value):
+            missing = required - entry.keys()
+            if missing:
+                raise serializers.ValidationError(
+                    f"Entry {position} is missing: {', '.join(sorted(missing))}"
+                )
+        return value
+
+
+class TimetableReplaceSerializer(serializers.Serializer):
+    """Serializer for replacing the week of one or more sections in one request"""
+    academic_year = serializers.CharField(max_length=10)
+    entries = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=True
+    )
+    sections = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=list,
+        help_text="Extra sections to cover; a listed section with no entries is cleared"
+    )
+    
+    def validate_entries(self, value):
+        return TimetableGridSerializer().validate_entries(value)
+    
+    def validate(self, attrs):
+        if not attrs['entries'] and not attrs['sections']:
+            raise serializers.ValidationError("Provide entries and/or sections to replace")
+        return attrs
+
+
+class TimetableGenerateSerializer(serializers.Serializer):
+    """Serializer for generating timetables from subject assignments"""
+    academic_year = serializers.CharField(max_length=10)
+    sections = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=list,
+        help_text="Sections to generate; defaults to every section with active assignments"
+    )
+    days = serializers.ListField(
+        child=serializers.ChoiceField(choices=TimetableEntry.DAY_CHOICES),
+        required=False,
+        allow_empty=False,
+        help_text="Working days; defaults to the school-wide setting"
+    )
+    time_budget = serializers.FloatField(required=False, min_value=0.1)
+    seed = serializers.IntegerField(required=False)
+    apply = serializers.BooleanField(
+        default=False,
+        help_text="Save the generated timetable (otherwise it is only returned as a preview)"
+    )
+    
+    def validate_time_budget(self, value):
+        # The solver runs inside the request
+        limit = settings.TIMETABLE_GENERATOR_MAX_TIME_BUDGET
+        if value > limit:
+            raise serializers.ValidationError(f"Ensure this value is less than or equal to {limit:g}.")
+        return value
@@ -1,3 +1,273 @@
-from django.test import TestCase
+from collections import Counter
+from datetime import date, time
+from unittest import mock
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from accounts.models import TeacherProfile, User
+from core.benchmarking import seed_school
+from core.testing import api_client
+from .models import ClassRoom, Period, Section, Subject, SubjectAssignment, TimetableEntry
+from .timetable import TimetableConflictIndex, validate_timetable
+from .timetable_generator import TimetableSolver, generate_timetable
 
-# Create your tests here.
+
+ACADEMIC_YEAR = '2025-26'
+BULK_REPLACE_URL = '/api/v1/timetable/bulk_replace/'
+
+
+def create_teacher(school, username):
+    user = User.objects.create_user(
+        username=username, email=f'{username}@test.local', password=None, role='teacher', school=school
+    )
+    return TeacherProfile.objects.create(user=user, phone='0000000000', joining_date=date(2025, 4, 1))
+
+
+def seed_periods(school, count):
+    return Period.objects.bulk_create([
+        Period(school=school, name=f'Period {i}', order=i, start_time=time(8 + i), end_time=time(8 + i, 45))
+        for i in range(1, count + 1)
+    ])
+
+
+class TimetableConflictIndexTests(SimpleTestCase):
+
+    def test_tracks_each_resource_per_slot(self):
+        index = TimetableConflictIndex()
+        stored = {'section': 1, 'day_of_week': 1, 'period': 1, 'teacher': 10, 'room': 100}
+        index.add(7, stored)
+
+        self.assertEqual(
+            index.conflicts_for({'section': 2, 'day_of_week': 1, 'period': 1, 'teacher': 10, 'room': 100}),
+            [('teacher', 7), ('room', 7)]
+        )
+        self.assertTrue(index.is_free(1, 2, section=1, teacher=10, room=100))
+        self.assertTrue(index.is_free(1, 1, section=2, teacher=11))
+        self.assertEqual(index.occupancy('teacher'), {10: {(1, 1)}})
+
+        index.remove(7, stored)
+        self.assertTrue(index.is_free(1, 1, section=1, teacher=10, room=100))
+
+
+class ValidateTimetableTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section_a = seed_school('TTVALIDATE', ACADEMIC_YEAR)
+        cls.section_b = Section.objects.create(school=cls.school, class_obj=cls.class_obj, name='B', code='C10-B')
+        cls.period, cls.period_2 = seed_periods(cls.school, 2)
+        cls.lunch = Period.objects.create(
+            school=cls.school, name='Lunch', order=9, start_time=time(13), end_time=time(13, 30), is_break=True
+        )
+        cls.subject = Subject.objects.create(school=cls.school, name='Maths', code='MATH', type='core')
+        cls.teacher = create_teacher(cls.school, 'tt_validate_t1')
+        cls.teacher_2 = create_teacher(cls.school, 'tt_validate_t2')
+        cls.lab = ClassRoom.objects.create(school=cls.school, name='Lab', capacity=30)
+        cls.stored = TimetableEntry.objects.create(
+            school=cls.school, class_obj=cls.class_obj, section=cls.section_a, day_of_week=1, period=cls.period,
+            subject=cls.subject, teacher=cls.teacher, room=cls.lab, academic_year=ACADEMIC_YEAR,
+        )
+        other_school = seed_school('TTVALIDATEB', ACADEMIC_YEAR)[0]
+        cls.other_subject = Subject.objects.create(school=other_school, name='Maths', code='MATH', type='core')
+
+    def entry(self, section, teacher, day=1, period=None, **extra):
+        return {
+            'section': section.id, 'teacher': teacher.id, 'day_of_week': day,
+            'period': (period or self.period).id, 'subject': self.subject.id, **extra,
+        }
+
+    def test_reports_every_problem_in_one_pass(self):
+        _, errors = validate_timetable(self.school, ACADEMIC_YEAR, [
+            self.entry(self.section_b, self.teacher),                             # teacher clash with stored
+            self.entry(self.section_b, self.teacher_2, room=self.lab.id),         # room clash with stored
+            self.entry(self.section_b, self.teacher_2, day=2),                    # fine
+            self.entry(self.section_a, self.teacher_2, day=2),                    # clash with entry 2 in batch
+            self.entry(self.section_b, self.teacher_2, period=self.lunch),        # break period
+            self.entry(self.section_b, self.teacher_2, day=3, subject=self.other_subject.id),
+        ])
+
+        self.assertEqual(
+            [(error['entry'], error['field'], error.get('conflicts_with')) for error in errors],
+            [
+                (0, 'teacher', {'id': self.stored.id}),
+                (1, 'room', {'id': self.stored.id}),
+                (3, 'teacher', {'entry': 2}),
+                (4, 'period', None),
+                (5, 'subject', None),
+            ]
+        )
+
+    def test_updating_or_replacing_a_stored_entry_is_not_a_clash(self):
+        moved = self.entry(self.section_a, self.teacher, id=self.stored.id)
+        self.assertEqual(validate_timetable(self.school, ACADEMIC_YEAR, [moved])[1], [])
+
+        week = [self.entry(self.section_a, self.teacher)]
+        self.assertEqual(validate_timetable(self.school, ACADEMIC_YEAR, week, replace_sections=True)[1], [])
+        clashes = validate_timetable(self.school, ACADEMIC_YEAR, week)[1]
+        self.assertEqual([error['field'] for error in clashes], ['section', 'teacher'])
+
+    def test_query_count_does_not_grow_with_batch(self):
+        counts = []
+        for days in (1, 6):
+            batch = [self.entry(self.section_b, self.teacher_2, day=day, period=self.period_2) for day in range(1, days + 1)]
+            with CaptureQueriesContext(connection) as ctx:
+                _, errors = validate_timetable(self.school, ACADEMIC_YEAR, batch)
+            self.assertEqual(errors, [])
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+
+class TimetableReplaceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section = seed_school('TTREPLACE', ACADEMIC_YEAR)
+        cls.period = seed_periods(cls.school, 1)[0]
+        cls.subject = Subject.objects.create(school=cls.school, name='Maths', code='MATH', type='core')
+        cls.teacher = create_teacher(cls.school, 'tt_replace_teacher')
+
+    def payload(self):
+        return {
+            'academic_year': ACADEMIC_YEAR,
+            'entries': [{
+                'section': self.section.id, 'day_of_week': 1, 'period': self.period.id,
+                'subject': self.subject.id, 'teacher': self.teacher.id,
+            }],
+        }
+
+    def test_replace_writes_grid(self):
+        response = api_client(self.admin).post(BULK_REPLACE_URL, self.payload(), format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(TimetableEntry.objects.all_tenants().filter(section=self.section).count(), 1)
+
+    def test_slot_taken_during_replace_is_conflict(self):
+        bulk_create = TimetableEntry.objects.bulk_create
+
+        def concurrent_write_then_bulk_create(*args, **kwargs):
+            # A single-entry create takes the slot after the stored week was read
+            TimetableEntry.objects.create(
+                school=self.school, class_obj=self.class_obj, section=self.section, day_of_week=1,
+                period=self.period, subject=self.subject, teacher=self.teacher, academic_year=ACADEMIC_YEAR,
+            )
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(TimetableEntry.objects, 'bulk_create', side_effect=concurrent_write_then_bulk_create):
+            response = api_client(self.admin).post(BULK_REPLACE_URL, self.payload(), format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(TimetableEntry.objects.all_tenants().filter(section=self.section).exists())
+
+
+class TimetableGenerateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section = seed_school('TTGENERATE', ACADEMIC_YEAR)
+
+    @override_settings(TIMETABLE_GENERATOR_MAX_TIME_BUDGET=20)
+    def test_time_budget_is_capped(self):
+        client = api_client(self.admin)
+        for budget, expected in ((60, 400), (5, 200)):
+            with self.subTest(time_budget=budget):
+                response = client.post(
+                    '/api/v1/timetable/generate/', {'academic_year': ACADEMIC_YEAR, 'time_budget': budget}, format='json'
+                )
+                self.assertEqual(response.status_code, expected, response.data)
+
+    def test_daily_spread_is_relaxed_when_nothing_else_fits(self):
+        period_1, period_2 = seed_periods(self.school, 2)
+        subject = Subject.objects.create(school=self.school, name='Maths', code='MATH', type='core')
+        teacher = create_teacher(self.school, 'tt_generate_teacher')
+        # The teacher's Monday is taken by another section, leaving two Tuesday periods
+        other = Section.objects.create(school=self.school, class_obj=self.class_obj, name='B', code='C10-B')
+        TimetableEntry.objects.bulk_create([
+            TimetableEntry(
+                school=self.school, class_obj=self.class_obj, section=other, day_of_week=1, period=period,
+                subject=subject, teacher=teacher, academic_year=ACADEMIC_YEAR,
+            )
+            for period in (period_1, period_2)
+        ])
+        SubjectAssignment.objects.create(
+            school=self.school, class_obj=self.class_obj, section=self.section, subject=subject, teacher=teacher,
+            periods_per_week=2, academic_year=ACADEMIC_YEAR,
+        )
+
+        result = generate_timetable(self.school, ACADEMIC_YEAR, section_ids=[self.section.id], days=[1, 2], seed=1)
+
+        self.assertTrue(result['complete'], result['errors'])
+        self.assertTrue(result['stats']['spread_relaxed'])
+        self.assertEqual(sorted(entry['day_of_week'] for entry in result['entries']), [2, 2])
+
+
+def week(days, periods):
+    return [(day, period) for day in range(1, days + 1) for period in range(1, periods + 1)]
+
+
+class TimetableSolverTests(SimpleTestCase):
+    # Two sections sharing three teachers; 12 lessons each in a 3x4 week
+    GROUPS = [
+        {'key': f'{section}-{teacher}', 'section': section, 'teacher': teacher, 'count': 4}
+        for section in ('A', 'B') for teacher in ('maths', 'science', 'english')
+    ] + [{'key': 'lab', 'section': 'C', 'teacher': 'science', 'room': 'lab', 'count': 2}]
+
+    def test_solves_a_feasible_week_without_clashes(self):
+        solver = TimetableSolver(week(3, 6), self.GROUPS, occupied={('teacher', 'maths'): [(1, 1)]}, seed=7)
+        outcome, placement = solver.solve(time_budget=5)
+
+        self.assertEqual(outcome, 'solved')
+        groups = {group['key']: group for group in self.GROUPS}
+        booked = Counter()
+        for key, slots in placement.items():
+            group = groups[key]
+            self.assertEqual(len(slots), group['count'])
+            self.assertEqual(len(set(slots)), group['count'])
+            # Spread evenly: at most ceil(4 / 3) lessons a day
+            self.assertLessEqual(max(Counter(day for day, _ in slots).values()), 2)
+            for slot in slots:
+                booked[('section', group['section'], slot)] += 1
+                booked[('teacher', group['teacher'], slot)] += 1
+        self.assertEqual(max(booked.values()), 1)
+        self.assertNotIn((1, 1), placement['A-maths'] + placement['B-maths'])
+
+    def test_over_demanded_teacher_is_reported_before_searching(self):
+        groups = [{'key': 'x', 'section': 'A', 'teacher': 'maths', 'count': 3}]
+        solver = TimetableSolver(week(1, 3), groups, occupied={('teacher', 'maths'): [(1, 2)]})
+
+        self.assertEqual(solver.infeasibilities(), [
+            {'resource': 'teacher', 'id': 'maths', 'required': 3, 'available': 2}
+        ])
+
+    def test_spread_limit_can_be_lifted(self):
+        # Monday is taken, so both lessons only fit on Tuesday
+        groups = [{'key': 'x', 'section': 'A', 'teacher': 'maths', 'count': 2}]
+        occupied = {('teacher', 'maths'): [(1, 1), (1, 2)]}
+
+        self.assertEqual(TimetableSolver(week(2, 2), groups, occupied=occupied).solve(time_budget=5)[0], 'exhausted')
+        outcome, placement = TimetableSolver(week(2, 2), groups, occupied=occupied, spread=False).solve(time_budget=5)
+        self.assertEqual(outcome, 'solved')
+        self.assertEqual(sorted(placement['x']), [(2, 1), (2, 2)])
+
+    def test_impossible_week_is_exhausted(self):
+        # Every resource fits on its own, but the three lessons clash pairwise
+        # (section, teacher, room) and there are only two slots
+        groups = [
+            {'key': 'g1', 'section': 'A', 'teacher': 't1', 'room': 'lab', 'count': 1},
+            {'key': 'g2', 'section': 'A', 'teacher': 't2', 'count': 1},
+            {'key': 'g3', 'section': 'B', 'teacher': 't2', 'room': 'lab', 'count': 1},
+        ]
+        solver = TimetableSolver(week(1, 2), groups, seed=1)
+        self.assertEqual(solver.infeasibilities(), [])
+
+        outcome, placement = solver.solve(time_budget=5)
+
+        self.assertEqual(outcome, 'exhausted')
+        self.assertLess(sum(len(slots) for slots in placement.values()), 3)
+
+    def test_same_seed_gives_the_same_timetable(self):
+        def run(seed):
+            return TimetableSolver(week(5, 6), self.GROUPS, seed=seed).solve(time_budget=5)
+
+        self.assertEqual(run(42), run(42))
+        self.assertNotEqual(run(42)[1], run(43)[1])
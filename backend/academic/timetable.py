@@ -0,0 +1,386 @@
+"""
+Set-based timetable validation.
+
+TimetableConflictIndex holds the teacher, room and section occupancy of a
+school's weekly timetable for one academic year, keyed by (day, period).
+TimetableReferences holds the school's sections, periods, subjects, teachers
+and rooms. Both are loaded with a handful of queries, after which a whole
+weekly grid can be checked in memory and every problem reported at once.
+"""
+from collections import defaultdict
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import School, TeacherProfile
+from core.conditional import bump_versions
+from .models import ClassRoom, Period, Section, Subject, TimetableEntry
+
+
+DAY_NAMES = dict(TimetableEntry.DAY_CHOICES)
+
+ENTRY_FIELDS = ['class_obj', 'section', 'day_of_week', 'period', 'subject', 'teacher', 'room']
+
+
+class TimetableReferences:
+    """Lookup tables for everything a school's timetable entries may point at"""
+
+    def __init__(self, school):
+        self.section_classes = dict(
+            Section.objects.all_tenants().filter(school=school).values_list('id', 'class_obj_id')
+        )
+        self.periods = {
+            period_id: (name, is_break)
+            for period_id, name, is_break in Period.objects.all_tenants().filter(
+                school=school
+            ).values_list('id', 'name', 'is_break')
+        }
+        self.subject_ids = set(
+            Subject.objects.all_tenants().filter(school=school).values_list('id', flat=True)
+        )
+        self.teachers = {
+            teacher_id: f"{first_name} {last_name}".strip()
+            for teacher_id, first_name, last_name in TeacherProfile.objects.filter(
+                user__school=school
+            ).values_list('id', 'user__first_name', 'user__last_name')
+        }
+        self.rooms = dict(
+            ClassRoom.objects.all_tenants().filter(school=school).values_list('id', 'name')
+        )
+
+    def slot_name(self, day, period_id):
+        period_name = self.periods.get(period_id, (f'Period {period_id}', False))[0]
+        return f"{DAY_NAMES.get(day, day)}, {period_name}"
+
+    def errors_for(self, entry):
+        """Tenant and break-period problems with a single normalized entry"""
+        errors = []
+        if entry['section'] not in self.section_classes:
+            errors.append(('section', "Section does not belong to the school."))
+        elif entry['class_obj'] is not None and self.section_classes[entry['section']] != entry['class_obj']:
+            errors.append(('section', "Section does not belong to the given class."))
+        if entry['day_of_week'] not in DAY_NAMES:
+            errors.append(('day_of_week', "Invalid day of week."))
+        if entry['period'] not in self.periods:
+            errors.append(('period', "Period does not belong to the school."))
+        elif self.periods[entry['period']][1]:
+            errors.append(('period', "Cannot assign class during a break period."))
+        if entry['subject'] not in self.subject_ids:
+            errors.append(('subject', "Subject does not belong to the school."))
+        if entry['teacher'] not in self.teachers:
+            errors.append(('teacher', "Teacher does not belong to the school."))
+        if entry['room'] is not None and entry['room'] not in self.rooms:
+            errors.append(('room', "Room does not belong to the school."))
+        return errors
+
+
+class TimetableConflictIndex:
+    """
+    Occupancy of a weekly timetable keyed by (day, period).
+
+    Each slot maps teacher, room and section IDs to the entry holding them.
+    Entries are identified by a key: the row ID for stored entries or any
+    caller-chosen value (e.g. ('new', 3)) for entries being validated.
+    """
+
+    RESOURCES = ('section', 'teacher', 'room')
+
+    def __init__(self):
+        self._slots = defaultdict(lambda: {resource: {} for resource in self.RESOURCES})
+
+    @classmethod
+    def load(cls, school, academic_year, exclude_ids=(), exclude_sections=(), day=None, period=None):
+        """
+        Build an index from stored entries in one query.
+
+        Args:
+            exclude_ids: Entry IDs being updated (their old position must not conflict)
+            exclude_sections: Sections whose stored week is being replaced
+            day, period: Optionally restrict the index to a single slot
+        """
+        entries = TimetableEntry.objects.all_tenants().filter(school=school, academic_year=academic_year)
+        if exclude_ids:
+            entries = entries.exclude(id__in=list(exclude_ids))
+        if exclude_sections:
+            entries = entries.exclude(section_id__in=list(exclude_sections))
+        if day is not None:
+            entries = entries.filter(day_of_week=day)
+        if period is not None:
+            entries = entries.filter(period_id=period)
+
+        index = cls()
+        for entry_id, section_id, day_of_week, period_id, teacher_id, room_id in entries.values_list(
+            'id', 'section_id', 'day_of_week', 'period_id', 'teacher_id', 'room_id'
+        ):
+            index.add(entry_id, {
+                'section': section_id,
+                'day_of_week': day_of_week,
+                'period': period_id,
+                'teacher': teacher_id,
+                'room': room_id,
+            })
+        return index
+
+    def conflicts_for(self, entry):
+        """List of (resource, holder key) pairs already occupying the entry's slot"""
+        slot = self._slots.get((entry['day_of_week'], entry['period']))
+        if slot is None:
+            return []
+        conflicts = []
+        for resource in self.RESOURCES:
+            resource_id = entry.get(resource)
+            if resource_id is not None and resource_id in slot[resource]:
+                conflicts.append((resource, slot[resource][resource_id]))
+        return conflicts
+
+    def add(self, key, entry):
+        slot = self._slots[(entry['day_of_week'], entry['period'])]
+        for resource in self.RESOURCES:
+            resource_id = entry.get(resource)
+            if resource_id is not None:
+                slot[resource].setdefault(resource_id, key)
+
+    def remove(self, key, entry):
+        slot = self._slots.get((entry['day_of_week'], entry['period']))
+        if slot is None:
+            return
+        for resource in self.RESOURCES:
+            resource_id = entry.get(resource)
+            if slot[resource].get(resource_id) == key:
+                del slot[resource][resource_id]
+
+    def is_free(self, day, period, section=None, teacher=None, room=None):
+        return not self.conflicts_for({
+            'day_of_week': day, 'period': period,
+            'section': section, 'teacher': teacher, 'room': room,
+        })
+
+    def occupancy(self, resource):
+        """Map each ID of a resource kind to the (day, period) slots it holds"""
+        occupied = defaultdict(set)
+        for slot, holders in self._slots.items():
+            for resource_id in holders[resource]:
+                occupied[resource_id].add(slot)
+        return occupied
+
+
+def _as_id(value):
+    if value is None or value == '':
+        return None
+    if hasattr(value, 'pk'):
+        return value.pk
+    return int(value)
+
+
+def normalize_entry(data):
+    """Coerce an entry dict (serializer-style field names) to integer IDs"""
+    entry = {field: _as_id(data.get(field)) for field in ENTRY_FIELDS}
+    entry['id'] = _as_id(data.get('id'))
+    return entry
+
+
+def _conflict_message(resource, entry, references):
+    slot = references.slot_name(entry['day_of_week'], entry['period'])
+    if resource == 'teacher':
+        name = references.teachers.get(entry['teacher'], entry['teacher'])
+        return f"Teacher {name} is already assigned to another class for {slot}."
+    if resource == 'room':
+        name = references.rooms.get(entry['room'], entry['room'])
+        return f"Room {name} is already occupied by another class for {slot}."
+    return f"Section already has a class scheduled for {slot}."
+
+
+def validate_timetable(school, academic_year, entries, replace_sections=False, references=None, index=None):
+    """
+    Validate a batch of timetable entries in one pass.
+
+    Every entry is checked for tenant isolation, break periods and
+    teacher/room/section double-booking, both against the stored timetable and
+    against the other entries in the batch.
+
+    Args:
+        school: School the timetable belongs to
+        academic_year: Academic year of the timetable
+        entries: List of entry dicts (serializer field names; 'id' marks an update)
+        replace_sections: Treat the batch as the complete week for its sections,
+            ignoring their stored entries
+        references, index: Preloaded TimetableReferences / TimetableConflictIndex
+
+    Returns:
+        (normalized entries, list of error dicts with 'entry', 'field', 'message'
+        and, for conflicts, 'conflicts_with')
+    """
+    errors = []
+    normalized = []
+    for position, data in enumerate(entries):
+        try:
+            normalized.append(normalize_entry(data))
+        except (TypeError, ValueError):
+            normalized.append(None)
+            errors.append({'entry': position, 'field': None, 'message': "Entry contains an invalid ID."})
+
+    valid = [entry for entry in normalized if entry is not None]
+
+    if references is None:
+        references = TimetableReferences(school)
+    if index is None:
+        index = TimetableConflictIndex.load(
+            school,
+            academic_year,
+            exclude_ids={entry['id'] for entry in valid if entry['id']},
+            exclude_sections={entry['section'] for entry in valid} if replace_sections else (),
+        )
+
+    for position, entry in enumerate(normalized):
+        if entry is None:
+            continue
+
+        entry_errors = references.errors_for(entry)
+        for field, message in entry_errors:
+            errors.append({'entry': position, 'field': field, 'message': message})
+        if entry_errors:
+            continue
+
+        conflicts = index.conflicts_for(entry)
+        for resource, holder in conflicts:
+            conflict = (
+                {'entry': holder[1]} if isinstance(holder, tuple) else {'id': holder}
+            )
+            errors.append({
+                'entry': position,
+                'field': resource,
+                'message': _conflict_message(resource, entry, references),
+                'conflicts_with': conflict,
+            })
+        if not conflicts:
+            index.add(('new', position), entry)
+
+    errors.sort(key=lambda error: error['entry'])
+    return normalized, errors
+
+
+def replace_timetable(school, user, academic_year, entries, section_ids=()):
+    """
+    Make the stored week of one or more sections match a submitted grid.
+
+    The grid is validated as a whole, then diffed against the stored entries
+    of the covered sections by (section, day, period): new slots are inserted,
+    slots whose subject, teacher, room or class changed are updated and slots
+    missing from the grid are deleted - all in one transaction with one bulk
+    statement per kind of change. Nothing is written if any entry is invalid.
+    Validation and the write run under a lock on the school row, so concurrent
+    replaces can't both pass validation against the same stored week.
+
+    Args:
+        school: School the timetable belongs to
+        user: User applying the change (recorded as creator/updater)
+        academic_year: Academic year of the timetable
+        entries: List of entry dicts (serializer field names)
+        section_ids: Additional sections to cover; listing a section with no
+            entries clears its week
+
+    Returns:
+        Dict with created, updated, deleted, unchanged and errors
+
+    Raises:
+        IntegrityError: a single-entry write took one of the slots meanwhile
+    """
+    summary = {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'errors': []}
+
+    covered = set(section_ids)
+    for data in entries:
+        try:
+            covered.add(_as_id(data.get('section')))
+        except (TypeError, ValueError):
+            pass
+    covered.discard(None)
+
+    with transaction.atomic():
+        # Serializes replaces within a school: validation below reads other
+        # sections' entries (teacher and room clashes), so two grids checked
+        # concurrently could each pass and still collide once both are written
+        School.objects.select_for_update().only('id').get(pk=school.pk)
+
+        references = TimetableReferences(school)
+        unknown = sorted(covered - references.section_classes.keys())
+        if unknown:
+            summary['errors'] = [
+                {'entry': None, 'field': 'section', 'message': f"Section {section_id} does not belong to the school."}
+                for section_id in unknown
+            ]
+            return summary
+
+        index = TimetableConflictIndex.load(school, academic_year, exclude_sections=covered)
+        normalized, errors = validate_timetable(
+            school, academic_year, entries, references=references, index=index
+        )
+        if errors:
+            summary['errors'] = errors
+            return summary
+
+        wanted = {}
+        for entry in normalized:
+            if entry['class_obj'] is None:
+                entry['class_obj'] = references.section_classes[entry['section']]
+            wanted[(entry['section'], entry['day_of_week'], entry['period'])] = entry
+
+        stored = TimetableEntry.objects.all_tenants().filter(
+            school=school,
+            academic_year=academic_year,
+            section_id__in=covered
+        ).only('id', 'section_id', 'day_of_week', 'period_id', 'class_obj_id', 'subject_id', 'teacher_id', 'room_id')
+
+        now = timezone.now()
+        to_update = []
+        to_delete = []
+        for row in stored:
+            entry = wanted.pop((row.section_id, row.day_of_week, row.period_id), None)
+            if entry is None:
+                to_delete.append(row.id)
+                continue
+            changed = (
+                (row.class_obj_id, row.subject_id, row.teacher_id, row.room_id)
+                != (entry['class_obj'], entry['subject'], entry['teacher'], entry['room'])
+            )
+            if not changed:
+                summary['unchanged'] += 1
+                continue
+            row.class_obj_id = entry['class_obj']
+            row.subject_id = entry['subject']
+            row.teacher_id = entry['teacher']
+            row.room_id = entry['room']
+            row.updated_by = user
+            row.updated_at = now
+            to_update.append(row)
+
+        to_create = [
+            TimetableEntry(
+                school=school,
+                academic_year=academic_year,
+                class_obj_id=entry['class_obj'],
+                section_id=entry['section'],
+                day_of_week=entry['day_of_week'],
+                period_id=entry['period'],
+                subject_id=entry['subject'],
+                teacher_id=entry['teacher'],
+                room_id=entry['room'],
+                created_by=user,
+            )
+            for entry in wanted.values()
+        ]
+
+        if to_delete:
+            TimetableEntry.objects.all_tenants().filter(id__in=to_delete).delete()
+        if to_update:
+            TimetableEntry.objects.all_tenants().bulk_update(
+                to_update,
+                ['class_obj', 'subject', 'teacher', 'room', 'updated_by', 'updated_at'],
+                batch_size=500
+            )
+        if to_create:
+            TimetableEntry.objects.bulk_create(to_create, batch_size=500)
+        # bulk_create/bulk_update don't send the signals that bump the ETag version
+        bump_versions(school.id, TimetableEntry)
+
+    summary['created'] = len(to_create)
+    summary['updated'] = len(to_update)
+    summary['deleted'] = len(to_delete)
+    return summary
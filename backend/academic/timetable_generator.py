@@ -0,0 +1,465 @@
+"""
+Constraint-solving timetable generator.
+
+Every active SubjectAssignment of the targeted sections becomes a lesson group
+that needs `periods_per_week` distinct teaching slots (non-break periods on
+the working days). A group's section and teacher, and its room when the
+assignment names one, may hold only one lesson per slot, and a subject is
+spread so it takes at most ceil(quota / days) periods on any one day. When no
+timetable meets that spread, the search runs once more without it.
+
+The search places one lesson at a time:
+- variable ordering: most-constrained group first (fewest free slots beyond
+  the lessons it still needs), ties broken towards the most connected group
+- value ordering: days where the subject is thinnest first, then the slot
+  that removes the fewest options from neighbouring groups
+- forward checking: after each placement every group sharing a section,
+  teacher or room must still have enough free slots for its remaining lessons
+- chronological backtracking with randomised restarts, bounded by a time budget
+
+Occupancy is kept as integer bitmasks over the week's slots, so a domain is a
+handful of bitwise operations. Teachers and rooms already booked by sections
+outside the run are loaded from the stored timetable and left untouched.
+"""
+import math
+import random
+from collections import defaultdict
+from time import perf_counter
+from django.conf import settings
+from .models import Period, Section, SubjectAssignment
+from .timetable import TimetableConflictIndex, TimetableReferences, replace_timetable
+
+
+class _LessonGroup:
+    __slots__ = (
+        'key', 'class_obj', 'section', 'subject', 'teacher', 'room', 'count',
+        'resources', 'limit', 'remaining', 'day_counts', 'blocked', 'placed',
+        'neighbours', 'tiebreak',
+    )
+
+    def __init__(self, data, n_days, spread=True):
+        self.key = data['key']
+        self.class_obj = data.get('class_obj')
+        self.section = data['section']
+        self.subject = data.get('subject')
+        self.teacher = data['teacher']
+        self.room = data.get('room')
+        self.count = data['count']
+        self.resources = [('section', self.section), ('teacher', self.teacher)]
+        if self.room is not None:
+            self.resources.append(('room', self.room))
+        self.limit = math.ceil(self.count / n_days) if spread else self.count
+        self.remaining = self.count
+        self.day_counts = [0] * n_days
+        self.blocked = 0
+        self.placed = []
+        self.neighbours = []
+        self.tiebreak = 0.0
+
+
+class TimetableSolver:
+    """
+    Backtracking search for a conflict-free placement of lesson groups.
+
+    Args:
+        slots: Ordered (day, period_id) teaching slots of the week
+        groups: Dicts with key, section, teacher, count and optional
+            class_obj, subject and room
+        occupied: {(resource, id): iterable of (day, period_id)} already taken
+            outside the groups being placed
+        seed: Random seed for tie-breaking and restarts
+        spread: Cap each group at ceil(count / days) lessons a day
+    """
+
+    # Backtracks allowed before the first restart; grows after each restart
+    RESTART_BACKTRACKS = 200
+    RESTART_GROWTH = 1.5
+
+    def __init__(self, slots, groups, occupied=None, seed=None, spread=True):
+        self.slots = list(slots)
+        days = sorted({day for day, _ in self.slots})
+        self.slot_day = [days.index(day) for day, _ in self.slots]
+        self.day_masks = [0] * len(days)
+        for position, day in enumerate(self.slot_day):
+            self.day_masks[day] |= 1 << position
+        self.full = (1 << len(self.slots)) - 1
+
+        self.rng = random.Random(seed)
+        self.groups = [_LessonGroup(data, len(days), spread) for data in groups if data['count'] > 0]
+
+        slot_index = {slot: position for position, slot in enumerate(self.slots)}
+        self.busy = defaultdict(int)
+        for resource_key, taken in (occupied or {}).items():
+            for slot in taken:
+                if slot in slot_index:
+                    self.busy[resource_key] |= 1 << slot_index[slot]
+
+        self.demand = defaultdict(int)
+        by_resource = defaultdict(list)
+        for group in self.groups:
+            for resource_key in group.resources:
+                self.demand[resource_key] += group.count
+                by_resource[resource_key].append(group)
+        for group in self.groups:
+            neighbours = {id(group): group}
+            for resource_key in group.resources:
+                for other in by_resource[resource_key]:
+                    neighbours[id(other)] = other
+            group.neighbours = list(neighbours.values())
+
+        self.placed_count = 0
+        self.best = None
+        self.best_count = -1
+        self.backtracks = 0
+        self.restarts = 0
+
+    def infeasibilities(self):
+        """Resources that need more lessons than they have free slots (no search can fix these)"""
+        problems = []
+        for resource_key, required in self.demand.items():
+            available = (self.full & ~self.busy[resource_key]).bit_count()
+            if required > available:
+                problems.append({
+                    'resource': resource_key[0],
+                    'id': resource_key[1],
+                    'required': required,
+                    'available': available,
+                })
+        return problems
+
+    def domain(self, group):
+        taken = group.blocked
+        for resource_key in group.resources:
+            taken |= self.busy[resource_key]
+        return self.full & ~taken
+
+    def _place(self, group, position):
+        bit = 1 << position
+        for resource_key in group.resources:
+            self.busy[resource_key] |= bit
+            self.demand[resource_key] -= 1
+        day = self.slot_day[position]
+        group.day_counts[day] += 1
+        if group.day_counts[day] == group.limit:
+            group.blocked |= self.day_masks[day]
+        group.remaining -= 1
+        group.placed.append(position)
+        self.placed_count += 1
+
+    def _unplace(self, group, position):
+        bit = 1 << position
+        for resource_key in group.resources:
+            self.busy[resource_key] &= ~bit
+            self.demand[resource_key] += 1
+        day = self.slot_day[position]
+        if group.day_counts[day] == group.limit:
+            group.blocked &= ~self.day_masks[day]
+        group.day_counts[day] -= 1
+        group.remaining += 1
+        group.placed.pop()
+        self.placed_count -= 1
+
+    def _consistent(self, group):
+        """Forward check the resources and groups touched by the last placement"""
+        for resource_key in group.resources:
+            if (self.full & ~self.busy[resource_key]).bit_count() < self.demand[resource_key]:
+                return False
+        for other in group.neighbours:
+            if other.remaining and self.domain(other).bit_count() < other.remaining:
+                return False
+        return True
+
+    def _select(self):
+        best, best_score = None, None
+        for group in self.groups:
+            if not group.remaining:
+                continue
+            score = (
+                self.domain(group).bit_count() - group.remaining,
+                -len(group.neighbours),
+                group.tiebreak,
+            )
+            if best_score is None or score < best_score:
+                best, best_score = group, score
+        return best
+
+    def _candidates(self, group):
+        domain = self.domain(group)
+        neighbour_domains = [
+            self.domain(other) for other in group.neighbours
+            if other is not group and other.remaining
+        ]
+        teacher_busy = self.busy[('teacher', group.teacher)]
+
+        scored = []
+        while domain:
+            low = domain & -domain
+            position = low.bit_length() - 1
+            domain ^= low
+            day = self.slot_day[position]
+            scored.append((
+                group.day_counts[day],
+                sum(1 for other_domain in neighbour_domains if other_domain & low),
+                (teacher_busy & self.day_masks[day]).bit_count(),
+                self.rng.random(),
+                position,
+            ))
+        scored.sort()
+        return [item[-1] for item in scored]
+
+    def _remember_best(self):
+        if self.placed_count > self.best_count:
+            self.best_count = self.placed_count
+            self.best = {id(group): list(group.placed) for group in self.groups}
+
+    def _reset(self):
+        for group in self.groups:
+            while group.placed:
+                self._unplace(group, group.placed[-1])
+            group.tiebreak = self.rng.random()
+
+    def _search(self, deadline, backtrack_limit):
+        """Depth-first search; returns 'solved', 'exhausted', 'restart' or 'timeout'"""
+        stack = []
+        backtracks = 0
+        while True:
+            if perf_counter() > deadline:
+                self._remember_best()
+                return 'timeout'
+
+            group = self._select()
+            if group is None:
+                return 'solved'
+            # frame: group, ordered candidate slots, next candidate, slot currently held
+            stack.append([group, self._candidates(group), 0, None])
+
+            advanced = False
+            while stack:
+                frame = stack[-1]
+                group, candidates = frame[0], frame[1]
+                if frame[3] is not None:
+                    self._unplace(group, frame[3])
+                    frame[3] = None
+                while frame[2] < len(candidates):
+                    position = candidates[frame[2]]
+                    frame[2] += 1
+                    self._place(group, position)
+                    if self._consistent(group):
+                        frame[3] = position
+                        advanced = True
+                        break
+                    self._unplace(group, position)
+                if advanced:
+                    break
+
+                self._remember_best()
+                stack.pop()
+                self.backtracks += 1
+                backtracks += 1
+                if backtracks > backtrack_limit:
+                    return 'restart'
+
+            if not advanced:
+                return 'exhausted'
+
+    def solve(self, time_budget):
+        """
+        Search until every lesson is placed, the search space is exhausted or
+        the time budget (seconds) runs out.
+
+        Returns:
+            (outcome, {group key: [(day, period_id), ...]}) where outcome is
+            'solved', 'exhausted' or 'timeout'; unsolved runs return the
+            largest partial placement found
+        """
+        deadline = perf_counter() + time_budget
+        backtrack_limit = self.RESTART_BACKTRACKS
+        for group in self.groups:
+            group.tiebreak = self.rng.random()
+
+        while True:
+            outcome = self._search(deadline, backtrack_limit)
+            if outcome != 'restart':
+                break
+            self.restarts += 1
+            backtrack_limit = int(backtrack_limit * self.RESTART_GROWTH)
+            self._reset()
+
+        if outcome == 'solved':
+            placement = {id(group): group.placed for group in self.groups}
+        else:
+            placement = self.best or {}
+
+        return outcome, {
+            group.key: [self.slots[position] for position in placement.get(id(group), [])]
+            for group in self.groups
+        }
+
+
+def _resource_names(school):
+    """Display names of sections, teachers and rooms, for error messages"""
+    references = TimetableReferences(school)
+    sections = {
+        section_id: f"{class_name} {name}"
+        for section_id, class_name, name in Section.objects.all_tenants().filter(
+            school=school
+        ).values_list('id', 'class_obj__name', 'name')
+    }
+    return {
+        'section': sections,
+        'teacher': references.teachers,
+        'room': references.rooms,
+    }
+
+
+def generate_timetable(school, academic_year, section_ids=None, days=None, time_budget=None,
+                       seed=None, apply=False, user=None):
+    """
+    Generate a conflict-free weekly timetable from the school's subject assignments.
+
+    Args:
+        school: School to generate for
+        academic_year: Academic year of the assignments and timetable
+        section_ids: Sections to (re)generate; defaults to every section with
+            active assignments. Stored entries of other sections are kept and
+            their teachers and rooms treated as busy.
+        days: Working days (1=Monday .. 7=Sunday); defaults to
+            settings.TIMETABLE_WORKING_DAYS
+        time_budget: Search time limit in seconds; defaults to
+            settings.TIMETABLE_GENERATOR_TIME_BUDGET
+        seed: Random seed, for reproducible runs
+        apply: Write the result with replace_timetable() when complete
+        user: User recorded on written entries (required with apply)
+
+    Returns:
+        Dict with complete, entries, unplaced, errors, stats and, when
+        applied, the created/updated/deleted/unchanged counts. stats.spread_relaxed
+        is set when no timetable kept the daily spread limit and the search
+        was rerun without it.
+    """
+    days = sorted(set(days or settings.TIMETABLE_WORKING_DAYS))
+    time_budget = time_budget or settings.TIMETABLE_GENERATOR_TIME_BUDGET
+    started = perf_counter()
+
+    assignments = SubjectAssignment.objects.all_tenants().filter(
+        school=school,
+        academic_year=academic_year,
+        status='active',
+        teacher__status='active',
+        periods_per_week__gt=0
+    )
+    if section_ids:
+        assignments = assignments.filter(section_id__in=list(section_ids))
+    groups = [
+        {
+            'key': assignment_id, 'class_obj': class_id, 'section': section_id,
+            'subject': subject_id, 'teacher': teacher_id, 'room': room_id, 'count': count,
+        }
+        for assignment_id, class_id, section_id, subject_id, teacher_id, room_id, count
+        in assignments.order_by('id').values_list(
+            'id', 'class_obj_id', 'section_id', 'subject_id', 'teacher_id', 'room_id', 'periods_per_week'
+        )
+    ]
+    targets = set(section_ids or ()) | {group['section'] for group in groups}
+
+    periods = list(
+        Period.objects.all_tenants().filter(school=school, is_break=False).order_by('order').values_list('id', flat=True)
+    )
+    slots = [(day, period_id) for day in days for period_id in periods]
+
+    index = TimetableConflictIndex.load(school, academic_year, exclude_sections=targets)
+    occupied = {}
+    for resource in ('teacher', 'room'):
+        for resource_id, taken in index.occupancy(resource).items():
+            occupied[(resource, resource_id)] = taken
+
+    solver = TimetableSolver(slots, groups, occupied=occupied, seed=seed)
+    result = {
+        'complete': False,
+        'entries': [],
+        'unplaced': [],
+        'errors': [],
+        'stats': {
+            'sections': len(targets),
+            'assignments': len(solver.groups),
+            'lessons': sum(group.count for group in solver.groups),
+            'slots_per_week': len(slots),
+            'placed': 0,
+            'backtracks': 0,
+            'restarts': 0,
+            'outcome': None,
+            'spread_relaxed': False,
+            'elapsed_ms': 0,
+        },
+    }
+
+    problems = solver.infeasibilities()
+    if not slots:
+        result['errors'].append({'message': "The school has no teaching periods on the selected days."})
+    elif problems:
+        names = _resource_names(school)
+        for problem in problems:
+            name = names[problem['resource']].get(problem['id']) or problem['id']
+            result['errors'].append({
+                **problem,
+                'message': (
+                    f"{problem['resource'].capitalize()} {name} needs {problem['required']} "
+                    f"periods a week but only {problem['available']} are free."
+                ),
+            })
+
+    if not result['errors']:
+        outcome, placement = solver.solve(time_budget)
+        backtracks, restarts = solver.backtracks, solver.restarts
+        if outcome == 'exhausted':
+            # That only rules out timetables within the daily spread limit
+            solver = TimetableSolver(slots, groups, occupied=occupied, seed=seed, spread=False)
+            outcome, placement = solver.solve(max(time_budget - (perf_counter() - started), 0))
+            backtracks += solver.backtracks
+            restarts += solver.restarts
+            result['stats']['spread_relaxed'] = True
+        for group in solver.groups:
+            for day, period_id in placement[group.key]:
+                result['entries'].append({
+                    'class_obj': group.class_obj,
+                    'section': group.section,
+                    'day_of_week': day,
+                    'period': period_id,
+                    'subject': group.subject,
+                    'teacher': group.teacher,
+                    'room': group.room,
+                })
+            missing = group.count - len(placement[group.key])
+            if missing:
+                result['unplaced'].append({
+                    'assignment': group.key,
+                    'section': group.section,
+                    'subject': group.subject,
+                    'teacher': group.teacher,
+                    'missing': missing,
+                })
+        result['complete'] = outcome == 'solved'
+        result['stats'].update(
+            placed=len(result['entries']),
+            backtracks=backtracks,
+            restarts=restarts,
+            outcome=outcome,
+        )
+        if outcome == 'exhausted':
+            result['errors'].append({'message': "No conflict-free timetable exists for these assignments."})
+        elif outcome == 'timeout':
+            result['errors'].append({
+                'message': f"Time budget of {time_budget}s ran out with {len(result['unplaced'])} assignments incomplete."
+            })
+
+    result['stats']['elapsed_ms'] = round((perf_counter() - started) * 1000, 1)
+
+    if apply and result['complete']:
+        applied = replace_timetable(
+            school, user, academic_year, result['entries'], section_ids=targets
+        )
+        result['errors'] = applied.pop('errors')
+        result['complete'] = not result['errors']
+        result.update(applied)
+
+    return result
@@ -1,20 +1,36 @@
+from core.authentication import ClaimsReadMixin
+from core.conditional import ConditionalGetMixin
 from core.views import TenantMixin
-from rest_framework import viewsets, filters
+from django.db import IntegrityError
+from django.db.models import Prefetch
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from accounts.permissions import IsAdmin, IsAdminOrReadOnly
+from accounts.models import User
+from students.models import StudentProfile
 from .models import Class, Section, Subject, SubjectAssignment, Period, TimetableEntry, ClassRoom
-from .serializers import ClassSerializer, SectionSerializer, SubjectSerializer, SubjectAssignmentSerializer, PeriodSerializer, TimetableEntrySerializer, ClassRoomSerializer
+from .serializers import ClassSerializer, SectionSerializer, SubjectSerializer, SubjectAssignmentSerializer, PeriodSerializer, TimetableEntrySerializer, ClassRoomSerializer, TimetableGridSerializer, TimetableReplaceSerializer, TimetableGenerateSerializer
+from .timetable import replace_timetable, validate_timetable
+from .timetable_generator import generate_timetable
 import logging
 
 logger = logging.getLogger(__name__)
 
+# A single-entry write took a slot while a whole grid was being replaced
+TIMETABLE_CHANGED_MESSAGE = 'The timetable was changed by another request. Reload it and try again.'
 
-class ClassViewSet(TenantMixin, viewsets.ModelViewSet):
+
+class ClassViewSet(ConditionalGetMixin, ClaimsReadMixin, TenantMixin, viewsets.ModelViewSet):
     """
     ViewSet for Class management
     List, Create, Retrieve, Update, Delete classes
+    Reads authenticate from token claims and answer conditional GETs with 304.
     """
     queryset = Class.objects.all()
+    # Sections carry class teacher names (User) and current strength
+    version_models = [Class, Section, User, StudentProfile]
     serializer_class = ClassSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'code', 'academic_year']
@@ -28,7 +44,12 @@ class ClassViewSet(TenantMixin, viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
-        queryset = Class.objects.all()
+        sections = Section.with_current_strength(
+            Section.objects.all_tenants().select_related('class_teacher__user')
+        )
+        queryset = Class.objects.select_related('class_teacher__user').prefetch_related(
+            Prefetch('sections', queryset=sections)
+        )
         
         # Super admin sees all (TenantManager handles this via TenantContext)
         # Note: If TenantContext is set to None (Super Admin), we see all.
@@ -75,7 +96,9 @@ class SectionViewSet(TenantMixin, viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
-        queryset = Section.objects.select_related('class_obj').all()
+        queryset = Section.with_current_strength(
+            Section.objects.select_related('class_obj', 'class_teacher__user')
+        )
         
         # Filter by class
         class_id = self.request.query_params.get('class_id')
@@ -101,11 +124,13 @@ class SectionViewSet(TenantMixin, viewsets.ModelViewSet):
         serializer.save(updated_by=self.request.user)
 
 
-class SubjectViewSet(TenantMixin, viewsets.ModelViewSet):
+class SubjectViewSet(ConditionalGetMixin, ClaimsReadMixin, TenantMixin, viewsets.ModelViewSet):
     """
     ViewSet for Subject management
+    Reads authenticate from token claims and answer conditional GETs with 304.
     """
     queryset = Subject.objects.all()
+    version_models = [Subject]
     serializer_class = SubjectSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'code']
@@ -149,7 +174,7 @@ class SubjectAssignmentViewSet(TenantMixin, viewsets.ModelViewSet):
     ViewSet for SubjectAssignment management
     """
     queryset = SubjectAssignment.objects.select_related(
-        'class_obj', 'section', 'subject', 'teacher', 'teacher__user'
+        'class_obj', 'section', 'subject', 'teacher', 'teacher__user', 'room'
     ).all()
     serializer_class = SubjectAssignmentSerializer
     filter_backends = [filters.OrderingFilter]
@@ -164,7 +189,7 @@ class SubjectAssignmentViewSet(TenantMixin, viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         queryset = SubjectAssignment.objects.select_related(
-            'class_obj', 'section', 'subject', 'teacher', 'teacher__user'
+            'class_obj', 'section', 'subject', 'teacher', 'teacher__user', 'room'
         ).all()
         
         # Filter by class
@@ -210,11 +235,13 @@ class SubjectAssignmentViewSet(TenantMixin, viewsets.ModelViewSet):
         serializer.save(updated_by=self.request.user)
 
 
-class PeriodViewSet(TenantMixin, viewsets.ModelViewSet):
+class PeriodViewSet(ConditionalGetMixin, ClaimsReadMixin, TenantMixin, viewsets.ModelViewSet):
     """
     ViewSet for Period management
+    Reads authenticate from token claims and answer conditional GETs with 304.
     """
     queryset = Period.objects.all()
+    version_models = [Period]
     serializer_class = PeriodSerializer
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['order']
@@ -267,12 +294,15 @@ class ClassRoomViewSet(TenantMixin, viewsets.ModelViewSet):
         serializer.save(updated_by=self.request.user)
 
 
-class TimetableEntryViewSet(TenantMixin, viewsets.ModelViewSet):
+class TimetableEntryViewSet(ConditionalGetMixin, ClaimsReadMixin, TenantMixin, viewsets.ModelViewSet):
     """
     ViewSet for Timetable management
+    Reads authenticate from token claims (no user query) and answer
+    conditional GETs with 304.
     """
+    version_models = [TimetableEntry, Class, Section, Subject, Period, ClassRoom, User]
     queryset = TimetableEntry.objects.select_related(
-        'class_obj', 'section', 'subject', 'teacher', 'teacher__user', 'period'
+        'class_obj', 'section', 'subject', 'teacher', 'teacher__user', 'period', 'room'
     ).all()
     serializer_class = TimetableEntrySerializer
     filter_backends = [filters.OrderingFilter]
@@ -280,13 +310,13 @@ class TimetableEntryViewSet(TenantMixin, viewsets.ModelViewSet):
     ordering = ['day_of_week', 'period__order']
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'validate', 'bulk_replace', 'generate']:
             return [IsAdmin()]
         return [IsAuthenticated()]
     
     def get_queryset(self):
         queryset = TimetableEntry.objects.select_related(
-            'class_obj', 'section', 'subject', 'teacher', 'teacher__user', 'period'
+            'class_obj', 'section', 'subject', 'teacher', 'teacher__user', 'period', 'room'
         ).all()
         
         # Filter by class
@@ -331,4 +361,93 @@ class TimetableEntryViewSet(TenantMixin, viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(updated_by=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def validate(self, request):
+        """
+        Check a batch of entries (up to a whole school week) and report every conflict
+        POST /api/v1/timetable/validate/
+        """
+        serializer = TimetableGridSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        _, errors = validate_timetable(
+            request.user.school,
+            data['academic_year'],
+            data['entries'],
+            replace_sections=data['replace_sections']
+        )
+        
+        return Response({
+            'valid': not errors,
+            'checked': len(data['entries']),
+            'errors': errors
+        })
 
+    @action(detail=False, methods=['post'])
+    def bulk_replace(self, request):
+        """
+        Replace the weekly timetable of one or more sections with a submitted grid
+        POST /api/v1/timetable/bulk_replace/
+        """
+        serializer = TimetableReplaceSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        try:
+            result = replace_timetable(
+                request.user.school,
+                request.user,
+                data['academic_year'],
+                data['entries'],
+                section_ids=data['sections']
+            )
+        except IntegrityError:
+            return Response({'error': TIMETABLE_CHANGED_MESSAGE}, status=status.HTTP_409_CONFLICT)
+        
+        if result['errors']:
+            return Response({'errors': result['errors']}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': 'Timetable replaced successfully',
+            'created': result['created'],
+            'updated': result['updated'],
+            'deleted': result['deleted'],
+            'unchanged': result['unchanged']
+        })
+
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """
+        Generate a conflict-free timetable from subject assignments (preview, or save with apply=true)
+        POST /api/v1/timetable/generate/
+        """
+        serializer = TimetableGenerateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        try:
+            result = generate_timetable(
+                request.user.school,
+                data['academic_year'],
+                section_ids=data['sections'],
+                days=data.get('days'),
+                time_budget=data.get('time_budget'),
+                seed=data.get('seed'),
+                apply=data['apply'],
+                user=request.user
+            )
+        except IntegrityError:
+            return Response({'error': TIMETABLE_CHANGED_MESSAGE}, status=status.HTTP_409_CONFLICT)
+        
+        if data['apply'] and not result['complete']:
+            return Response({
+                'errors': result['errors'],
+                'unplaced': result['unplaced'],
+                'stats': result['stats']
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result)
@@ -1,6 +1,6 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Case, IntegerField, Q, Value, When
 
 User = get_user_model()
 
@@ -8,22 +8,34 @@ class EmailBackend(ModelBackend):
     """
     Custom authentication backend that allows authenticating with either
     username or email.
+    
+    The user, their school and teacher profile are loaded with one query
+    (served by the case-insensitive username/email indexes), so the login
+    view can check teacher status and build its response without more queries.
     """
     def authenticate(self, request, username=None, password=None, **kwargs):
         if username is None:
             username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        
+        # Check if username is an email or username; prefer a username match
+        # if one user's username is another user's email
+        user = User.objects.select_related('school', 'teacher_profile').filter(
+            Q(username__iexact=username) | Q(email__iexact=username)
+        ).order_by(
+            Case(
+                When(username__iexact=username, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            ),
+            'pk'
+        ).first()
         
-        try:
-            # Check if username is an email or username
-            user = User.objects.get(Q(username__iexact=username) | Q(email__iexact=username))
-        except User.DoesNotExist:
+        if user is None:
             # Run the default password hasher to prevent timing attacks
             User().set_password(password)
             return None
-        except User.MultipleObjectsReturned:
-            # Handle multiple users with same email if necessary
-            # (Email should be unique in our model)
-            user = User.objects.filter(Q(username__iexact=username) | Q(email__iexact=username)).first()
         
         if user.check_password(password) and self.user_can_authenticate(user):
             return user
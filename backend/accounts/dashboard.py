@@ -0,0 +1,91 @@
+"""
+Dashboard statistics with a per-school cache.
+
+Stats are cached for settings.DASHBOARD_STATS_CACHE_TTL seconds and dropped
+early by the signals in accounts.signals whenever a counted model changes.
+"""
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+SYSTEM_STATS_KEY = 'dashboard_stats:system'
+
+
+def _school_stats_key(school_id):
+    # Keyed by day so "Today Attendance" never outlives its date
+    return f'dashboard_stats:school:{school_id}:{date.today().isoformat()}'
+
+
+def _build_system_stats():
+    from students.models import StudentProfile
+    from .models import School, TeacherProfile
+    
+    total_schools = School.objects.count()
+    total_students = StudentProfile.objects.count()
+    total_teachers = TeacherProfile.objects.count()
+    active_schools = School.objects.filter(status='active').count()
+    
+    return [
+        {'title': 'Total Schools', 'value': total_schools, 'icon': 'building', 'change': 0},
+        {'title': 'Active Schools', 'value': active_schools, 'icon': 'check-circle', 'change': 0},
+        {'title': 'Total Students', 'value': total_students, 'icon': 'users', 'change': 0},
+        {'title': 'Total Teachers', 'value': total_teachers, 'icon': 'graduation-cap', 'change': 0},
+    ]
+
+
+def _build_school_stats(school):
+    from students.models import StudentProfile
+    from academic.models import Class
+    from attendance.models import DailyAttendanceSummary
+    from attendance.services import summarise_daily_summaries
+    from .models import User
+    
+    # Real counts
+    total_students = StudentProfile.objects.filter(school=school, status='active').count()
+    total_teachers = User.objects.filter(school=school, role='teacher', is_active=True).count()
+    total_classes = Class.objects.filter(school=school, status='active').count()
+    
+    # Today's attendance percentage from the per-section daily rollup
+    today_totals = summarise_daily_summaries(
+        DailyAttendanceSummary.objects.filter(school=school, date=date.today())
+    )
+    
+    if today_totals['total_marked'] > 0:
+        attendance_rate = f"{today_totals['attendance_percentage']}%"
+    else:
+        attendance_rate = "No data"
+    
+    return [
+        {'title': 'Total Students', 'value': total_students, 'icon': 'users', 'change': 0},
+        {'title': 'Total Teachers', 'value': total_teachers, 'icon': 'graduation-cap', 'change': 0},
+        {'title': 'Today Attendance', 'value': attendance_rate, 'icon': 'clipboard-check', 'change': 0},
+        {'title': 'Active Classes', 'value': total_classes, 'icon': 'building', 'change': 0},
+    ]
+
+
+def get_system_stats():
+    """System-wide stats for super admins"""
+    return cache.get_or_set(
+        SYSTEM_STATS_KEY, _build_system_stats, settings.DASHBOARD_STATS_CACHE_TTL
+    )
+
+
+def get_school_stats(school):
+    """School-specific stats for admins and teachers"""
+    return cache.get_or_set(
+        _school_stats_key(school.id),
+        lambda: _build_school_stats(school),
+        settings.DASHBOARD_STATS_CACHE_TTL
+    )
+
+
+def invalidate_dashboard_stats(school_id=None):
+    """
+    Drop cached stats for a school and the system-wide totals.
+    Deferred until commit so a concurrent request can't re-cache pre-commit counts.
+    """
+    keys = [SYSTEM_STATS_KEY]
+    if school_id:
+        keys.append(_school_stats_key(school_id))
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from settings.PASSWORD_HASH_ITERATIONS
+    (0 keeps Django's default).
+
+    Uses the same algorithm name as Django's hasher, so existing hashes keep
+    verifying; a hash made with a different iteration count is upgraded on the
+    user's next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', 0) or PBKDF2PasswordHasher.iterations
@@ -0,0 +1,154 @@
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from time import perf_counter
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+from accounts.hashers import ConfigurablePBKDF2PasswordHasher
+from accounts.models import School, TeacherProfile, User
+from accounts.views import CustomTokenObtainPairView
+from core.benchmarking import seed_school, format_table
+
+
+SCHOOL_CODE = 'BENCHLOGIN'
+USERNAME_PREFIX = 'bench_login_'
+PASSWORD = 'Bench-login-password-1'
+
+
+def _percentile(samples, percent):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the login endpoint: queries per login, password hash cost and '
+        'p50/p99 latency under concurrent logins, for each PBKDF2 iteration budget. '
+        'Seeds (and afterwards deletes) committed users, since the concurrent '
+        'logins run on their own database connections.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=str,
+            default=str(settings.PASSWORD_HASH_ITERATIONS),
+            help='Comma-separated PBKDF2 iteration budgets to compare (0 = Django default)',
+        )
+        parser.add_argument('--users', type=int, default=40, help='Users to seed (half of them teachers)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent login workers')
+        parser.add_argument('--logins', type=int, default=200, help='Logins per iteration budget')
+
+    def handle(self, *args, **options):
+        budgets = [int(b) for b in options['iterations'].split(',') if b.strip()]
+        concurrency = max(1, options['concurrency'])
+        rows = []
+
+        self._cleanup()
+        try:
+            usernames = self._seed(options['users'])
+            for budget in budgets:
+                with override_settings(PASSWORD_HASH_ITERATIONS=budget):
+                    rows.append(self._run(budget, usernames, concurrency, options['logins']))
+        finally:
+            self._cleanup()
+
+        self.stdout.write(
+            f'{len(usernames)} users, {options["logins"]} logins per budget, {concurrency} concurrent workers'
+        )
+        self.stdout.write(format_table(
+            ['iterations', 'hash ms', 'queries (ok)', 'queries (bad pw)',
+             'p50 ms', 'p99 ms', 'logins/s', 'errors'],
+            rows
+        ))
+
+    def _run(self, budget, usernames, concurrency, logins):
+        encoded = make_password(PASSWORD)
+        User.objects.filter(username__in=usernames).update(password=encoded)
+
+        hash_times = []
+        for _ in range(5):
+            started = perf_counter()
+            check_password(PASSWORD, encoded)
+            hash_times.append((perf_counter() - started) * 1000)
+
+        with CaptureQueriesContext(connection) as ok_ctx:
+            self._login(usernames[-1], PASSWORD)
+        with CaptureQueriesContext(connection) as bad_ctx:
+            self._login(usernames[-1], PASSWORD + 'x')
+
+        # Alternate username and (mixed-case) email logins across the seeded users
+        credentials = [
+            usernames[i % len(usernames)] if i % 2 else f'{usernames[i % len(usernames)]}@Bench.Local'
+            for i in range(logins)
+        ]
+        chunks = [credentials[i::concurrency] for i in range(concurrency)]
+
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(self._login_many, chunks))
+        elapsed = perf_counter() - started
+
+        latencies = [ms for chunk_latencies, _ in results for ms in chunk_latencies]
+        errors = sum(chunk_errors for _, chunk_errors in results)
+
+        return [
+            budget or f'{ConfigurablePBKDF2PasswordHasher().iterations} (default)',
+            f'{statistics.median(hash_times):.1f}',
+            len(ok_ctx.captured_queries),
+            len(bad_ctx.captured_queries),
+            f'{_percentile(latencies, 50):.1f}',
+            f'{_percentile(latencies, 99):.1f}',
+            f'{len(latencies) / elapsed:.1f}',
+            errors,
+        ]
+
+    def _login(self, username, password):
+        request = APIRequestFactory().post(
+            '/api/v1/auth/login/', {'username': username, 'password': password}, format='json'
+        )
+        # Without throttling, which would otherwise cap anonymous logins
+        return CustomTokenObtainPairView.as_view(throttle_classes=[])(request)
+
+    def _login_many(self, usernames):
+        latencies, errors = [], 0
+        try:
+            for username in usernames:
+                started = perf_counter()
+                response = self._login(username, PASSWORD)
+                latencies.append((perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+        finally:
+            # Each worker thread has its own connection
+            connection.close()
+        return latencies, errors
+
+    def _seed(self, count):
+        school, admin, class_obj, section = seed_school(SCHOOL_CODE)
+        users = User.objects.bulk_create([
+            User(
+                username=f'{USERNAME_PREFIX}{i}',
+                email=f'{USERNAME_PREFIX}{i}@bench.local',
+                first_name='Bench',
+                last_name=str(i),
+                role='teacher' if i % 2 else 'admin',
+                school=school,
+            )
+            for i in range(count)
+        ])
+        TeacherProfile.objects.bulk_create([
+            TeacherProfile(user=user, phone='0000000000', joining_date=date(2025, 4, 1))
+            for user in users if user.role == 'teacher'
+        ])
+        return [user.username for user in users]
+
+    def _cleanup(self):
+        TeacherProfile.objects.filter(user__username__startswith=USERNAME_PREFIX).delete()
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        User.objects.filter(username=f'bench_admin_{SCHOOL_CODE.lower()}').delete()
+        School.objects.filter(code=SCHOOL_CODE).delete()
@@ -1,6 +1,7 @@
 import uuid
 from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
 from django.db import models
+from django.db.models.functions import Upper
 from core.models import AuditModel, TimeStampedModel
 
 
@@ -59,6 +60,9 @@ class User(AbstractUser):
         indexes = [
             models.Index(fields=['email']),
             models.Index(fields=['username']),
+            # Case-insensitive login lookups (username__iexact / email__iexact)
+            models.Index(Upper('username'), name='users_username_upper_idx'),
+            models.Index(Upper('email'), name='users_email_upper_idx'),
             models.Index(fields=['role']),
             models.Index(fields=['is_active']),
             models.Index(fields=['school']),
@@ -64,6 +64,31 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'date_joined']
 
 
+class LoginSchoolSerializer(serializers.ModelSerializer):
+    """School summary returned with the login response"""
+    
+    class Meta:
+        model = School
+        fields = ['id', 'name', 'code', 'logo', 'status']
+
+
+class LoginUserSerializer(serializers.ModelSerializer):
+    """
+    User returned with the login response: identity, role and a school summary.
+    The full profile (including school details) comes from /auth/me/.
+    """
+    school = LoginSchoolSerializer(read_only=True)
+    teacher_profile_id = serializers.IntegerField(source='teacher_profile.id', read_only=True, required=False)
+    
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'email', 'first_name', 'last_name', 'role',
+            'school', 'is_active', 'date_joined', 'teacher_profile_id'
+        ]
+        read_only_fields = fields
+
+
 class LoginSerializer(serializers.Serializer):
     """Serializer for login endpoint"""
     username = serializers.CharField(required=True)
@@ -0,0 +1,38 @@
+"""
+Invalidate cached dashboard stats when a counted model is written, and cached
+request tenants when a school is.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from academic.models import Class
+from attendance.models import Attendance
+from students.models import StudentProfile
+from core.tenant import invalidate_cached_school
+from .dashboard import invalidate_dashboard_stats
+from .models import School, TeacherProfile, User
+
+
+@receiver([post_save, post_delete], sender=StudentProfile)
+@receiver([post_save, post_delete], sender=Class)
+@receiver([post_save, post_delete], sender=Attendance)
+def invalidate_school_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard_stats(instance.school_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_school_dashboard_for_user(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login; they must not flush the cache they are about to read
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_dashboard_stats(instance.school_id)
+
+
+@receiver([post_save, post_delete], sender=School)
+def invalidate_school_dashboard_for_school(sender, instance, **kwargs):
+    invalidate_dashboard_stats(instance.id)
+    invalidate_cached_school(instance.id)
+
+
+@receiver([post_save, post_delete], sender=TeacherProfile)
+def invalidate_system_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard_stats()
@@ -1,3 +1,107 @@
+from datetime import date
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from core.benchmarking import seed_school, seed_students
+from attendance.services import bulk_mark_attendance
+from students.models import StudentProfile
+from .backends import EmailBackend
+from .dashboard import get_school_stats
+from .models import User
 
-# Create your tests here.
+
+class DashboardStatsCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section = seed_school('DASHCACHE')
+        cls.students = seed_students(cls.school, cls.class_obj, cls.section, 2)
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self):
+        return {stat['title']: stat['value'] for stat in get_school_stats(self.school)}
+
+    def test_cached_stats_are_served_without_queries(self):
+        self.stats()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.stats()['Total Students'], 2)
+
+    def test_new_student_invalidates_on_commit(self):
+        self.assertEqual(self.stats()['Total Students'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentProfile.objects.create(
+                school=self.school, admission_number='DASH-NEW', first_name='New', last_name='Student',
+                date_of_birth=date(2010, 1, 1), gender='female', phone='8000000000', address='Street',
+                city='City', state='State', pincode='000000', admission_date=date(2025, 4, 1),
+                class_obj=self.class_obj, section=self.section,
+            )
+
+        self.assertEqual(self.stats()['Total Students'], 3)
+
+    def test_bulk_marked_attendance_invalidates(self):
+        self.assertEqual(self.stats()['Today Attendance'], 'No data')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_mark_attendance(
+                self.school, self.admin, date.today(), self.class_obj.id, self.section.id,
+                [{'student_id': self.students[0].id, 'status': 'present'},
+                 {'student_id': self.students[1].id, 'status': 'absent'}]
+            )
+
+        self.assertEqual(self.stats()['Today Attendance'], '50.0%')
+
+    def test_login_does_not_invalidate(self):
+        self.stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.last_login = timezone.now()
+            self.admin.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(
+                username='dash_teacher', email='', password=None, role='teacher', school=self.school
+            )
+        self.assertEqual(self.stats()['Total Teachers'], 1)
+
+
+class EmailBackendTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school('LOGINS')[0]
+        cls.user = User.objects.create_user(
+            username='Login_User', email='login@test.local', password='secret-pass', role='teacher', school=cls.school
+        )
+        # Another user whose username is the first user's email
+        cls.shadow = User.objects.create_user(
+            username='login@test.local', email='', password='shadow-pass', role='teacher', school=cls.school
+        )
+
+    def authenticate(self, username, password):
+        return EmailBackend().authenticate(None, username=username, password=password)
+
+    def test_login_by_username_or_email_is_one_query(self):
+        self.shadow.delete()
+        for username in ('LOGIN_user', 'Login@Test.local'):
+            with self.subTest(username=username), self.assertNumQueries(1):
+                user = self.authenticate(username, 'secret-pass')
+                self.assertEqual(user, self.user)
+                # School and teacher profile come with the user
+                self.assertEqual(user.school, self.school)
+                with self.assertRaises(User.teacher_profile.RelatedObjectDoesNotExist):
+                    user.teacher_profile
+
+    def test_username_match_wins_over_email_match(self):
+        self.assertEqual(self.authenticate('login@test.local', 'shadow-pass'), self.shadow)
+        self.assertIsNone(self.authenticate('login@test.local', 'secret-pass'))
+
+    def test_failed_login_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.authenticate('nobody', 'secret-pass'))
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.authenticate('login_user', 'wrong-pass'))
@@ -5,16 +5,17 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
+from core.authentication import TenantRefreshToken
 from django.contrib.auth import authenticate
 from .models import User, School, TeacherProfile
 from .serializers import (
-    UserSerializer, LoginSerializer, TeacherRegistrationSerializer,
+    UserSerializer, LoginSerializer, LoginUserSerializer, TeacherRegistrationSerializer,
     TeacherProfileSerializer, TeacherCreateSerializer, SchoolSerializer,
     PublicSchoolSerializer, SchoolAdminRegistrationSerializer, OTPVerifySerializer,
     SchoolOnboardingSerializer
 )
 from .permissions import IsAdmin, IsActiveTeacher, IsSuperAdmin
-from students.models import StudentProfile
+from .dashboard import get_school_stats, get_system_stats
 from .models import User, School, TeacherProfile, OTPVerification
 from django.utils import timezone
 from datetime import timedelta
@@ -25,13 +26,17 @@ from django.conf import settings
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
-    """Custom login view with teacher status validation"""
+    """
+    Custom login view with teacher status validation.
+    EmailBackend loads the user with their school and teacher profile, so the
+    checks and the response below need no further queries.
+    """
     
     def post(self, request, *args, **kwargs):
         username = request.data.get('username')
         password = request.data.get('password')
         
-        user = authenticate(username=username, password=password)
+        user = authenticate(request, username=username, password=password)
         
         if user is None:
             return Response(
@@ -68,12 +73,12 @@ class CustomTokenObtainPairView(TokenObtainPairView):
                 )
         
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = TenantRefreshToken.for_user(user)
         
         return Response({
             'access': str(refresh.access_token),
             'refresh': str(refresh),
-            'user': UserSerializer(user).data
+            'user': LoginUserSerializer(user).data
         })
 
 
@@ -131,7 +136,7 @@ class TeacherViewSet(viewsets.ModelViewSet):
     - Approve/reject teachers (admin only)
     - View pending registrations (admin only)
     """
-    queryset = TeacherProfile.objects.select_related('user').all()
+    queryset = TeacherProfile.objects.select_related('user', 'user__school').prefetch_related('subjects').all()
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -145,7 +150,7 @@ class TeacherViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
-        queryset = TeacherProfile.objects.select_related('user').all()
+        queryset = TeacherProfile.objects.select_related('user', 'user__school').prefetch_related('subjects').all()
         
         # Super admin sees all teachers
         if user.is_super_admin():
@@ -334,56 +339,11 @@ class DashboardStatsView(APIView):
         
         if user.role == 'super_admin' or user.is_superuser:
             # System-wide stats for super admin
-            from students.models import StudentProfile
-            
-            total_schools = School.objects.count()
-            total_students = StudentProfile.objects.count()
-            total_teachers = TeacherProfile.objects.count()
-            active_schools = School.objects.filter(status='active').count()
-            
-            return Response({
-                'stats': [
-                    {'title': 'Total Schools', 'value': total_schools, 'icon': 'building', 'change': 0},
-                    {'title': 'Active Schools', 'value': active_schools, 'icon': 'check-circle', 'change': 0},
-                    {'title': 'Total Students', 'value': total_students, 'icon': 'users', 'change': 0},
-                    {'title': 'Total Teachers', 'value': total_teachers, 'icon': 'graduation-cap', 'change': 0},
-                ]
-            })
+            return Response({'stats': get_system_stats()})
         
         elif user.school:
             # School-specific stats for admin/teacher
-            from students.models import StudentProfile
-            from academic.models import Class
-            from attendance.models import Attendance
-            from datetime import date
-            
-            school = user.school
-            
-            # Real counts
-            total_students = StudentProfile.objects.filter(school=school, status='active').count()
-            total_teachers = User.objects.filter(school=school, role='teacher', is_active=True).count()
-            total_classes = Class.objects.filter(school=school, status='active').count()
-            
-            # Calculate today's attendance percentage
-            today = date.today()
-            today_attendance = Attendance.objects.filter(school=school, date=today)
-            total_marked = today_attendance.count()
-            
-            if total_marked > 0:
-                present_count = today_attendance.filter(status__in=['present', 'late']).count()
-                attendance_percentage = round((present_count / total_marked) * 100, 1)
-                attendance_rate = f"{attendance_percentage}%"
-            else:
-                attendance_rate = "No data"
-            
-            return Response({
-                'stats': [
-                    {'title': 'Total Students', 'value': total_students, 'icon': 'users', 'change': 0},
-                    {'title': 'Total Teachers', 'value': total_teachers, 'icon': 'graduation-cap', 'change': 0},
-                    {'title': 'Today Attendance', 'value': attendance_rate, 'icon': 'clipboard-check', 'change': 0},
-                    {'title': 'Active Classes', 'value': total_classes, 'icon': 'building', 'change': 0},
-                ]
-            })
+            return Response({'stats': get_school_stats(user.school)})
         
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
 
@@ -420,6 +380,8 @@ def register_school_admin(request):
                 'expires_at': timezone.now() + timedelta(minutes=10)
             }
         )
+        # Queued in the outbox; delivered by the drain_email_outbox worker
+        send_otp_email(existing_user.email, otp_code, existing_user.get_full_name() or existing_user.username)
         return Response({
             'message': 'Account exists but not verified. Use OTP: 123456',
             'email': existing_user.email,
@@ -445,6 +407,8 @@ def register_school_admin(request):
         user.is_email_verified = False
         user.save()
         
+        send_otp_email(user.email, otp_code, user.get_full_name() or user.username)
+        
         return Response({
             'message': 'Registration successful. Use OTP: 123456 to verify.',
             'email': user.email,
@@ -464,7 +428,7 @@ def verify_otp(request):
     user = User.objects.filter(email=email).first()
     
     if user and user.is_email_verified:
-        refresh = RefreshToken.for_user(user)
+        refresh = TenantRefreshToken.for_user(user)
         return Response({
             'message': 'Email already verified',
             'access': str(refresh.access_token),
@@ -487,7 +451,7 @@ def verify_otp(request):
         user.save()
         
         # Generate Token for auto-login
-        refresh = RefreshToken.for_user(user)
+        refresh = TenantRefreshToken.for_user(user)
         
         return Response({
             'message': 'Email verified successfully',
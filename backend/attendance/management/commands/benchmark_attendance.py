@@ -0,0 +1,61 @@
+from datetime import date
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.benchmarking import rolled_back, seed_school, seed_students, format_table
+from attendance.services import bulk_mark_attendance
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bulk attendance marking (query count and latency per roster size)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default='10,50,200,1000',
+            help='Comma-separated roster sizes to benchmark',
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        rows = []
+
+        with rolled_back():
+            school, admin, class_obj, section = seed_school('BENCHATT')
+            seeded = 0
+
+            for size in sizes:
+                if size > seeded:
+                    seed_students(school, class_obj, section, size - seeded, start=seeded)
+                    seeded = size
+
+                student_ids = list(
+                    section.students.order_by('id').values_list('id', flat=True)[:size]
+                )
+                records = [{'student_id': sid, 'status': 'present'} for sid in student_ids]
+                attendance_date = date(2025, 6, size % 28 + 1)
+
+                # First submission inserts, second one updates every row
+                for phase in ('insert', 'update'):
+                    with CaptureQueriesContext(connection) as ctx:
+                        started = perf_counter()
+                        result = bulk_mark_attendance(
+                            school=school,
+                            user=admin,
+                            attendance_date=attendance_date,
+                            class_id=class_obj.id,
+                            section_id=section.id,
+                            records=records,
+                        )
+                        elapsed_ms = (perf_counter() - started) * 1000
+
+                    rows.append([
+                        size, phase, len(ctx.captured_queries),
+                        result['created'], result['updated'], f'{elapsed_ms:.1f}',
+                    ])
+
+        self.stdout.write(format_table(
+            ['roster', 'phase', 'queries', 'created', 'updated', 'ms'], rows
+        ))
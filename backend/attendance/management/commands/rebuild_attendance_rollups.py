@@ -0,0 +1,28 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import School
+from attendance.services import rebuild_daily_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily attendance rollup (DailyAttendanceSummary) from raw attendance'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school', type=str, help='School code (default: all schools)')
+        parser.add_argument('--date-from', type=date.fromisoformat, help='First date to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--date-to', type=date.fromisoformat, help='Last date to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        school = None
+        if options['school']:
+            try:
+                school = School.objects.get(code=options['school'])
+            except School.DoesNotExist:
+                raise CommandError(f"School with code {options['school']} not found")
+
+        written = rebuild_daily_summaries(
+            school=school,
+            date_from=options['date_from'],
+            date_to=options['date_to'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} daily attendance summaries'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.14 on 2026-10-17 05:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0008_classroom_timetableentry_room_and_more'),
+        ('accounts', '0005_alter_school_created_by_alter_school_updated_by'),
+        ('attendance', '0004_staffattendance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('late', models.PositiveIntegerField(default=0)),
+                ('leave', models.PositiveIntegerField(default=0)),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance_summaries', to='academic.class')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance_summaries', to='accounts.school')),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance_summaries', to='academic.section')),
+            ],
+            options={
+                'verbose_name': 'Daily Attendance Summary',
+                'verbose_name_plural': 'Daily Attendance Summaries',
+                'db_table': 'daily_attendance_summaries',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['school', 'date'], name='daily_atten_school__82331d_idx')],
+                'unique_together': {('school', 'date', 'class_obj', 'section')},
+            },
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.db import models
-from core.models import TenantAwareModel
+from core.models import TenantAwareModel, TimeStampedModel
 
 
 class Attendance(TenantAwareModel):
@@ -105,3 +105,48 @@ class StaffAttendance(TenantAwareModel):
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.date} ({self.get_status_display()}) - {self.school.name}"
+
+
+class DailyAttendanceSummary(TimeStampedModel):
+    """
+    Per-day, per-section attendance counts - Multi-tenant rollup of Attendance.
+    Maintained by attendance.services.refresh_daily_summaries and rebuilt with
+    ``manage.py rebuild_attendance_rollups``.
+    """
+    school = models.ForeignKey(
+        'accounts.School',
+        on_delete=models.CASCADE,
+        related_name='daily_attendance_summaries'
+    )
+    date = models.DateField()
+    class_obj = models.ForeignKey(
+        'academic.Class',
+        on_delete=models.CASCADE,
+        related_name='daily_attendance_summaries'
+    )
+    section = models.ForeignKey(
+        'academic.Section',
+        on_delete=models.CASCADE,
+        related_name='daily_attendance_summaries'
+    )
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    leave = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'daily_attendance_summaries'
+        verbose_name = 'Daily Attendance Summary'
+        verbose_name_plural = 'Daily Attendance Summaries'
+        unique_together = [('school', 'date', 'class_obj', 'section')]
+        indexes = [
+            models.Index(fields=['school', 'date']),
+        ]
+        ordering = ['-date']
+    
+    @property
+    def total(self):
+        return self.present + self.absent + self.late + self.leave
+    
+    def __str__(self):
+        return f"{self.date} - {self.section} ({self.present}/{self.total} present)"
@@ -24,6 +24,15 @@ class AttendanceSerializer(serializers.ModelSerializer):
         return value
 
 
+class AttendanceHistorySerializer(serializers.ModelSerializer):
+    """Slim attendance row for a single student's history (student details sent once)"""
+    
+    class Meta:
+        model = Attendance
+        fields = ['id', 'date', 'status', 'remarks', 'class_obj', 'section']
+        read_only_fields = fields
+
+
 class BulkAttendanceSerializer(serializers.Serializer):
     """Serializer for bulk attendance marking"""
     date = serializers.DateField()
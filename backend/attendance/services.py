@@ -0,0 +1,252 @@
+"""
+Set-based attendance operations.
+Keeps the number of queries per submission constant regardless of roster size.
+"""
+from datetime import date
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from accounts.dashboard import invalidate_dashboard_stats
+from students.models import StudentProfile
+from .models import Attendance, DailyAttendanceSummary
+
+
+ATTENDANCE_UPSERT_FIELDS = [
+    'class_obj', 'section', 'status', 'remarks',
+    'marked_by', 'updated_by', 'updated_at',
+]
+
+STATUS_COUNTS = {
+    status: Count('id', filter=Q(status=status))
+    for status in ('present', 'absent', 'late', 'leave')
+}
+
+SUMMARY_UPSERT_FIELDS = ['present', 'absent', 'late', 'leave', 'updated_at']
+
+
+def bulk_mark_attendance(school, user, attendance_date, class_id, section_id, records):
+    """
+    Mark attendance for a whole roster in a fixed number of queries.
+
+    1. Validate every student ID against the school in one query
+    2. Look up which students already have a record for the date in one query
+    3. Upsert every row with a single INSERT ... ON CONFLICT on (school, student, date)
+    4. Refresh the affected daily rollup rows
+
+    Args:
+        school: School the attendance belongs to
+        user: User marking the attendance
+        attendance_date: Date being marked
+        class_id: Class ID for the roster
+        section_id: Section ID for the roster
+        records: List of dicts with student_id, status and optional remarks
+
+    Returns:
+        Dict with created, updated and errors (same shape as the API payload)
+    """
+    errors = []
+
+    # Last record wins when a student is submitted twice in one payload
+    records_by_student = {}
+    for record in records:
+        records_by_student[record['student_id']] = record
+
+    valid_ids = set(
+        StudentProfile.objects.filter(
+            id__in=list(records_by_student.keys()),
+            school=school
+        ).values_list('id', flat=True)
+    )
+
+    rows = []
+    for student_id, record in records_by_student.items():
+        if student_id not in valid_ids:
+            errors.append(f"Student with ID {student_id} not found")
+            continue
+
+        rows.append(Attendance(
+            school=school,
+            student_id=student_id,
+            date=attendance_date,
+            class_obj_id=class_id,
+            section_id=section_id,
+            status=record['status'],
+            remarks=record.get('remarks', ''),
+            marked_by=user,
+            updated_by=user,
+            created_by=user,
+        ))
+
+    if not rows:
+        return {'created': 0, 'updated': 0, 'errors': errors}
+
+    existing = Attendance.objects.filter(
+        school=school,
+        date=attendance_date,
+        student_id__in=[row.student_id for row in rows]
+    ).values_list('student_id', 'class_obj_id', 'section_id')
+    
+    existing_ids = set()
+    # Rows moving out of another section must be taken off that section's rollup
+    buckets = {(attendance_date, class_id, section_id)}
+    for student_id, old_class_id, old_section_id in existing:
+        existing_ids.add(student_id)
+        buckets.add((attendance_date, old_class_id, old_section_id))
+
+    try:
+        with transaction.atomic():
+            Attendance.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['school', 'student', 'date'],
+                update_fields=ATTENDANCE_UPSERT_FIELDS,
+            )
+            # bulk_create bypasses the post_save rollup and dashboard signals
+            refresh_daily_summaries(school.id, buckets)
+            invalidate_dashboard_stats(school.id)
+    except Exception as e:
+        errors.append(f"Error saving attendance: {str(e)}")
+        return {'created': 0, 'updated': 0, 'errors': errors}
+
+    updated_count = len(existing_ids)
+    return {
+        'created': len(rows) - updated_count,
+        'updated': updated_count,
+        'errors': errors,
+    }
+
+
+def attendance_summary(queryset):
+    """
+    Status counts for an attendance queryset in one conditional-aggregate query.
+
+    Returns:
+        Dict shaped like AttendanceStatsSerializer
+    """
+    counts = queryset.order_by().aggregate(
+        total_days=Count('id'),
+        present_days=Count('id', filter=Q(status='present')),
+        absent_days=Count('id', filter=Q(status='absent')),
+        late_days=Count('id', filter=Q(status='late')),
+        leave_days=Count('id', filter=Q(status='leave')),
+    )
+
+    total = counts['total_days']
+    percentage = (counts['present_days'] / total * 100) if total > 0 else 0
+    counts['attendance_percentage'] = round(percentage, 2)
+    return counts
+
+
+def refresh_daily_summaries(school_id, buckets):
+    """
+    Recount the DailyAttendanceSummary rows for the given buckets.
+
+    Each bucket is a (date, class_id, section_id) tuple. The counts for all
+    buckets come from one grouped query over the (school, date, class, section)
+    index and are written with one upsert; buckets left without attendance
+    are deleted.
+    """
+    buckets = {
+        (date.fromisoformat(d) if isinstance(d, str) else d, c, s)
+        for d, c, s in buckets if d and c and s
+    }
+    if not buckets:
+        return
+
+    grouped = Attendance.objects.all_tenants().filter(
+        school_id=school_id,
+        date__in={d for d, _, _ in buckets},
+        section_id__in={s for _, _, s in buckets},
+    ).order_by().values('date', 'class_obj_id', 'section_id').annotate(**STATUS_COUNTS)
+
+    summaries = []
+    for row in grouped:
+        bucket = (row['date'], row['class_obj_id'], row['section_id'])
+        if bucket not in buckets:
+            continue
+        buckets.discard(bucket)
+        summaries.append(DailyAttendanceSummary(
+            school_id=school_id,
+            date=row['date'],
+            class_obj_id=row['class_obj_id'],
+            section_id=row['section_id'],
+            present=row['present'],
+            absent=row['absent'],
+            late=row['late'],
+            leave=row['leave'],
+        ))
+
+    if summaries:
+        DailyAttendanceSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['school', 'date', 'class_obj', 'section'],
+            update_fields=SUMMARY_UPSERT_FIELDS,
+        )
+
+    if buckets:
+        DailyAttendanceSummary.objects.filter(school_id=school_id).filter(reduce(or_, (
+            Q(date=d, class_obj_id=c, section_id=s) for d, c, s in buckets
+        ))).delete()
+
+
+def rebuild_daily_summaries(school=None, date_from=None, date_to=None, batch_size=1000):
+    """
+    Recompute DailyAttendanceSummary rows from scratch for a school and/or date range.
+
+    Returns:
+        Number of summary rows written
+    """
+    attendance = Attendance.objects.all_tenants()
+    summaries = DailyAttendanceSummary.objects.all()
+
+    if school:
+        attendance = attendance.filter(school=school)
+        summaries = summaries.filter(school=school)
+    if date_from:
+        attendance = attendance.filter(date__gte=date_from)
+        summaries = summaries.filter(date__gte=date_from)
+    if date_to:
+        attendance = attendance.filter(date__lte=date_to)
+        summaries = summaries.filter(date__lte=date_to)
+
+    grouped = attendance.order_by().values(
+        'school_id', 'date', 'class_obj_id', 'section_id'
+    ).annotate(**STATUS_COUNTS)
+
+    written = 0
+    with transaction.atomic():
+        summaries.delete()
+
+        batch = []
+        for row in grouped.iterator(chunk_size=batch_size):
+            batch.append(DailyAttendanceSummary(**row))
+            if len(batch) >= batch_size:
+                DailyAttendanceSummary.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            DailyAttendanceSummary.objects.bulk_create(batch)
+            written += len(batch)
+
+    return written
+
+
+def summarise_daily_summaries(queryset):
+    """
+    Totals over a DailyAttendanceSummary queryset in one aggregate query.
+    Late arrivals count as attended, as on the dashboard.
+    """
+    totals = queryset.order_by().aggregate(
+        present=Sum('present', default=0),
+        absent=Sum('absent', default=0),
+        late=Sum('late', default=0),
+        leave=Sum('leave', default=0),
+    )
+
+    total = sum(totals.values())
+    attended = totals['present'] + totals['late']
+    totals['total_marked'] = total
+    totals['attendance_percentage'] = round(attended / total * 100, 1) if total else None
+    return totals
@@ -0,0 +1,33 @@
+"""
+Keep DailyAttendanceSummary in step with single-row Attendance writes
+(AttendanceViewSet, admin, shell). Bulk marking refreshes the rollup itself,
+and QuerySet.update() bypasses signals - run rebuild_attendance_rollups after
+such writes.
+"""
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import Attendance
+from .services import refresh_daily_summaries
+
+
+def _bucket(instance):
+    # Read straight from __dict__ so deferred fields are never loaded here
+    values = instance.__dict__
+    return (values.get('date'), values.get('class_obj_id'), values.get('section_id'))
+
+
+@receiver(post_init, sender=Attendance)
+def remember_attendance_bucket(sender, instance, **kwargs):
+    instance._rollup_bucket = _bucket(instance)
+
+
+@receiver(post_save, sender=Attendance)
+def refresh_attendance_rollup_on_save(sender, instance, **kwargs):
+    buckets = {_bucket(instance), instance._rollup_bucket}
+    refresh_daily_summaries(instance.school_id, buckets)
+    instance._rollup_bucket = _bucket(instance)
+
+
+@receiver(post_delete, sender=Attendance)
+def refresh_attendance_rollup_on_delete(sender, instance, **kwargs):
+    refresh_daily_summaries(instance.school_id, {instance._rollup_bucket, _bucket(instance)})
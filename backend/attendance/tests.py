@@ -1,3 +1,142 @@
+from datetime import date
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from accounts.models import TeacherProfile, User
+from academic.models import Section
+from core.benchmarking import seed_school, seed_students
+from core.testing import api_client
+from .models import Attendance, DailyAttendanceSummary
+from .services import bulk_mark_attendance
 
-# Create your tests here.
+
+def create_user(school, username, role):
+    user = User.objects.create_user(
+        username=username, email=f'{username}@test.local', password=None, role=role, school=school
+    )
+    if role == 'teacher':
+        TeacherProfile.objects.create(user=user, phone='0000000000', joining_date=date(2025, 4, 1))
+    return user
+
+
+class AttendanceStatisticsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section = seed_school('ATTSTATS')
+        cls.teacher = create_user(cls.school, 'stats_teacher', 'teacher')
+        cls.student = create_user(cls.school, 'stats_student', 'student')
+        cls.parent = create_user(cls.school, 'stats_parent', 'parent')
+
+    def test_staff_only(self):
+        url = reverse('attendance-statistics')
+        for user, expected in ((self.admin, 200), (self.teacher, 200), (self.student, 403), (self.parent, 403)):
+            with self.subTest(role=user.role):
+                self.assertEqual(api_client(user).get(url).status_code, expected)
+
+    def test_malformed_parameters_are_rejected(self):
+        client = api_client(self.admin)
+        url = reverse('attendance-statistics')
+        for params in ({'date_from': 'yesterday'}, {'date_to': '2026-02-30'}, {'class_id': 'abc'}):
+            with self.subTest(params=params):
+                self.assertEqual(client.get(url, params).status_code, 400)
+
+        response = client.get(url, {'date_from': '2026-01-01', 'date_to': '2026-01-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['date_from'], date(2026, 1, 1))
+
+
+class BulkMarkAttendanceTests(TestCase):
+    DATE = date(2025, 9, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section = seed_school('ATTUPSERT')
+        cls.section_b = Section.objects.create(school=cls.school, class_obj=cls.class_obj, name='B', code='C10-B')
+        cls.students = seed_students(cls.school, cls.class_obj, cls.section, 30)
+
+    def mark(self, records, section=None):
+        section = section or self.section
+        return bulk_mark_attendance(self.school, self.admin, self.DATE, self.class_obj.id, section.id, records)
+
+    def rollup(self, section):
+        summary = DailyAttendanceSummary.objects.get(school=self.school, date=self.DATE, section=section)
+        return summary.present, summary.absent, summary.late, summary.leave
+
+    def test_resubmission_updates_in_place(self):
+        first = self.mark([{'student_id': s.id, 'status': 'present'} for s in self.students[:4]])
+        self.assertEqual(first, {'created': 4, 'updated': 0, 'errors': []})
+
+        second = self.mark([
+            {'student_id': self.students[0].id, 'status': 'present'},
+            # The last entry for a student in one payload wins
+            {'student_id': self.students[0].id, 'status': 'late', 'remarks': 'Bus'},
+            {'student_id': self.students[1].id, 'status': 'absent'},
+            {'student_id': self.students[4].id, 'status': 'leave'},
+            {'student_id': 999999, 'status': 'present'},
+        ])
+
+        self.assertEqual(second, {'created': 1, 'updated': 2, 'errors': ['Student with ID 999999 not found']})
+        records = dict(Attendance.objects.filter(school=self.school, date=self.DATE).values_list('student_id', 'status'))
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[self.students[0].id], 'late')
+        self.assertEqual(records[self.students[1].id], 'absent')
+        self.assertEqual(self.rollup(self.section), (2, 1, 1, 1))
+
+    def test_moving_section_updates_both_rollups(self):
+        self.mark([{'student_id': s.id, 'status': 'present'} for s in self.students[:3]])
+
+        self.mark([{'student_id': self.students[0].id, 'status': 'absent'}], section=self.section_b)
+
+        self.assertEqual(self.rollup(self.section), (2, 0, 0, 0))
+        self.assertEqual(self.rollup(self.section_b), (0, 1, 0, 0))
+
+    def test_query_count_does_not_grow_with_roster(self):
+        counts = []
+        for students in (self.students[:5], self.students[5:30]):
+            with CaptureQueriesContext(connection) as ctx:
+                result = self.mark([{'student_id': s.id, 'status': 'present'} for s in students])
+            self.assertEqual(result['created'], len(students))
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+
+class StudentAttendanceHistoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section = seed_school('ATTHISTORY')
+        cls.student = seed_students(cls.school, cls.class_obj, cls.section, 1)[0]
+        other_school, _, other_class, other_section = seed_school('ATTHISTORYB')
+        cls.other_student = seed_students(other_school, other_class, other_section, 1)[0]
+        for day, status in ((1, 'present'), (2, 'present'), (3, 'absent'), (4, 'late'), (30, 'leave')):
+            bulk_mark_attendance(
+                cls.school, cls.admin, date(2025, 9, day), cls.class_obj.id, cls.section.id,
+                [{'student_id': cls.student.id, 'status': status}]
+            )
+
+    def history(self, student, **params):
+        url = reverse('student-attendance-history', args=[student.id])
+        return api_client(self.admin).get(url, params)
+
+    def test_summary_counts_every_status_in_range(self):
+        response = self.history(self.student, date_from='2025-09-01', date_to='2025-09-10')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['student']['id'], self.student.id)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual([record['date'] for record in response.data['records']][:2], ['2025-09-04', '2025-09-03'])
+        self.assertEqual(response.data['summary'], {
+            'total_days': 4, 'present_days': 2, 'absent_days': 1, 'late_days': 1, 'leave_days': 0,
+            'attendance_percentage': 50.0,
+        })
+
+    def test_empty_range_has_zero_percentage(self):
+        response = self.history(self.student, date_from='2025-10-01', date_to='2025-10-31')
+        self.assertEqual(response.data['summary']['total_days'], 0)
+        self.assertEqual(response.data['summary']['attendance_percentage'], 0)
+
+    def test_student_of_another_school_is_not_found(self):
+        self.assertEqual(self.history(self.other_student).status_code, 404)
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     AttendanceViewSet, mark_attendance, get_students_for_marking, 
-    student_attendance_history, mark_staff_attendance, StaffAttendanceViewSet
+    student_attendance_history, attendance_statistics, mark_staff_attendance, StaffAttendanceViewSet
 )
 
 router = DefaultRouter()
@@ -13,6 +13,7 @@ urlpatterns = [
     path('attendance/mark/', mark_attendance, name='mark-attendance'),
     path('attendance/students/', get_students_for_marking, name='students-for-marking'),
     path('attendance/student/<int:student_id>/', student_attendance_history, name='student-attendance-history'),
+    path('attendance/statistics/', attendance_statistics, name='attendance-statistics'),
     path('attendance/staff-mark/', mark_staff_attendance, name='mark-staff-attendance'),
     path('', include(router.urls)),
 ]
@@ -2,13 +2,36 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
 from accounts.permissions import IsAdmin, IsActiveTeacher
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum
+from django.utils.dateparse import parse_date
 from datetime import date, timedelta
 from academic.models import Section
 from students.models import StudentProfile
-from .models import Attendance, StaffAttendance
-from .serializers import AttendanceSerializer, BulkAttendanceSerializer, AttendanceStatsSerializer, StaffAttendanceSerializer
+from .models import Attendance, DailyAttendanceSummary, StaffAttendance
+from .serializers import AttendanceSerializer, AttendanceHistorySerializer, BulkAttendanceSerializer, AttendanceStatsSerializer, StaffAttendanceSerializer
+from .services import attendance_summary, bulk_mark_attendance, summarise_daily_summaries
+
+
+def _date_param(request, name, default=None):
+    """
+    Query parameter as a date (``default`` if absent).
+    Raises ValueError for anything that isn't a valid YYYY-MM-DD date.
+    """
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(name)
+    return parsed
+
+
+def _id_param(request, name):
+    """Optional integer ID query parameter; raises ValueError if malformed"""
+    value = request.query_params.get(name)
+    return int(value) if value else None
 
 
 @api_view(['POST'])
@@ -34,8 +57,8 @@ def mark_attendance(request):
     # Security Check for Teachers
     if user.role == 'teacher':
         try:
-            section = Section.objects.get(id=section_id, school=user.school)
-            if section.class_teacher and section.class_teacher.user != user:
+            section = Section.objects.select_related('class_teacher').get(id=section_id, school=user.school)
+            if section.class_teacher and section.class_teacher.user_id != user.id:
                 return Response(
                     {'error': 'Security Alert: Only the assigned Class Teacher can mark attendance for this section.'}, 
                     status=status.HTTP_403_FORBIDDEN
@@ -43,50 +66,21 @@ def mark_attendance(request):
         except Section.DoesNotExist:
             return Response({'error': 'Section not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    created_count = 0
-    updated_count = 0
-    errors = []
-    
-    for record in attendance_records:
-        student_id = record['student_id']
-        attendance_status = record['status']
-        remarks = record.get('remarks', '')
-        
-        try:
-            # Filter student by school
-            student = StudentProfile.objects.get(id=student_id, school=request.user.school)
-            
-            # Check if attendance already exists
-            attendance, created = Attendance.objects.update_or_create(
-                student=student,
-                date=attendance_date,
-                school=request.user.school,  # Ensure record belongs to same school
-                defaults={
-                    'class_obj_id': class_id,
-                    'section_id': section_id,
-                    'status': attendance_status,
-                    'remarks': remarks,
-                    'marked_by': request.user,
-                    'updated_by': request.user
-                }
-            )
-            
-            if created:
-                created_count += 1
-            else:
-                updated_count += 1
-                
-        except StudentProfile.DoesNotExist:
-            errors.append(f"Student with ID {student_id} not found")
-        except Exception as e:
-            errors.append(f"Error for student {student_id}: {str(e)}")
+    result = bulk_mark_attendance(
+        school=user.school,
+        user=user,
+        attendance_date=attendance_date,
+        class_id=class_id,
+        section_id=section_id,
+        records=attendance_records
+    )
     
     return Response({
         'message': 'Attendance marked successfully',
-        'created': created_count,
-        'updated': updated_count,
-        'errors': errors
-    }, status=status.HTTP_201_CREATED if created_count > 0 else status.HTTP_200_OK)
+        'created': result['created'],
+        'updated': result['updated'],
+        'errors': result['errors']
+    }, status=status.HTTP_201_CREATED if result['created'] > 0 else status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -145,10 +139,22 @@ def student_attendance_history(request, student_id):
     Get attendance history for a student
     GET /api/v1/attendance/student/{id}/?date_from=2026-01-01&date_to=2026-01-31
     """
-    date_from = request.query_params.get('date_from')
-    date_to = request.query_params.get('date_to', str(date.today()))
+    try:
+        date_from = _date_param(request, 'date_from')
+        date_to = _date_param(request, 'date_to', date.today())
+    except ValueError:
+        return Response(
+            {'error': 'date_from and date_to must be valid dates (YYYY-MM-DD)'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     # Ensure student belongs to user's school
+    student = StudentProfile.objects.filter(
+        id=student_id, school=request.user.school
+    ).only('id', 'admission_number', 'first_name', 'last_name').first()
+    if student is None:
+        return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
+    
     queryset = Attendance.objects.filter(student_id=student_id, school=request.user.school)
     
     if date_from:
@@ -156,27 +162,68 @@ def student_attendance_history(request, student_id):
     if date_to:
         queryset = queryset.filter(date__lte=date_to)
     
-    records = queryset.order_by('-date')
+    records = queryset.only(
+        'id', 'date', 'status', 'remarks', 'class_obj_id', 'section_id'
+    ).order_by('-date')
+    
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(records, request)
+    
+    return Response({
+        'student': {
+            'id': student.id,
+            'name': student.get_full_name(),
+            'admission_number': student.admission_number,
+        },
+        'count': paginator.page.paginator.count,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'records': AttendanceHistorySerializer(page, many=True).data,
+        'summary': attendance_summary(queryset)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsActiveTeacher | IsAdmin])
+def attendance_statistics(request):
+    """
+    Attendance report for a date range, read from the daily rollup (staff only)
+    GET /api/v1/attendance/statistics/?date_from=2026-01-01&date_to=2026-01-31&class_id=1&section_id=1
+    """
+    today = date.today()
+    try:
+        date_from = _date_param(request, 'date_from', today.replace(day=1))
+        date_to = _date_param(request, 'date_to', today)
+        class_id = _id_param(request, 'class_id')
+        section_id = _id_param(request, 'section_id')
+    except ValueError:
+        return Response(
+            {'error': 'date_from/date_to must be YYYY-MM-DD dates and class_id/section_id integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Calculate statistics
-    total = records.count()
-    present = records.filter(status='present').count()
-    absent = records.filter(status='absent').count()
-    late = records.filter(status='late').count()
-    leave = records.filter(status='leave').count()
+    summaries = DailyAttendanceSummary.objects.filter(
+        school=request.user.school,
+        date__gte=date_from,
+        date__lte=date_to
+    )
+    if class_id:
+        summaries = summaries.filter(class_obj_id=class_id)
+    if section_id:
+        summaries = summaries.filter(section_id=section_id)
     
-    percentage = (present / total * 100) if total > 0 else  0
+    daily = summaries.order_by('date').values('date').annotate(
+        present=Sum('present'),
+        absent=Sum('absent'),
+        late=Sum('late'),
+        leave=Sum('leave'),
+    )
     
     return Response({
-        'records': AttendanceSerializer(records, many=True).data,
-        'summary': {
-            'total_days': total,
-            'present_days': present,
-            'absent_days': absent,
-            'late_days': late,
-            'leave_days': leave,
-            'attendance_percentage': round(percentage, 2)
-        }
+        'date_from': date_from,
+        'date_to': date_to,
+        'summary': summarise_daily_summaries(summaries),
+        'daily': list(daily)
     })
 
 
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .conditional import connect_version_signals
+        from .instrumentation import install_query_recorder
+
+        # Count queries per request on every database connection
+        connection_created.connect(install_query_recorder, dispatch_uid='core.install_query_recorder')
+
+        # Per-school data versions behind the ETags of conditional endpoints
+        connect_version_signals()
@@ -0,0 +1,134 @@
+"""
+Async (ASGI) versions of read-heavy endpoints.
+
+These are plain Django async views. Each one authenticates the bearer token
+with TenantJWTAuthentication, sets the tenant in the request's own context
+and reads through the async ORM, so under uvicorn one worker can serve many
+concurrent requests without tenants leaking between them. Responses match
+their DRF counterparts (events list, dashboard stats), including the per-user
+rate limit.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
+from rest_framework.throttling import UserRateThrottle
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from accounts.dashboard import get_school_stats, get_system_stats
+from .authentication import TenantJWTAuthentication
+from .models import Event
+from .serializers import EventSerializer
+from .tenant import TenantContext, resolve_tenant
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder)
+
+
+async def _authenticate(request):
+    """
+    Authenticate the request, apply the user rate limit and set the tenant.
+
+    Returns:
+        (user, None) on success, (None, error response) otherwise
+    """
+    authenticator = TenantJWTAuthentication()
+    try:
+        result = await sync_to_async(authenticator.authenticate)(request)
+    except exceptions.APIException as e:
+        # Same body shape as DRF's exception handler
+        data = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+        response = _json(data, status=e.status_code)
+        response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+        return None, response
+    if result is None:
+        response = _json({'detail': 'Authentication credentials were not provided.'}, status=401)
+        response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+        return None, response
+
+    user = request.user = result[0]
+
+    throttle = UserRateThrottle()
+    if not await sync_to_async(throttle.allow_request)(request, None):
+        response = _json({'detail': 'Request was throttled.'}, status=429)
+        wait = throttle.wait()
+        if wait is not None:
+            response['Retry-After'] = str(int(wait))
+        return None, response
+
+    TenantContext.set_current_tenant(await sync_to_async(resolve_tenant)(user))
+    return user, None
+
+
+async def _user_school(user):
+    """
+    ``user.school`` without touching the database from the event loop.
+    resolve_tenant() doesn't attach it for super admins, or when the token's
+    school claim is stale, so it may still need a query.
+    """
+    return await sync_to_async(lambda: user.school)()
+
+
+@require_GET
+async def events_feed(request):
+    """
+    Events visible to the current user, paginated like the events API
+    GET /api/v1/async/events/?page=N
+    """
+    user, error = await _authenticate(request)
+    if error:
+        return error
+
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+    if page < 1:
+        return _json({'detail': 'Invalid page.'}, status=404)
+
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    scope = await sync_to_async(Event.audience_scope)(user)
+    queryset = Event.visible_to(user, await _user_school(user), scope=scope)
+    count = await queryset.acount()
+    if page > 1 and (page - 1) * page_size >= count:
+        return _json({'detail': 'Invalid page.'}, status=404)
+
+    events = [
+        event async for event in queryset.select_related(
+            'target_class', 'target_section', 'created_by'
+        )[(page - 1) * page_size:page * page_size]
+    ]
+
+    url = request.build_absolute_uri()
+    previous_url = None
+    if page > 1:
+        previous_url = remove_query_param(url, 'page') if page == 2 else replace_query_param(url, 'page', page - 1)
+
+    return _json({
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1) if page * page_size < count else None,
+        'previous': previous_url,
+        'results': EventSerializer(events, many=True).data,
+    })
+
+
+@require_GET
+async def dashboard_stats(request):
+    """
+    Dashboard statistics for the current user's role and school
+    GET /api/v1/async/dashboard/stats/
+    """
+    user, error = await _authenticate(request)
+    if error:
+        return error
+
+    if user.role == 'super_admin' or user.is_superuser:
+        return _json({'stats': await sync_to_async(get_system_stats)()})
+
+    school = await _user_school(user)
+    if school:
+        return _json({'stats': await sync_to_async(get_school_stats)(school)})
+
+    return _json({'error': 'Unauthorized'}, status=403)
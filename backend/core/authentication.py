@@ -0,0 +1,247 @@
+"""
+JWT tokens and authentication that carry the tenant (school) with the user.
+
+Tokens issued by TenantRefreshToken embed the user's ``school_id``, ``role``
+and ``teacher_profile_id``; refreshing a token re-reads them from the database.
+
+- TenantJWTAuthentication uses the ``school_id`` claim to take the School from
+  the short-lived tenant cache and loads only the user row; without the claim
+  or on a cache miss the user and school are loaded with one joined query.
+- ClaimsJWTAuthentication trusts the signed claims and builds a ClaimsUser
+  without touching the database. It is meant for read-mostly endpoints (see
+  ClaimsReadMixin): a role or school change reaches it on the next token
+  refresh, and anything beyond the claims loads the full user on first use.
+
+Either way the school is attached to ``request.user``, so TenantMixin,
+TenantMiddleware and every ``request.user.school`` in views and serializers
+reuse it for the rest of the request.
+"""
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .tenant import cache_school, get_cached_school
+
+
+SCHOOL_ID_CLAIM = 'school_id'
+ROLE_CLAIM = 'role'
+TEACHER_PROFILE_ID_CLAIM = 'teacher_profile_id'
+
+
+def set_tenant_claims(token, user):
+    """Stamp the user's school, role and teacher profile onto a token"""
+    teacher_profile_id = None
+    if user.role == 'teacher':
+        try:
+            teacher_profile_id = user.teacher_profile.pk
+        except ObjectDoesNotExist:
+            pass
+
+    token[SCHOOL_ID_CLAIM] = user.school_id
+    token[ROLE_CLAIM] = user.role
+    token[TEACHER_PROFILE_ID_CLAIM] = teacher_profile_id
+
+
+class TenantRefreshToken(RefreshToken):
+    """Refresh token (and derived access tokens) carrying the user's tenant claims"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_tenant_claims(token, user)
+        return token
+
+
+class TenantTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh that re-reads the tenant claims, so role and school changes apply"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        try:
+            user = get_user_model().objects.select_related('teacher_profile').get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except get_user_model().DoesNotExist:
+            user = None
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        set_tenant_claims(refresh, user)
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # Blacklist app not installed
+                    pass
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class TenantJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the user's school along with the user"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        school = get_cached_school(validated_token.get(SCHOOL_ID_CLAIM))
+        users = self.user_model.objects if school else self.user_model.objects.select_related('school')
+
+        try:
+            user = users.get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        school_field = user._meta.get_field('school')
+        if school is not None and user.school_id == school.pk:
+            school_field.set_cached_value(user, school)
+        elif school_field.is_cached(user):
+            cache_school(user.school)
+        # else: the claim is stale (the user changed school); resolve_tenant() loads it
+
+        return user
+
+
+class ClaimsUser:
+    """
+    Request user built from signed token claims, without a database query.
+
+    Provides what permission checks and read views use: id, role, school_id,
+    teacher_profile_id, the role helpers and ``school`` (from the tenant cache).
+    ``teacher_profile`` is loaded by its ID; any other attribute loads the full
+    User once and is read from it. Not a model instance, so it can't be
+    assigned to foreign keys - write paths authenticate the full user instead.
+    """
+    is_active = True
+
+    def __init__(self, token):
+        self.token = token
+        # simplejwt stores the user ID claim as a string
+        self.id = self.pk = get_user_model()._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+        self.role = token[ROLE_CLAIM]
+        self.school_id = token.get(SCHOOL_ID_CLAIM)
+        self.teacher_profile_id = token.get(TEACHER_PROFILE_ID_CLAIM)
+
+    def __str__(self):
+        return f"User {self.pk} ({self.role})"
+
+    def __eq__(self, other):
+        if isinstance(other, ClaimsUser):
+            return self.pk == other.pk
+        if isinstance(other, get_user_model()):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def is_super_admin(self):
+        """Check if user is a super admin with cross-tenant access"""
+        return self.role == 'super_admin'
+
+    def is_school_admin(self):
+        """Check if user is a school admin"""
+        return self.role == 'admin'
+
+    def can_access_school(self, school):
+        """Check if user can access data from the given school"""
+        if self.is_super_admin():
+            return True
+        return self.school_id == school.id if school else False
+
+    @cached_property
+    def school(self):
+        if not self.school_id:
+            return None
+        school = get_cached_school(self.school_id)
+        if school is None:
+            from accounts.models import School
+            school = School.objects.get(pk=self.school_id)
+            cache_school(school)
+        return school
+
+    @cached_property
+    def teacher_profile(self):
+        from accounts.models import TeacherProfile
+        if self.teacher_profile_id is None:
+            raise get_user_model().teacher_profile.RelatedObjectDoesNotExist("User has no teacher_profile.")
+        return TeacherProfile.objects.get(pk=self.teacher_profile_id)
+
+    @cached_property
+    def full_user(self):
+        """The User row behind the token (one query, on first use)"""
+        user = get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self.pk})
+        if 'school' in self.__dict__ and user.school_id == self.school_id:
+            user._meta.get_field('school').set_cached_value(user, self.school)
+        return user
+
+    def __getattr__(self, name):
+        # Only called for attributes not defined above (or whose property raised AttributeError)
+        if name.startswith('__') or name in ('token', 'full_user'):
+            raise AttributeError(name)
+        if name == 'teacher_profile':
+            raise get_user_model().teacher_profile.RelatedObjectDoesNotExist("User has no teacher_profile.")
+        return getattr(self.full_user, name)
+
+
+class ClaimsJWTAuthentication(TenantJWTAuthentication):
+    """
+    Authenticate from the token's claims alone (no user query).
+    Tokens issued before the tenant claims existed fall back to a database load.
+    """
+
+    def get_user(self, validated_token):
+        if ROLE_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            return ClaimsUser(validated_token)
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+
+class ClaimsReadMixin:
+    """
+    Authenticate safe (read) requests with ClaimsJWTAuthentication.
+    Writes keep the default authentication and get a full User.
+    """
+
+    def get_authenticators(self):
+        if self.request.method in SAFE_METHODS:
+            return [ClaimsJWTAuthentication()]
+        return super().get_authenticators()
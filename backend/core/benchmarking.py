@@ -0,0 +1,98 @@
+"""
+Shared helpers for benchmark management commands.
+Seeds throwaway data inside a transaction that is always rolled back.
+"""
+from contextlib import contextmanager
+from datetime import date
+from django.db import transaction
+
+
+class _Rollback(Exception):
+    """Raised internally to unwind the benchmark transaction."""
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the enclosed block in a transaction that is always rolled back.
+
+    Usage:
+        with rolled_back():
+            school = seed_school('BENCH')
+            ...  # nothing written here survives
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+
+def seed_school(code='BENCH', academic_year='2025-26'):
+    """Create a school with an admin user, one class and one section."""
+    from accounts.models import School, User
+    from academic.models import Class, Section
+
+    school = School.objects.create(
+        name=f'Benchmark School {code}',
+        code=code,
+        school_verification_code=f'{code}-VERIFY',
+    )
+    admin = User.objects.create_user(
+        username=f'bench_admin_{code.lower()}',
+        email=f'admin_{code.lower()}@bench.local',
+        password=None,
+        role='admin',
+        school=school,
+    )
+    class_obj = Class.objects.create(
+        school=school, name='Class 10', code='C10', academic_year=academic_year
+    )
+    section = Section.objects.create(
+        school=school, class_obj=class_obj, name='A', code='C10-A'
+    )
+    return school, admin, class_obj, section
+
+
+def seed_students(school, class_obj, section, count, start=0):
+    """Bulk-create ``count`` active students in the given section."""
+    from students.models import StudentProfile
+
+    students = [
+        StudentProfile(
+            school=school,
+            admission_number=f'B{school.code}{i:06d}',
+            first_name='Student',
+            last_name=str(i),
+            date_of_birth=date(2010, 1, 1),
+            gender='male',
+            email=f'student{i}@{school.code.lower()}.bench.local',
+            phone=f'9{i:09d}',
+            address='Benchmark Street',
+            city='Bench City',
+            state='Bench State',
+            pincode='000000',
+            admission_date=date(2025, 4, 1),
+            class_obj=class_obj,
+            section=section,
+        )
+        for i in range(start, start + count)
+    ]
+    return StudentProfile.objects.bulk_create(students)
+
+
+def format_table(headers, rows):
+    """Render rows as a fixed-width text table."""
+    widths = [len(str(h)) for h in headers]
+    for row in rows:
+        for i, cell in enumerate(row):
+            widths[i] = max(widths[i], len(str(cell)))
+
+    def line(cells):
+        return '  '.join(str(c).rjust(widths[i]) for i, c in enumerate(cells))
+
+    output = [line(headers), '  '.join('-' * w for w in widths)]
+    output.extend(line(row) for row in rows)
+    return '\n'.join(output)
@@ -0,0 +1,143 @@
+"""
+Conditional GET (ETag / Last-Modified) for read-mostly endpoints.
+
+Every model in VERSIONED_MODELS has a per-school version stamp in the cache,
+replaced whenever a row is saved or deleted (after the transaction commits).
+ConditionalGetMixin builds a response's ETag from the stamps of the models
+its data depends on, so ``If-None-Match`` / ``If-Modified-Since`` can be
+answered with 304 before the queryset is evaluated or anything serialized.
+
+Bulk writes (bulk_create, bulk_update, queryset.update) don't send signals;
+call bump_versions() after them. Stamps live in the shared cache (Redis in
+production); a missing stamp is recreated, which only costs clients one
+full response.
+"""
+import hashlib
+import math
+import time
+import uuid
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+# Models whose writes change a conditional endpoint's data
+VERSIONED_MODELS = [
+    'academic.Class',
+    'academic.Section',
+    'academic.Subject',
+    'academic.Period',
+    'academic.ClassRoom',
+    'academic.TimetableEntry',
+    'accounts.User',
+    'students.StudentProfile',
+    'students.AdmissionFormConfig',
+]
+
+
+def _version_key(school_id, model):
+    return f'data_version:{school_id}:{model._meta.label_lower}'
+
+
+def _new_stamp(previous=None):
+    """
+    (token, modified) with ``modified`` in whole seconds (HTTP dates have no
+    finer resolution) and always later than ``previous``'s, so two changes
+    within one second still move Last-Modified forward
+    """
+    modified = math.ceil(time.time())
+    if previous is not None:
+        modified = max(modified, previous[1] + 1)
+    return uuid.uuid4().hex[:16], modified
+
+
+def get_versions(school_id, models):
+    """(token, modified timestamp) for each model's data in a school, creating missing stamps"""
+    keys = [_version_key(school_id, model) for model in models]
+    stamps = cache.get_many(keys)
+
+    missing = {key: _new_stamp() for key in keys if key not in stamps}
+    if missing:
+        for key, stamp in missing.items():
+            # add(): a stamp bumped concurrently wins over the one made here
+            cache.add(key, stamp, None)
+        stamps.update(missing)
+    return [stamps[key] for key in keys]
+
+
+def bump_versions(school_id, *models):
+    """Mark models' data in a school as changed, once the current transaction commits"""
+    if not school_id:
+        return
+    keys = [_version_key(school_id, model) for model in models]
+
+    def bump():
+        stamps = cache.get_many(keys)
+        cache.set_many({key: _new_stamp(stamps.get(key)) for key in keys}, None)
+
+    transaction.on_commit(bump)
+
+
+def bump_version_for_instance(sender, instance, update_fields=None, **kwargs):
+    """post_save / post_delete receiver for VERSIONED_MODELS"""
+    # Logins only touch last_login, which no conditional endpoint shows
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_versions(getattr(instance, 'school_id', None), sender)
+
+
+def connect_version_signals():
+    for label in VERSIONED_MODELS:
+        model = apps.get_model(label)
+        uid = f'core.bump_version.{label}'
+        post_save.connect(bump_version_for_instance, sender=model, dispatch_uid=uid)
+        post_delete.connect(bump_version_for_instance, sender=model, dispatch_uid=uid)
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin answering conditional list/retrieve requests with 304.
+
+    ``version_models`` lists every model (from VERSIONED_MODELS) whose rows
+    appear in the response, including related names and counts. The ETag
+    also covers the URL (filters, page), the negotiated format and the
+    user's role. Requests without a school (super admins) are not conditional.
+    """
+    version_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        """Run ``handler`` unless the client's cached copy is still current"""
+        school_id = getattr(request.user, 'school_id', None)
+        if not school_id:
+            return handler(request, *args, **kwargs)
+
+        versions = get_versions(school_id, self.version_models)
+        etag = quote_etag(hashlib.md5('|'.join([
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            request.user.role,
+            *(token for token, _ in versions),
+        ]).encode(), usedforsecurity=False).hexdigest())
+        last_modified = max(modified for _, modified in versions)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Browsers keep the copy but revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -1,9 +1,12 @@
 """
-Health check endpoint for deployment monitoring
+Health check and metrics endpoints for deployment monitoring
 """
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from .instrumentation import render_prometheus
 
 
 @require_http_methods(["GET"])
@@ -18,3 +21,22 @@ def health_check(request):
         'application': 'CampusIQ',
         'version': '1.0.0'
     })
+
+
+@require_http_methods(["GET"])
+@csrf_exempt
+def metrics(request):
+    """
+    Request metrics in the Prometheus text format (see core.instrumentation).
+    Requires "Authorization: Bearer <METRICS_TOKEN>" when METRICS_TOKEN is set;
+    without a token it is only served in DEBUG.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not constant_time_compare(supplied, token):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        return HttpResponse(status=404)
+
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,355 @@
+"""
+Per-request instrumentation: query count, DB time, serializer time and
+response size, tagged by URL name, HTTP method, status and school.
+
+- RequestMetricsMiddleware (core.middleware) opens a RequestMetrics for each
+  request and records it when the response is ready.
+- Queries are counted by a database execute wrapper installed on every
+  connection (see CoreConfig.ready), so ORM work done in ``sync_to_async``
+  threads is attributed to the request that started it.
+- InstrumentedViewMixin (a base of TenantMixin) times serializer ``.data``.
+
+Totals are aggregated per process and flushed to the cache every
+REQUEST_METRICS_FLUSH_INTERVAL by a background thread, never on the request
+path, and a failing flush is only logged. The
+Prometheus endpoint (core.health.metrics) sums the snapshots of every worker
+sharing the cache (Redis in production, only the serving process otherwise).
+
+The opt-in slow-request log (SLOW_REQUEST_THRESHOLD_MS / SLOW_REQUEST_QUERY_THRESHOLD)
+logs requests over either threshold with their repeated query fingerprints,
+which is what an N+1 looks like.
+"""
+import contextvars
+import logging
+import os
+import re
+import socket
+import threading
+from collections import Counter
+from time import perf_counter, sleep
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import empty
+
+
+logger = logging.getLogger('core.slow_requests')
+flush_logger = logging.getLogger(__name__)
+
+# Request duration histogram buckets (seconds)
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Series fields, in storage order (followed by one count per duration bucket)
+COUNT, DURATION, QUERIES, DB_SECONDS, SERIALIZER_SECONDS, RESPONSE_BYTES = range(6)
+_FIELDS = 6
+
+_SNAPSHOT_INDEX_KEY = 'request_metrics:workers'
+
+_current_metrics = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Measurements for one request, filled in while it runs"""
+
+    def __init__(self, fingerprints=False):
+        self.started = perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.school_id = None
+        # Query fingerprint -> count, only collected for the slow-request log
+        self.fingerprints = Counter() if fingerprints else None
+
+
+def start_request():
+    """Begin measuring the current request; returns the token for finish_request()"""
+    return _current_metrics.set(RequestMetrics(fingerprints=slow_log_enabled()))
+
+
+def current_request_metrics():
+    """The RequestMetrics of the running request, or None outside one"""
+    return _current_metrics.get()
+
+
+def finish_request(token, request, response):
+    """Stop measuring, add the request to the process totals and log it if slow"""
+    metrics = _current_metrics.get()
+    _current_metrics.reset(token)
+    if metrics is None:
+        return
+
+    duration = perf_counter() - metrics.started
+    if metrics.school_id is None:
+        metrics.school_id = _request_school_id(request)
+
+    match = getattr(request, 'resolver_match', None)
+    view = (match.view_name or match.route) if match else '<unmatched>'
+    labels = (view, request.method, str(response.status_code), str(metrics.school_id or ''))
+
+    _registry.record(labels, duration, metrics, _response_size(response))
+
+    if _is_slow(duration, metrics):
+        _log_slow_request(request, labels, duration, metrics)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting queries (and their time) for the running request.
+    Installed on every connection; a no-op outside instrumented requests.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_seconds += perf_counter() - started
+        if metrics.fingerprints is not None:
+            metrics.fingerprints[fingerprint(sql)] += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver: add record_query to the new connection"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+\b')
+_SELECT_LIST = re.compile(r'^SELECT (DISTINCT )?.*? FROM ', re.DOTALL)
+
+
+def fingerprint(sql):
+    """Normalise SQL so queries differing only in values (or IN-list length) compare equal"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class InstrumentedViewMixin:
+    """
+    DRF view mixin recording serializer time and the tenant for request metrics.
+    Serializers from get_serializer() are timed when their ``.data`` is built
+    (which includes any queries the serializer triggers).
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        metrics = current_request_metrics()
+        if metrics is not None and request.user and request.user.is_authenticated:
+            metrics.school_id = getattr(request.user, 'school_id', None)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current_request_metrics() is not None:
+            serializer.__class__ = _timed_serializer_class(serializer.__class__)
+        return serializer
+
+
+_timed_classes = {}
+
+
+def _timed_serializer_class(cls):
+    """Subclass of ``cls`` whose ``.data`` adds its build time to the request metrics"""
+    if getattr(cls, '_metrics_timed', False):
+        return cls
+
+    timed = _timed_classes.get(cls)
+    if timed is None:
+        def data(self):
+            started = perf_counter()
+            try:
+                return super(timed, self).data
+            finally:
+                metrics = current_request_metrics()
+                if metrics is not None:
+                    metrics.serializer_seconds += perf_counter() - started
+
+        timed = type(cls.__name__, (cls,), {
+            '__module__': cls.__module__,
+            '_metrics_timed': True,
+            'data': property(data),
+        })
+        _timed_classes[cls] = timed
+    return timed
+
+
+class _Registry:
+    """Process-wide metric totals, flushed to the cache every REQUEST_METRICS_FLUSH_INTERVAL"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.flusher_pid = None
+
+    @property
+    def worker_key(self):
+        # Evaluated per call: forked workers must not share the parent's key
+        return f'request_metrics:{socket.gethostname()}:{os.getpid()}'
+
+    def record(self, labels, duration, metrics, response_bytes):
+        with self.lock:
+            values = self.series.get(labels)
+            if values is None:
+                values = self.series[labels] = [0] * (_FIELDS + len(DURATION_BUCKETS))
+            values[COUNT] += 1
+            values[DURATION] += duration
+            values[QUERIES] += metrics.queries
+            values[DB_SECONDS] += metrics.db_seconds
+            values[SERIALIZER_SECONDS] += metrics.serializer_seconds
+            values[RESPONSE_BYTES] += response_bytes
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    values[_FIELDS + i] += 1
+
+            # One flusher per process; forked workers don't inherit the parent's thread
+            start_flusher = self.flusher_pid != os.getpid()
+            if start_flusher:
+                self.flusher_pid = os.getpid()
+
+        if start_flusher:
+            threading.Thread(target=self.flush_periodically, name='request-metrics-flush', daemon=True).start()
+
+    def flush_periodically(self):
+        while True:
+            sleep(settings.REQUEST_METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {labels: list(values) for labels, values in self.series.items()}
+
+    def flush(self):
+        """Publish this process's totals to the cache for the metrics endpoint"""
+        ttl = max(settings.REQUEST_METRICS_FLUSH_INTERVAL * 20, 300)
+        try:
+            cache.set(self.worker_key, self.snapshot(), ttl)
+
+            workers = cache.get(_SNAPSHOT_INDEX_KEY) or set()
+            if self.worker_key not in workers:
+                workers.add(self.worker_key)
+                cache.set(_SNAPSHOT_INDEX_KEY, workers, None)
+        except Exception:
+            # The totals stay in memory and go out with the next flush
+            flush_logger.exception("Flushing request metrics to the cache failed")
+
+    def collect(self):
+        """Sum the latest snapshots of all workers (this one read live)"""
+        self.flush()
+        workers = cache.get(_SNAPSHOT_INDEX_KEY) or set()
+        snapshots = cache.get_many(list(workers))
+
+        # Forget workers whose snapshots expired (stopped or restarted processes)
+        if len(snapshots) < len(workers):
+            cache.set(_SNAPSHOT_INDEX_KEY, set(snapshots), None)
+
+        totals = {}
+        for snapshot in snapshots.values():
+            for labels, values in snapshot.items():
+                current = totals.get(labels)
+                if current is None:
+                    totals[labels] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        current[i] += value
+        return totals
+
+
+_registry = _Registry()
+
+
+def render_prometheus():
+    """All workers' request metrics in the Prometheus text exposition format"""
+    totals = _registry.collect()
+    lines = []
+
+    def family(name, kind, help_text, field, scale=1):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, values in sorted(totals.items()):
+            lines.append(f'{name}{{{_label_string(labels)}}} {_number(values[field] * scale)}')
+
+    family('campusiq_http_requests_total', 'counter', 'Requests served.', COUNT)
+    family('campusiq_db_queries_total', 'counter', 'Database queries run by requests.', QUERIES)
+    family('campusiq_db_query_seconds_total', 'counter', 'Time spent executing database queries.', DB_SECONDS)
+    family('campusiq_serializer_seconds_total', 'counter', 'Time spent building serializer data.', SERIALIZER_SECONDS)
+    family('campusiq_http_response_bytes_total', 'counter', 'Response body bytes sent.', RESPONSE_BYTES)
+
+    name = 'campusiq_http_request_duration_seconds'
+    lines.append(f'# HELP {name} Request duration.')
+    lines.append(f'# TYPE {name} histogram')
+    for labels, values in sorted(totals.items()):
+        label_string = _label_string(labels)
+        for i, bound in enumerate(DURATION_BUCKETS):
+            lines.append(f'{name}_bucket{{{label_string},le="{bound}"}} {values[_FIELDS + i]}')
+        lines.append(f'{name}_bucket{{{label_string},le="+Inf"}} {values[COUNT]}')
+        lines.append(f'{name}_sum{{{label_string}}} {_number(values[DURATION])}')
+        lines.append(f'{name}_count{{{label_string}}} {values[COUNT]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def slow_log_enabled():
+    return bool(settings.SLOW_REQUEST_THRESHOLD_MS or settings.SLOW_REQUEST_QUERY_THRESHOLD)
+
+
+def _is_slow(duration, metrics):
+    threshold_ms = settings.SLOW_REQUEST_THRESHOLD_MS
+    query_threshold = settings.SLOW_REQUEST_QUERY_THRESHOLD
+    return bool(
+        (threshold_ms and duration * 1000 >= threshold_ms)
+        or (query_threshold and metrics.queries >= query_threshold)
+    )
+
+
+def _log_slow_request(request, labels, duration, metrics):
+    repeated = [
+        (count, sql) for sql, count in (metrics.fingerprints or Counter()).most_common(5)
+        if count >= settings.SLOW_REQUEST_REPEATED_QUERY_MIN
+    ]
+    logger.warning(
+        "Slow request %s %s (view=%s status=%s school=%s): %.0f ms, %d queries, "
+        "%.0f ms in DB, %.0f ms serializing%s",
+        request.method, request.path, labels[0], labels[2], labels[3] or '-',
+        duration * 1000, metrics.queries, metrics.db_seconds * 1000,
+        metrics.serializer_seconds * 1000,
+        ''.join(f'\n  {count}x {_short_sql(sql)}' for count, sql in repeated),
+    )
+
+
+def _short_sql(sql):
+    # The column list is noise when comparing queries
+    return _SELECT_LIST.sub(r'SELECT \1... FROM ', sql, count=1)[:300]
+
+
+def _request_school_id(request):
+    # Don't trigger a lazy (session) user lookup just for the label
+    user = request.__dict__.get('user')
+    if user is None or getattr(user, '_wrapped', None) is empty:
+        return None
+    if not user.is_authenticated:
+        return None
+    return getattr(user, 'school_id', None)
+
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        return 0
+    return len(response.content)
+
+
+def _label_string(labels):
+    view, method, status, school_id = (_escape(value) for value in labels)
+    return f'view="{view}",method="{method}",status="{status}",school_id="{school_id}"'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
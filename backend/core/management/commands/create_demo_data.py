@@ -120,7 +120,7 @@ class Command(BaseCommand):
                     'email': data['admin_email'],
                     'first_name': data['admin_name'].split()[0],
                     'last_name': ' '.join(data['admin_name'].split()[1:]),
-                    'role': 'school_admin',
+                    'role': 'admin',
                     'is_active': True,
                     'is_email_verified': True,
                 }
@@ -152,7 +152,7 @@ class Command(BaseCommand):
     def setup_admission_form(self, school):
         """Setup admission form configuration"""
         from django.core.management import call_command
-        call_command('setup_admission_form', school_id=school.id)
+        call_command('setup_admission_form', school_id=school.id, stdout=self.stdout)
         self.stdout.write('  ✓ Configured admission form')
 
     def create_subjects(self, school):
@@ -257,7 +257,6 @@ class Command(BaseCommand):
             teacher, created = TeacherProfile.objects.get_or_create(
                 user=user,
                 defaults={
-                    'school': school,
                     'employee_id': f'T{school.id}{i:03d}',
                     'phone': f'98765{i:05d}',
                     'address': f'{i} Teacher Colony, City',
@@ -388,6 +387,8 @@ class Command(BaseCommand):
                     student=student,
                     date=date,
                     defaults={
+                        'class_obj_id': student.class_obj_id,
+                        'section_id': student.section_id,
                         'status': status,
                         'marked_by': teacher.user if teacher else None,
                     }
@@ -401,6 +402,7 @@ class Command(BaseCommand):
             return
         
         current_year = timezone.now().year
+        admin_user = User.objects.filter(school=school, role='admin').first()
         
         for class_data in classes_data[:5]:
             # Create fee structure
@@ -453,6 +455,7 @@ class Command(BaseCommand):
                         'invoice_number': f'INV{school.id}{student.id:04d}',
                         'total_amount': fee_structure.total_amount,
                         'paid_amount': Decimal('0.00'),
+                        'remaining_amount': fee_structure.total_amount,
                         'due_date': timezone.now().date() + timedelta(days=30),
                         'status': 'pending',
                     }
@@ -461,17 +464,15 @@ class Command(BaseCommand):
                 # Some students have paid
                 if created and random.random() > 0.5:
                     payment_amount = Decimal(random.choice(['50000.00', '25000.00', '10000.00']))
+                    # Payment.save() applies the amount to the invoice balance and status
                     Payment.objects.create(
-                        school=school,
                         invoice=invoice,
                         receipt_number=f'REC{school.id}{student.id:04d}',
                         amount=payment_amount,
                         payment_date=timezone.now().date(),
-                        payment_mode=random.choice(['cash', 'online', 'upi']),
+                        payment_mode=random.choice(['cash', 'online', 'bank_transfer']),
+                        created_by=admin_user,
                     )
-                    invoice.paid_amount = payment_amount
-                    invoice.status = 'paid' if payment_amount >= fee_structure.total_amount else 'partial'
-                    invoice.save()
         
         self.stdout.write('  ✓ Created fee structures and invoices')
 
@@ -481,6 +482,7 @@ class Command(BaseCommand):
             return
         
         current_year = timezone.now().year
+        admin_user = User.objects.filter(school=school, role='admin').first()
         
         for class_data in classes_data[:5]:
             # Create exam
@@ -510,6 +512,7 @@ class Command(BaseCommand):
                             marks_obtained=random.randint(60, 95),
                             max_marks=subject.max_marks,
                             grade=random.choice(['A', 'A+', 'B+', 'B']),
+                            entered_by=admin_user,
                         )
         
         self.stdout.write('  ✓ Created exams and results')
@@ -522,9 +525,10 @@ class Command(BaseCommand):
         
         for school in schools:
             self.stdout.write(f'\n📚 {school.name}')
-            self.stdout.write(f'   Admin: {school.admin.email} / demo123')
-            self.stdout.write(f'   Verification Code: {school.verification_code}')
-            self.stdout.write(f'   Teachers: {TeacherProfile.objects.filter(school=school).count()}')
+            admin = User.objects.filter(school=school, role='admin').first()
+            self.stdout.write(f'   Admin: {admin.email if admin else "-"} / demo123')
+            self.stdout.write(f'   Verification Code: {school.school_verification_code}')
+            self.stdout.write(f'   Teachers: {TeacherProfile.objects.filter(user__school=school).count()}')
             self.stdout.write(f'   Students: {StudentProfile.objects.filter(school=school).count()}')
             self.stdout.write(f'   Classes: {Class.objects.filter(school=school).count()}')
             self.stdout.write(f'   Subjects: {Subject.objects.filter(school=school).count()}')
@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand
+from core.services.email_outbox import OutboxSender
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbound emails, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new emails instead of exiting when the outbox is empty',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds between polls in --loop mode',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Emails claimed per batch (default: EMAIL_OUTBOX_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        # One sender for the whole run so the SMTP connection is reused between polls
+        sender = OutboxSender(batch_size=options['batch_size'])
+        try:
+            while True:
+                counts = sender.drain()
+                if any(counts.values()):
+                    self.stdout.write(
+                        f"Sent {counts['sent']}, retrying {counts['retried']}, failed {counts['failed']}"
+                    )
+                else:
+                    # Don't hold an idle SMTP session open for the relay to drop
+                    sender.close()
+
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            sender.close()
+
+        self.stdout.write(self.style.SUCCESS('Email outbox drained'))
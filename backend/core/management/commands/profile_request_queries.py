@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.authentication import TenantRefreshToken
+from core.benchmarking import rolled_back, seed_school, seed_students, format_table
+from core.tenant import forget_cached_school
+
+
+DEFAULT_PATHS = [
+    '/api/v1/auth/me/',
+    '/api/v1/classes/',
+    '/api/v1/sections/',
+    '/api/v1/timetable/',
+    '/api/v1/events/',
+    '/api/v1/exam-schedules/',
+    '/api/v1/students/',
+    '/api/v1/attendance/statistics/',
+    '/api/v1/dashboard/stats/',
+]
+
+# Queries that resolve the requesting user and their school
+TENANT_TABLES = ('FROM "users"', 'FROM "schools"', 'FROM `users`', 'FROM `schools`')
+
+
+class Command(BaseCommand):
+    help = 'Count queries per authenticated API request, split out user/school (tenant) lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--paths',
+            type=str,
+            default=','.join(DEFAULT_PATHS),
+            help='Comma-separated GET paths to profile',
+        )
+        parser.add_argument('--students', type=int, default=50, help='Students to seed')
+
+    def handle(self, *args, **options):
+        paths = [p.strip() for p in options['paths'].split(',') if p.strip()]
+        rows = []
+
+        with rolled_back():
+            school, admin, class_obj, section = seed_school('PROFILE')
+            seed_students(school, class_obj, section, options['students'])
+
+            tokens = [
+                # Tokens issued before the tenant claims existed
+                ('no tenant claims', str(RefreshToken.for_user(admin).access_token), False),
+                ('claims, cold cache', str(TenantRefreshToken.for_user(admin).access_token), True),
+                ('claims, warm cache', str(TenantRefreshToken.for_user(admin).access_token), False),
+            ]
+
+            for path in paths:
+                for label, token, cold in tokens:
+                    if cold:
+                        forget_cached_school(school.id)
+                    client = APIClient(HTTP_HOST='localhost')
+                    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+                    with CaptureQueriesContext(connection) as ctx:
+                        response = client.get(path)
+
+                    tenant_queries = sum(
+                        1 for query in ctx.captured_queries
+                        if any(table in query['sql'] for table in TENANT_TABLES)
+                    )
+                    rows.append([
+                        path, label, response.status_code,
+                        len(ctx.captured_queries), tenant_queries,
+                    ])
+
+        self.stdout.write(format_table(
+            ['path', 'token', 'status', 'queries', 'user/school queries'], rows
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from core.services.push import push_event
+
+
+class Command(BaseCommand):
+    help = 'Send (or resend) the push notification for events to their audience'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='+', type=int)
+
+    def handle(self, *args, **options):
+        for event_id in options['event_ids']:
+            result = push_event(event_id)
+            self.stdout.write(
+                f"Event #{event_id}: delivered {result['delivered']}, "
+                f"failed {result['failed']}, pruned {result['pruned']}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Event pushes sent'))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import School
+from core.benchmarking import format_table
+from core.services.email_service import send_bulk_templated_email
+from exams.models import Exam
+from exams.services import report_card_notice_recipients
+from fees.services import fee_reminder_recipients
+
+
+MAILINGS = {
+    'fee-reminders': ('fee_reminder', 'Fee reminder for {{ student_name }} - {{ invoice_number }}'),
+    'report-cards': ('report_card_notice', '{{ exam_name }} report card for {{ student_name }}'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Email a templated notice to every parent in a school, in chunks over one connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('mailing', choices=sorted(MAILINGS))
+        parser.add_argument('--school', required=True, help='School code')
+        parser.add_argument('--exam', type=int, help='Exam ID (report-cards)')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Messages per send (default: EMAIL_BULK_CHUNK_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        school = School.objects.filter(code=options['school']).first()
+        if school is None:
+            raise CommandError(f"No school with code {options['school']}")
+
+        if options['mailing'] == 'report-cards':
+            if not options['exam']:
+                raise CommandError('--exam is required for report-cards')
+            exam = Exam.objects.all_tenants().filter(school=school, pk=options['exam']).select_related('school').first()
+            if exam is None:
+                raise CommandError(f"No exam {options['exam']} in {school.code}")
+            recipients = report_card_notice_recipients(exam, options['chunk_size'])
+        else:
+            recipients = fee_reminder_recipients(school, options['chunk_size'])
+
+        template_name, subject = MAILINGS[options['mailing']]
+        result = send_bulk_templated_email(
+            template_name, subject, recipients, chunk_size=options['chunk_size']
+        )
+
+        self.stdout.write(format_table(
+            ['chunk', 'messages', 'sent', 'render s', 'send s', 'msg/s'],
+            [
+                [c['chunk'], c['messages'], c['sent'], f"{c['render_seconds']:.3f}",
+                 f"{c['send_seconds']:.3f}", f"{c['messages_per_second']:.0f}"]
+                for c in result['chunks']
+            ]
+        ))
+        for error in result['errors']:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {result['sent']}, failed {result['failed']} in {result['elapsed_seconds']:.2f}s "
+            f"({result['messages_per_second']:.0f} msg/s)"
+        ))
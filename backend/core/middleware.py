@@ -1,8 +1,14 @@
 """
 Tenant middleware for automatic tenant context injection.
 Sets the current tenant (school) based on the authenticated user.
+Also holds the request metrics middleware (see core.instrumentation).
+Both run natively under WSGI and ASGI.
 """
-from .tenant import TenantContext
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from . import instrumentation
+from .tenant import TenantContext, resolve_tenant
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,11 +17,15 @@ logger = logging.getLogger(__name__)
 class TenantMiddleware:
     """
     Middleware to set tenant context for each request.
-    Extracts school from authenticated user and sets in thread-local storage.
+    Extracts school from authenticated user and sets it in the request's context.
     """
+    sync_capable = True
+    async_capable = True
     
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
     
     def __call__(self, request):
         """
@@ -28,19 +38,17 @@ class TenantMiddleware:
         4. Process request with tenant context
         5. Clear tenant context after response
         """
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        
         # Clear any existing tenant context
         TenantContext.clear_tenant()
         
         # Set tenant from authenticated user
-        logger.debug(f"TenantMiddleware - User: {request.user}, Authenticated: {request.user.is_authenticated}")
-        if request.user and request.user.is_authenticated:
-            # Check if super admin
-            if hasattr(request.user, 'is_super_admin') and request.user.is_super_admin():
-                # Super admin: no tenant restriction
-                TenantContext.set_current_tenant(None)
-            elif hasattr(request.user, 'school'):
-                # Regular user: set their school as tenant
-                TenantContext.set_current_tenant(request.user.school)
+        logger.debug("TenantMiddleware - User ID: %s", request.user.pk)
+        if request.user and request.user.is_authenticated and hasattr(request.user, 'is_super_admin'):
+            # Super admins get None (access all schools), everyone else their school
+            TenantContext.set_current_tenant(resolve_tenant(request.user))
         
         # Process request
         response = self.get_response(request)
@@ -49,3 +57,50 @@ class TenantMiddleware:
         TenantContext.clear_tenant()
         
         return response
+    
+    async def __acall__(self, request):
+        """Async counterpart of __call__ (ASGI)"""
+        TenantContext.clear_tenant()
+        
+        user = await request.auser()
+        if user.is_authenticated and hasattr(user, 'is_super_admin'):
+            TenantContext.set_current_tenant(await sync_to_async(resolve_tenant)(user))
+        
+        response = await self.get_response(request)
+        
+        TenantContext.clear_tenant()
+        
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, serializer time, duration and response size
+    for every request (exposed at /metrics/), and log slow requests when enabled.
+    Place it early so the measurements cover the rest of the middleware stack.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        
+        token = instrumentation.start_request()
+        response = self.get_response(request)
+        instrumentation.finish_request(token, request, response)
+        return response
+    
+    async def __acall__(self, request):
+        """Async counterpart of __call__ (ASGI)"""
+        token = instrumentation.start_request()
+        response = await self.get_response(request)
+        instrumentation.finish_request(token, request, response)
+        return response
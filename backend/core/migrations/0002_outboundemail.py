@@ -0,0 +1,40 @@
+# Generated by Django 5.0.14 on 2026-10-17 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('subject', models.CharField(max_length=255)),
+                ('from_email', models.CharField(max_length=254)),
+                ('to', models.JSONField(default=list, help_text='Recipient addresses')),
+                ('body', models.TextField(blank=True, help_text='Plain text body')),
+                ('html_body', models.TextField(blank=True)),
+                ('attachments', models.JSONField(blank=True, default=list, help_text='[filename, base64 content, mimetype] triples')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(help_text='Not sent before this time (retry backoff)')),
+                ('claimed_at', models.DateTimeField(blank=True, help_text='When a worker started sending it', null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Outbound Email',
+                'verbose_name_plural': 'Outbound Emails',
+                'db_table': 'outbound_emails',
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='outbound_em_status_54195c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-17 06:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0009_subjectassignment_periods_per_week_and_more'),
+        ('accounts', '0006_user_upper_username_email_indexes'),
+        ('core', '0002_outboundemail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='events_school__074a46_idx',
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['school', 'is_active', 'audience', 'start_datetime'], name='events_feed_idx'),
+        ),
+    ]
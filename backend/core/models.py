@@ -130,13 +130,63 @@ class Event(TenantAwareModel):
         db_table = 'events'
         ordering = ['-start_datetime']
         indexes = [
-            models.Index(fields=['school', 'audience']),
+            # Feed and calendar reads: every visibility branch is an equality
+            # prefix followed by a start_datetime range/order
+            models.Index(fields=['school', 'is_active', 'audience', 'start_datetime'], name='events_feed_idx'),
             models.Index(fields=['start_datetime']),
         ]
 
     def __str__(self):
         return f"{self.title} ({self.get_event_type_display()}) - {self.school.name}"
 
+    @staticmethod
+    def audience_scope(user):
+        """
+        (class_id, section_id) whose class events a student or parent sees,
+        (None, None) if they have none. One query; other roles need none.
+        """
+        from students.models import ParentProfile, StudentProfile
+
+        if user.role == 'student':
+            scope = StudentProfile.objects.all_tenants().filter(user_id=user.pk).values_list('class_obj_id', 'section_id')
+        elif user.role == 'parent':
+            scope = ParentProfile.objects.all_tenants().filter(user_id=user.pk).values_list(
+                'student__class_obj_id', 'student__section_id'
+            )
+        else:
+            return None, None
+        return scope.first() or (None, None)
+
+    @staticmethod
+    def visible_to(user, school, scope=None):
+        """
+        Active events of a school that the user may see.
+
+        Students and parents only see class events for their own class (and
+        section, when the event targets one). Pass ``scope`` from
+        audience_scope() if it is already known (e.g. in async code).
+        """
+        if not school:
+            return Event.objects.none()
+
+        queryset = Event.objects.filter(school=school, is_active=True)
+
+        if user.role in ['admin', 'super_admin']:
+            return queryset
+        
+        elif user.role == 'teacher':
+            # Teachers see: Global + Staff + Any class targeted events
+            return queryset.filter(audience__in=['global', 'staff', 'class'])
+        
+        # Students/Parents see: Global + their class/section
+        class_id, section_id = scope or Event.audience_scope(user)
+        visible = models.Q(audience='global')
+        if class_id:
+            visible |= models.Q(audience='class', target_class_id=class_id, target_section__isnull=True)
+            if section_id:
+                visible |= models.Q(audience='class', target_class_id=class_id, target_section_id=section_id)
+        return queryset.filter(visible)
+
 
 class NotificationSubscription(TenantAwareModel):
     """
@@ -159,3 +209,42 @@ class NotificationSubscription(TenantAwareModel):
 
     def __str__(self):
         return f"{self.user.username} - {self.browser or 'Device'}"
+
+
+class OutboundEmail(TimeStampedModel):
+    """
+    Durable outbox for outgoing email.
+    Rows are written in the caller's transaction and delivered by the
+    drain_email_outbox worker (see core.services.email_outbox).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list, help_text="Recipient addresses")
+    body = models.TextField(blank=True, help_text="Plain text body")
+    html_body = models.TextField(blank=True)
+    attachments = models.JSONField(default=list, blank=True, help_text="[filename, base64 content, mimetype] triples")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(help_text="Not sent before this time (retry backoff)")
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text="When a worker started sending it")
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'outbound_emails'
+        verbose_name = 'Outbound Email'
+        verbose_name_plural = 'Outbound Emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+        ordering = ['next_attempt_at']
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.get_status_display()})"
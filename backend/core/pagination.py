@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class EventFeedPagination(CursorPagination):
+    """
+    Keyset pagination for the event feed.
+    Pages continue from the last start_datetime seen (an opaque cursor), so
+    deep pages cost the same as the first and inserts don't shift pages.
+    """
+    ordering = ('-start_datetime', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,179 @@
+"""
+Database-backed outbox for outgoing email.
+
+``enqueue_email`` stores a message in the caller's transaction, so it is only
+sent if the surrounding work commits and the request never waits on SMTP.
+``OutboxSender`` (run by ``manage.py drain_email_outbox``) claims due messages
+in batches, sends them over one reused SMTP connection (reopened every
+EMAIL_OUTBOX_MESSAGES_PER_CONNECTION messages or after a connection error)
+and reschedules failures with exponential backoff until
+EMAIL_OUTBOX_MAX_ATTEMPTS is reached.
+
+Delivery is at least once: a message claimed by a worker that dies mid-send
+is picked up again after EMAIL_OUTBOX_CLAIM_TIMEOUT seconds.
+"""
+import base64
+import logging
+import smtplib
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from core.models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the SMTP session can't be trusted for the next message
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+def enqueue_email(subject, to_emails, text_content='', html_content='', from_email=None, attachments=None):
+    """
+    Queue an email for the outbox worker.
+
+    Args:
+        attachments: (filename, content, mimetype) tuples, content as bytes or str
+
+    Returns:
+        The OutboundEmail row
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to_emails),
+        body=text_content or '',
+        html_body=html_content or '',
+        attachments=[
+            [filename, base64.b64encode(content.encode() if isinstance(content, str) else content).decode(), mimetype]
+            for filename, content, mimetype in attachments or []
+        ],
+        next_attempt_at=timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    """Backoff before the next try after ``attempts`` failed sends"""
+    base = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS))
+
+
+def build_message(email, connection=None):
+    """The EmailMultiAlternatives for an OutboundEmail row"""
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    for filename, content, mimetype in email.attachments:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+class OutboxSender:
+    """
+    Drains the outbox over a reused mail connection.
+    Keep one instance per worker process; call close() when done.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+        self.connection = None
+        self.sent_on_connection = 0
+
+    def drain(self):
+        """
+        Send every due message, batch by batch.
+
+        Returns:
+            dict: counts of sent, retried (rescheduled) and failed (gave up) messages
+        """
+        totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        while True:
+            batch = self.claim_batch()
+            if not batch:
+                return totals
+            for key, count in self.send_batch(batch).items():
+                totals[key] += count
+
+    def claim_batch(self):
+        """Mark up to batch_size due messages as sending and return them"""
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT)
+
+        with transaction.atomic():
+            batch = list(
+                OutboundEmail.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status='pending', next_attempt_at__lte=now)
+                    | Q(status='sending', claimed_at__lt=stale)
+                )
+                .order_by('next_attempt_at')[:self.batch_size]
+            )
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                status='sending', claimed_at=now
+            )
+        return batch
+
+    def send_batch(self, batch):
+        sent, retried, failed = [], [], []
+
+        for email in batch:
+            try:
+                self.send(email)
+            except Exception as e:
+                email.attempts += 1
+                email.last_error = f'{type(e).__name__}: {e}'[:2000]
+                if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    email.status = 'failed'
+                    failed.append(email)
+                    logger.error("Giving up on email %s to %s after %d attempts: %s",
+                                 email.pk, email.to, email.attempts, email.last_error)
+                else:
+                    email.status = 'pending'
+                    email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                    retried.append(email)
+                    logger.warning("Email %s to %s failed (attempt %d), retrying at %s: %s",
+                                   email.pk, email.to, email.attempts, email.next_attempt_at, email.last_error)
+                if isinstance(e, CONNECTION_ERRORS):
+                    self.close()
+            else:
+                sent.append(email.pk)
+
+        if sent:
+            OutboundEmail.objects.filter(pk__in=sent).update(
+                status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1
+            )
+        if retried or failed:
+            OutboundEmail.objects.bulk_update(
+                retried + failed, ['status', 'attempts', 'next_attempt_at', 'last_error']
+            )
+
+        return {'sent': len(sent), 'retried': len(retried), 'failed': len(failed)}
+
+    def send(self, email):
+        connection = self.get_connection()
+        build_message(email, connection).send()
+        self.sent_on_connection += 1
+
+    def get_connection(self):
+        if self.connection is not None and self.sent_on_connection >= settings.EMAIL_OUTBOX_MESSAGES_PER_CONNECTION:
+            self.close()
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+            self.connection.open()
+            self.sent_on_connection = 0
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                logger.warning("Error closing mail connection", exc_info=True)
+            self.connection = None
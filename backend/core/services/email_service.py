@@ -1,11 +1,16 @@
+import html
 import logging
 import os
+import time
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any
+from itertools import islice
+from typing import Optional, List, Dict, Any, Callable, Iterable, Iterator, Tuple
 from django.conf import settings
-from django.template.loader import render_to_string
-from django.core.mail import EmailMultiAlternatives, send_mail
+from django.template import engines
+from django.template.loader import get_template, render_to_string
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
 from django.utils.html import strip_tags
+from .email_outbox import enqueue_email
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +22,16 @@ class EmailService:
     """
     Email service implementation using Django's email backend.
     This abstraction allows using SMTP (Google, etc.) or Console backend transparently.
+    
+    With EMAIL_USE_OUTBOX (the default) messages are queued in the database
+    outbox and delivered by `manage.py drain_email_outbox`, so requests never
+    wait on the SMTP relay. Pass immediate=True to send in-process instead.
     """
     
     def send_email(self, subject: str, to_emails: List[str], html_content: str = None, 
-                   text_content: str = None, from_email: str = None, attachments: List = None) -> Dict[str, Any]:
-        """Send email using Django's EmailBackend"""
+                   text_content: str = None, from_email: str = None, attachments: List = None,
+                   immediate: bool = False) -> Dict[str, Any]:
+        """Queue (or, with immediate=True or the outbox disabled, send) an email"""
         try:
             from_email = from_email or settings.DEFAULT_FROM_EMAIL
             
@@ -31,6 +41,22 @@ class EmailService:
             
             if not text_content and not html_content:
                 text_content = ""
+            
+            if settings.EMAIL_USE_OUTBOX and not immediate:
+                queued = enqueue_email(
+                    subject, to_emails,
+                    text_content=text_content,
+                    html_content=html_content,
+                    from_email=from_email,
+                    attachments=attachments
+                )
+                logger.info("Email %s to %s queued", queued.pk, to_emails)
+                return {
+                    "success": True,
+                    "message": "Email queued",
+                    "backend": "outbox",
+                    "id": queued.pk
+                }
 
             msg = EmailMultiAlternatives(
                 subject=subject,
@@ -131,3 +157,130 @@ def send_password_reset_email(to_email: str, reset_link: str, user_name: str = N
         subject='Password Reset Request',
         to_emails=[to_email]
     )
+
+
+def iter_templated_messages(template_name: str, subject: str,
+                            recipients: Iterable[Tuple[str, Dict[str, Any]]],
+                            from_email: str = None) -> Iterator[EmailMultiAlternatives]:
+    """
+    Lazily render one message per (email, context) recipient.
+
+    The body template and the subject (which may use template syntax, e.g.
+    "Fees due for {{ student_name }}") are compiled once; a missing template
+    raises TemplateDoesNotExist before anything is rendered. Subjects and
+    text bodies are plain text, so neither carries HTML escapes.
+    """
+    template = get_template(f"email_templates/{template_name}.html")
+    subject_template = engines['django'].from_string(f"{{% autoescape off %}}{subject}{{% endautoescape %}}")
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+
+    for to_email, context in recipients:
+        html_content = template.render(context)
+        msg = EmailMultiAlternatives(
+            subject=' '.join(subject_template.render(context).split()),
+            body=html.unescape(strip_tags(html_content)),
+            from_email=from_email,
+            to=[to_email]
+        )
+        msg.attach_alternative(html_content, "text/html")
+        yield msg
+
+
+def send_bulk_templated_email(template_name: str, subject: str,
+                              recipients: Iterable[Tuple[str, Dict[str, Any]]],
+                              from_email: str = None, chunk_size: int = None,
+                              progress: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
+    """
+    Send a templated email to many recipients, a chunk at a time.
+
+    Messages are rendered from a generator (so recipients can be streamed from
+    the database) and each chunk goes out with one send_messages() call on a
+    shared connection, reopened every EMAIL_OUTBOX_MESSAGES_PER_CONNECTION
+    messages or after a failed chunk. Meant for management commands and
+    workers: this sends synchronously and does not use the outbox. A chunk
+    whose send raises is counted as failed as a whole.
+
+    Args:
+        template_name: Template under email_templates/, without .html
+        subject: Subject line, rendered with each recipient's context
+        recipients: Iterable of (email, context) pairs
+        from_email: Sender (defaults to DEFAULT_FROM_EMAIL)
+        chunk_size: Messages per send_messages() call (defaults to settings.EMAIL_BULK_CHUNK_SIZE)
+        progress: Optional callable(chunk_metrics) run after each chunk
+
+    Returns:
+        Dict with sent and failed totals, elapsed seconds, messages_per_second,
+        per-chunk metrics (chunk, messages, sent, render_seconds, send_seconds,
+        messages_per_second) and per-chunk errors
+    """
+    chunk_size = chunk_size or settings.EMAIL_BULK_CHUNK_SIZE
+    messages = iter_templated_messages(template_name, subject, recipients, from_email)
+    chunks, errors = [], []
+    sent = failed = 0
+    connection = None
+    on_connection = 0
+    started = time.perf_counter()
+
+    try:
+        while True:
+            render_started = time.perf_counter()
+            chunk = list(islice(messages, chunk_size))
+            if not chunk:
+                break
+            render_seconds = time.perf_counter() - render_started
+
+            if connection is not None and on_connection >= settings.EMAIL_OUTBOX_MESSAGES_PER_CONNECTION:
+                connection.close()
+                connection = None
+            if connection is None:
+                connection = get_connection(fail_silently=False)
+                connection.open()
+                on_connection = 0
+
+            send_started = time.perf_counter()
+            try:
+                chunk_sent = connection.send_messages(chunk) or 0
+            except Exception as e:
+                chunk_sent = 0
+                errors.append(f"Chunk {len(chunks) + 1} ({chunk[0].to[0]}..{chunk[-1].to[0]}): {e}")
+                logger.error(f"Bulk email chunk {len(chunks) + 1} failed: {e}")
+                # The session may be broken; start the next chunk on a new one
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                connection = None
+            send_seconds = time.perf_counter() - send_started
+            on_connection += len(chunk)
+
+            sent += chunk_sent
+            failed += len(chunk) - chunk_sent
+            metrics = {
+                'chunk': len(chunks) + 1,
+                'messages': len(chunk),
+                'sent': chunk_sent,
+                'render_seconds': render_seconds,
+                'send_seconds': send_seconds,
+                'messages_per_second': len(chunk) / (render_seconds + send_seconds or 1e-9),
+            }
+            chunks.append(metrics)
+            logger.info(
+                f"Bulk email {template_name} chunk {metrics['chunk']}: {chunk_sent}/{len(chunk)} sent, "
+                f"render {render_seconds:.3f}s, send {send_seconds:.3f}s, "
+                f"{metrics['messages_per_second']:.0f} msg/s"
+            )
+            if progress:
+                progress(metrics)
+    finally:
+        if connection is not None:
+            connection.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'sent': sent,
+        'failed': failed,
+        'elapsed_seconds': elapsed,
+        'messages_per_second': (sent + failed) / elapsed if elapsed else 0.0,
+        'chunks': chunks,
+        'errors': errors,
+    }
@@ -0,0 +1,257 @@
+"""
+Web Push delivery for NotificationSubscription.
+
+``event_subscriptions`` resolves everyone an event is meant for (audience,
+target class and section, active users only) in one query. ``PushSender``
+fans a payload out to those endpoints from a bounded thread pool
+(PUSH_MAX_WORKERS), keeping one HTTP connection per push service per worker,
+retrying 429/5xx/network failures with backoff (honouring Retry-After) and
+deleting subscriptions the push service reports as gone (404/410).
+
+Payloads are encrypted (RFC 8291, aes128gcm) and requests VAPID-signed when
+the optional ``pywebpush`` package is installed and WEBPUSH_VAPID_PRIVATE_KEY
+is set. Without it, pushes are sent without a payload and the service worker
+fetches what changed.
+"""
+import http.client
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from core.models import Event, NotificationSubscription
+
+try:
+    from py_vapid import Vapid
+    from pywebpush import WebPusher
+except ImportError:
+    Vapid = WebPusher = None
+
+logger = logging.getLogger(__name__)
+
+STAFF_ROLES = ['admin', 'teacher']
+
+# Subscription is expired or unsubscribed; never retry it
+GONE_STATUSES = (404, 410)
+
+
+def event_subscriptions(event):
+    """Push subscriptions of every active user the event is addressed to, as rows of (id, endpoint, p256dh, auth)"""
+    subscriptions = NotificationSubscription.objects.all_tenants().filter(
+        school_id=event.school_id, user__is_active=True
+    )
+
+    if event.audience == 'staff':
+        subscriptions = subscriptions.filter(user__role__in=STAFF_ROLES)
+    elif event.audience == 'class':
+        # Staff see every class event (see Event.visible_to); students and
+        # parents only those for their class/section
+        target = {}
+        if event.target_class_id:
+            target['class_obj_id'] = event.target_class_id
+        if event.target_section_id:
+            target['section_id'] = event.target_section_id
+        subscriptions = subscriptions.filter(
+            Q(user__role__in=STAFF_ROLES)
+            | Q(**{f'user__student_profile__{field}': value for field, value in target.items()})
+            | Q(**{f'user__parent_profile__student__{field}': value for field, value in target.items()})
+        )
+
+    return subscriptions.order_by('id').values_list('id', 'endpoint', 'p256dh', 'auth')
+
+
+def event_payload(event):
+    """Notification shown by the service worker for an event"""
+    return {
+        'title': event.title,
+        'body': event.description[:200] or event.start_datetime.strftime('%d %b %Y, %H:%M'),
+        'tag': f'event-{event.pk}',
+        'data': {
+            'type': 'event',
+            'event_id': event.pk,
+            'event_type': event.event_type,
+            'start': event.start_datetime.isoformat(),
+        },
+    }
+
+
+class PushSender:
+    """
+    Sends one payload to many subscriptions concurrently.
+    Create one per fan-out; send() closes its connections when done.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or settings.PUSH_MAX_WORKERS
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.open_connections = []
+        self.vapid = None
+        self.vapid_headers = {}
+        if Vapid is not None and settings.WEBPUSH_VAPID_PRIVATE_KEY:
+            self.vapid = Vapid.from_string(private_key=settings.WEBPUSH_VAPID_PRIVATE_KEY)
+
+    def send(self, subscriptions, payload):
+        """
+        Deliver ``payload`` to (id, endpoint, p256dh, auth) rows and prune gone subscriptions.
+
+        Returns:
+            dict: counts of delivered, failed and pruned subscriptions
+        """
+        data = json.dumps(payload).encode()
+        outcomes = {'delivered': 0, 'failed': 0, 'gone': []}
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='push') as pool:
+                for subscription_id, outcome in pool.map(lambda row: self.deliver(row, data), subscriptions):
+                    if outcome == 'gone':
+                        outcomes['gone'].append(subscription_id)
+                    else:
+                        outcomes[outcome] += 1
+        finally:
+            self.close()
+
+        if outcomes['gone']:
+            NotificationSubscription.objects.all_tenants().filter(pk__in=outcomes['gone']).delete()
+
+        return {'delivered': outcomes['delivered'], 'failed': outcomes['failed'], 'pruned': len(outcomes['gone'])}
+
+    def deliver(self, row, data):
+        """Send to one subscription with retries; returns (id, 'delivered' | 'failed' | 'gone')"""
+        subscription_id, endpoint, p256dh, auth = row
+        try:
+            headers, body = self.encode(endpoint, p256dh, auth, data)
+        except Exception as e:
+            logger.warning("Push subscription %s has unusable keys: %s", subscription_id, e)
+            return subscription_id, 'failed'
+
+        for attempt in range(1, settings.PUSH_MAX_ATTEMPTS + 1):
+            retry_after = None
+            try:
+                status, retry_after = self.post(endpoint, headers, body)
+            except (http.client.HTTPException, OSError) as e:
+                status, error = None, f'{type(e).__name__}: {e}'
+            else:
+                error = f'HTTP {status}'
+                if 200 <= status < 300:
+                    return subscription_id, 'delivered'
+                if status in GONE_STATUSES:
+                    return subscription_id, 'gone'
+                if status != 429 and status < 500:
+                    logger.warning("Push to subscription %s rejected: %s", subscription_id, error)
+                    return subscription_id, 'failed'
+
+            if attempt < settings.PUSH_MAX_ATTEMPTS:
+                time.sleep(self.retry_delay(attempt, retry_after))
+
+        logger.warning("Push to subscription %s failed after %d attempts: %s",
+                       subscription_id, settings.PUSH_MAX_ATTEMPTS, error)
+        return subscription_id, 'failed'
+
+    def retry_delay(self, attempt, retry_after=None):
+        if retry_after and retry_after.isdigit():
+            delay = int(retry_after)
+        else:
+            delay = settings.PUSH_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+        return min(delay, settings.PUSH_RETRY_MAX_SECONDS)
+
+    def encode(self, endpoint, p256dh, auth, data):
+        """Request headers and body for one subscription"""
+        headers = {'TTL': str(settings.PUSH_TTL_SECONDS), 'Content-Length': '0'}
+        body = b''
+
+        if WebPusher is not None and p256dh and auth:
+            encoded = WebPusher({'endpoint': endpoint, 'keys': {'p256dh': p256dh, 'auth': auth}}).encode(
+                data, content_encoding='aes128gcm'
+            )
+            body = encoded['body']
+            headers.update({
+                'Content-Encoding': 'aes128gcm',
+                'Content-Type': 'application/octet-stream',
+                'Content-Length': str(len(body)),
+            })
+
+        if self.vapid is not None:
+            headers.update(self.vapid_headers_for(endpoint))
+        return headers, body
+
+    def vapid_headers_for(self, endpoint):
+        # One signature per push service (and 12 hours) instead of one per subscription
+        parts = urlsplit(endpoint)
+        audience = f'{parts.scheme}://{parts.netloc}'
+        cached = self.vapid_headers.get(audience)
+        if cached is None or cached[0] < time.time() + 60:
+            expires = int(time.time()) + 12 * 3600
+            signed = self.vapid.sign({'aud': audience, 'sub': settings.WEBPUSH_VAPID_SUBJECT, 'exp': expires})
+            cached = self.vapid_headers[audience] = (expires, signed)
+        return cached[1]
+
+    def post(self, endpoint, headers, body):
+        """POST over this thread's keep-alive connection to the push service; returns (status, Retry-After)"""
+        parts = urlsplit(endpoint)
+        key = (parts.scheme, parts.netloc)
+        pool = getattr(self.local, 'connections', None)
+        if pool is None:
+            pool = self.local.connections = {}
+
+        connection = pool.get(key)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+            connection = pool[key] = connection_class(parts.netloc, timeout=settings.PUSH_TIMEOUT_SECONDS)
+            with self.lock:
+                self.open_connections.append(connection)
+
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+        try:
+            connection.request('POST', path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            # Drop the broken connection; the retry opens a new one
+            connection.close()
+            del pool[key]
+            raise
+        return response.status, response.getheader('Retry-After')
+
+    def close(self):
+        with self.lock:
+            for connection in self.open_connections:
+                connection.close()
+            self.open_connections = []
+
+
+def push_event(event_id):
+    """Send an event's notification to its audience; returns the delivery counts"""
+    event = Event.objects.all_tenants().filter(pk=event_id, is_active=True).first()
+    if event is None:
+        return {'delivered': 0, 'failed': 0, 'pruned': 0}
+
+    result = PushSender().send(event_subscriptions(event), event_payload(event))
+    logger.info("Event %s push: %d delivered, %d failed, %d pruned",
+                event_id, result['delivered'], result['failed'], result['pruned'])
+    return result
+
+
+def schedule_event_push(event):
+    """Push the event from a background thread once the current transaction commits"""
+    if not settings.PUSH_NOTIFICATIONS_ENABLED:
+        return
+    transaction.on_commit(
+        lambda: threading.Thread(target=_push_event_in_thread, args=(event.pk,), daemon=True).start()
+    )
+
+
+def _push_event_in_thread(event_id):
+    try:
+        push_event(event_id)
+    except Exception:
+        logger.exception(f"Push for event {event_id} failed")
+    finally:
+        # The thread owns its database connection; don't leak it
+        connections.close_all()
@@ -1,43 +1,59 @@
 """
 Tenant context management for multi-tenant architecture.
-Provides thread-local storage for current tenant (school) context.
+
+The current tenant (school) lives in a context variable, so it follows the
+code that set it: each request, asyncio task and ``sync_to_async`` hop sees
+its own value, and ``asgiref`` carries it between async and sync code. Work
+handed to thread or process pools does not inherit it automatically; submit
+it with ``submit_with_tenant`` (or wrap it with ``bind_tenant`` /
+``TenantTask``).
 """
-import threading
+import contextvars
+import functools
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+# Sentinel for "no tenant set" (super admin context), as opposed to an explicit None
+_UNSET = object()
+
+_current_tenant = contextvars.ContextVar('current_tenant', default=_UNSET)
 
 
 class TenantContext:
     """
-    Thread-local tenant context storage.
-    Stores the current school (tenant) for the active request.
+    Context-local tenant context storage.
+    Stores the current school (tenant) for the active request or task.
     """
-    _thread_local = threading.local()
     
     @classmethod
     def get_current_tenant(cls) -> Optional['School']:
         """
-        Get the current tenant (school) from thread-local storage.
+        Get the current tenant (school) for the running context.
         
         Returns:
             School instance or None if not set or super admin
         """
-        return getattr(cls._thread_local, 'tenant', None)
+        tenant = _current_tenant.get()
+        return None if tenant is _UNSET else tenant
     
     @classmethod
     def set_current_tenant(cls, school: Optional['School']) -> None:
         """
-        Set the current tenant (school) in thread-local storage.
+        Set the current tenant (school) for the running context.
         
         Args:
             school: School instance or None for super admin
         """
-        cls._thread_local.tenant = school
+        _current_tenant.set(school)
     
     @classmethod
     def clear_tenant(cls) -> None:
-        """Clear the current tenant from thread-local storage."""
-        if hasattr(cls._thread_local, 'tenant'):
-            delattr(cls._thread_local, 'tenant')
+        """Clear the current tenant for the running context."""
+        _current_tenant.set(_UNSET)
     
     @classmethod
     def is_super_admin_context(cls) -> bool:
@@ -47,7 +63,7 @@ class TenantContext:
         Returns:
             True if super admin context, False otherwise
         """
-        return not hasattr(cls._thread_local, 'tenant') or cls._thread_local.tenant is None
+        return cls.get_current_tenant() is None
 
 
 class tenant_context:
@@ -62,13 +78,115 @@ class tenant_context:
     
     def __init__(self, school: Optional['School']):
         self.school = school
-        self.previous_tenant = None
+        self._token = None
     
     def __enter__(self):
-        self.previous_tenant = TenantContext.get_current_tenant()
-        TenantContext.set_current_tenant(self.school)
+        self._token = _current_tenant.set(self.school)
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        TenantContext.set_current_tenant(self.previous_tenant)
+        _current_tenant.reset(self._token)
         return False
+
+
+def bind_tenant(fn):
+    """
+    Wrap ``fn`` so it runs under the tenant current at wrapping time, in
+    whichever thread calls it (e.g. a ThreadPoolExecutor worker).
+    """
+    context = contextvars.copy_context()
+    
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        # A context can't be entered by two threads at once, so run each call in its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    
+    return bound
+
+
+class TenantTask:
+    """
+    Picklable wrapper that runs ``fn`` under the caller's tenant in another process.
+    
+    Only the school ID crosses the process boundary; the worker re-enters the
+    tenant with ``tenant_context``. ``fn`` must be importable (module level) and
+    the worker must have Django set up (e.g. ``initializer=django.setup``).
+    """
+    
+    def __init__(self, fn):
+        self.fn = fn
+        tenant = TenantContext.get_current_tenant()
+        self.school_id = tenant.pk if tenant is not None else None
+    
+    def __call__(self, *args, **kwargs):
+        school = None
+        if self.school_id is not None:
+            from accounts.models import School
+            school = get_cached_school(self.school_id) or School.objects.get(pk=self.school_id)
+        with tenant_context(school):
+            return self.fn(*args, **kwargs)
+
+
+def submit_with_tenant(executor, fn, *args, **kwargs):
+    """``executor.submit(fn, ...)`` that runs ``fn`` under the caller's tenant (thread or process pools)"""
+    if isinstance(executor, ProcessPoolExecutor):
+        return executor.submit(TenantTask(fn), *args, **kwargs)
+    return executor.submit(bind_tenant(fn), *args, **kwargs)
+
+
+def _school_cache_key(school_id):
+    return f'tenant_school:{school_id}'
+
+
+def get_cached_school(school_id) -> Optional['School']:
+    """
+    School from the short-lived tenant cache, or None on a miss.
+    Never queries the database.
+    """
+    if not school_id:
+        return None
+    return cache.get(_school_cache_key(school_id))
+
+
+def cache_school(school) -> None:
+    """Store a loaded School for settings.TENANT_SCHOOL_CACHE_TTL seconds"""
+    if school is not None:
+        cache.set(_school_cache_key(school.pk), school, settings.TENANT_SCHOOL_CACHE_TTL)
+
+
+def forget_cached_school(school_id) -> None:
+    """Drop a school from the tenant cache now"""
+    cache.delete(_school_cache_key(school_id))
+
+
+def invalidate_cached_school(school_id) -> None:
+    """Drop a school from the tenant cache once the current transaction commits"""
+    transaction.on_commit(lambda: forget_cached_school(school_id))
+
+
+def resolve_tenant(user) -> Optional['School']:
+    """
+    School a user's requests are scoped to (None for super admins and users
+    without a school).
+
+    The school attached to the user (e.g. by TenantJWTAuthentication) is reused;
+    otherwise it comes from the tenant cache, falling back to one query. Either
+    way it is attached to the user, so every later ``user.school`` in the
+    request is free.
+    """
+    if user.is_super_admin() or not user.school_id:
+        return None
+
+    if not hasattr(type(user), '_meta'):
+        # Not a model instance (e.g. a ClaimsUser): it resolves its own school
+        return user.school
+
+    school_field = user._meta.get_field('school')
+    if not school_field.is_cached(user):
+        school = get_cached_school(user.school_id)
+        if school is None:
+            school = user.school
+            cache_school(school)
+        else:
+            school_field.set_cached_value(user, school)
+    return user.school
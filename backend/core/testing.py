@@ -0,0 +1,12 @@
+"""
+Shared helpers for the apps' test suites.
+"""
+from rest_framework.test import APIClient
+from .authentication import TenantRefreshToken
+
+
+def api_client(user):
+    """APIClient authenticated as ``user`` with a tenant access token."""
+    client = APIClient(HTTP_HOST='localhost')
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {TenantRefreshToken.for_user(user).access_token}')
+    return client
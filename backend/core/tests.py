@@ -1,3 +1,978 @@
-from django.test import TestCase
+"""Tests for the core app."""
+import io
+import random
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.template import TemplateDoesNotExist
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import School, User
+from academic.models import Class, ClassRoom, Period, Section, Subject, SubjectAssignment
+from academic.timetable_generator import generate_timetable
+from attendance.models import StaffAttendance
+from core.authentication import (
+    SCHOOL_ID_CLAIM, ClaimsJWTAuthentication, TenantJWTAuthentication, TenantRefreshToken
+)
+from core.benchmarking import format_table, seed_school, seed_students
+from core.instrumentation import RequestMetrics, _Registry
+from core.models import Event, NotificationSubscription, OutboundEmail
+from core.tenant import cache_school
+from core.testing import api_client
+from core.services.email_outbox import OutboxSender, enqueue_email
+from core.services import email_service as email_service_module
+from core.services.email_service import email_service, send_bulk_templated_email
+from core.services.push import PushSender, event_subscriptions, push_event
+from exams.models import Exam, ExamResult, ExamSchedule
+from fees.models import FeeStructure, Invoice
+from students.models import ParentProfile, StudentProfile
 
-# Create your tests here.
+
+# Maximum queries per request, by URL name. Counts include authentication and
+# the tenant lookup (the tenant cache is cleared before every request).
+QUERY_BUDGETS = {
+    'school-list': 3,
+    'school-detail': 2,
+    'teacherprofile-list': 4,
+    'teacherprofile-detail': 3,
+    'class-list': 4,
+    'class-detail': 3,
+    'section-list': 3,
+    'section-detail': 2,
+    'subject-list': 3,
+    'subject-detail': 2,
+    'assignment-list': 3,
+    'assignment-detail': 2,
+    'period-list': 3,
+    'period-detail': 2,
+    'timetable-list': 3,
+    'timetable-detail': 2,
+    'class-room-list': 3,
+    'class-room-detail': 2,
+    'student-list': 4,
+    'student-detail': 3,
+    'admission-form-config-list': 3,
+    'admission-form-config-detail': 2,
+    'attendance-list': 3,
+    'attendance-detail': 2,
+    'staff-attendance-list': 3,
+    'staff-attendance-detail': 2,
+    'feestructure-list': 4,
+    'feestructure-detail': 3,
+    'invoice-list': 3,
+    'invoice-detail': 2,
+    'payment-list': 3,
+    'payment-detail': 2,
+    'exam-list': 3,
+    'exam-detail': 2,
+    'examresult-list': 3,
+    'examresult-detail': 2,
+    'exam-schedule-list': 3,
+    'exam-schedule-detail': 2,
+    'event-list': 3,
+    'event-detail': 2,
+    'push-subscription-list': 3,
+    'push-subscription-detail': 2,
+}
+
+
+def router_endpoints():
+    """(URL name, action) for every viewset list and detail route in school_erp.urls"""
+    endpoints = {}
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+                continue
+            actions = getattr(pattern.callback, 'actions', None)
+            name = pattern.name or ''
+            if not actions or actions.get('get') not in ('list', 'retrieve'):
+                continue
+            if name.endswith('-list') or name.endswith('-detail'):
+                endpoints[name] = actions['get']
+
+    walk(get_resolver().url_patterns)
+    return sorted(endpoints.items())
+
+
+# Fast hashing for the thousands of seeded users; logins aren't measured here
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EndpointQueryBudgetTests(TestCase):
+    """
+    Query-budget regression tests for every router-registered API endpoint.
+
+    Seeds the multi-school demo dataset (create_demo_data) plus rows for the
+    endpoints it doesn't cover, then requests each list and detail endpoint in
+    school_erp.urls as a school admin and checks the number of queries against
+    QUERY_BUDGETS. A per-row (N+1) query added to any serializer or view pushes
+    its endpoint over budget. A report table is printed after the run.
+    """
+    report = []
+
+    @classmethod
+    def setUpTestData(cls):
+        random.seed(20)
+        call_command('create_demo_data', stdout=io.StringIO())
+
+        cls.school = School.objects.get(name='Demo International School')
+        cls.admin = User.objects.get(school=cls.school, role='admin')
+        seed_uncovered_models(cls.school, cls.admin)
+
+        # Rows in another school must never show up (or cost queries) here
+        other_school = School.objects.get(name='Demo Public School')
+        seed_uncovered_models(other_school, User.objects.get(school=other_school, role='admin'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.report:
+            print('\n' + format_table(['endpoint', 'status', 'rows', 'queries', 'budget'], cls.report))
+
+    def setUp(self):
+        self.client = api_client(self.admin)
+
+    def get(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, len(ctx.captured_queries)
+
+    def test_every_endpoint_has_a_budget(self):
+        missing = [name for name, _ in router_endpoints() if name not in QUERY_BUDGETS]
+        self.assertEqual(missing, [], 'Add these endpoints to QUERY_BUDGETS')
+
+    def test_endpoints_stay_within_query_budget(self):
+        for name, action in router_endpoints():
+            if action != 'list':
+                continue
+            with self.subTest(endpoint=name):
+                response, queries = self.get(reverse(name))
+                rows = response.data.get('results', response.data) if response.status_code == 200 else []
+                self.report.append([name, response.status_code, len(rows), queries, QUERY_BUDGETS.get(name)])
+
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(rows, f'{name} returned no rows; seed some so per-row queries show')
+                self.assertLessEqual(queries, QUERY_BUDGETS[name])
+
+                detail_name = name[:-len('-list')] + '-detail'
+                if detail_name not in dict(router_endpoints()):
+                    continue
+                response, queries = self.get(reverse(detail_name, kwargs={'pk': rows[0]['id']}))
+                self.report.append([detail_name, response.status_code, 1, queries, QUERY_BUDGETS.get(detail_name)])
+
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(queries, QUERY_BUDGETS[detail_name])
+
+
+def seed_uncovered_models(school, admin):
+    """Periods, rooms, assignments, a timetable, staff attendance, exam schedules, events and push subscriptions"""
+    academic_year = Class.objects.all_tenants().filter(school=school).values_list('academic_year', flat=True).first()
+    sections = list(
+        Section.objects.all_tenants().filter(school=school, students__isnull=False)
+        .distinct().select_related('class_obj')
+    )
+    subjects = list(Subject.objects.all_tenants().filter(school=school, type='core').order_by('code'))
+
+    Period.objects.bulk_create([
+        Period(school=school, name=f'Period {i}', order=i, start_time=time(8 + i), end_time=time(8 + i, 45))
+        for i in range(1, 7)
+    ])
+    lab = ClassRoom.objects.create(school=school, name='Science Lab', capacity=40)
+
+    assignments = []
+    for subject in subjects:
+        teacher = subject.teachers.first()
+        for section in sections:
+            assignments.append(SubjectAssignment(
+                school=school,
+                class_obj=section.class_obj,
+                section=section,
+                subject=subject,
+                teacher=teacher,
+                room=lab if subject.code == 'SCI' and section.name == 'A' else None,
+                periods_per_week=2,
+                academic_year=academic_year,
+            ))
+    SubjectAssignment.objects.bulk_create(assignments)
+    result = generate_timetable(school, academic_year, seed=1, apply=True, user=admin)
+    assert result['complete'], result['errors']
+
+    today = timezone.now().date()
+    StaffAttendance.objects.bulk_create([
+        StaffAttendance(school=school, user=teacher, date=today - timedelta(days=day), status='present', marked_by=admin)
+        for teacher in User.objects.filter(school=school, role='teacher')
+        for day in range(3)
+    ])
+
+    for exam in Exam.objects.all_tenants().filter(school=school):
+        ExamSchedule.objects.bulk_create([
+            ExamSchedule(
+                exam=exam, subject=subject, date=exam.start_date + timedelta(days=i),
+                start_time=time(9), end_time=time(12), max_marks=100
+            )
+            for i, subject in enumerate(subjects)
+        ])
+
+    Event.objects.bulk_create([
+        Event(
+            school=school, title=f'Event {i}', event_type='other', audience='global',
+            start_datetime=timezone.now() + timedelta(days=i), created_by=admin
+        )
+        for i in range(25)
+    ])
+
+    NotificationSubscription.objects.bulk_create([
+        NotificationSubscription(
+            school=school, user=admin, endpoint=f'https://push.example.com/{school.pk}/{i}',
+            browser='firefox', device_type='desktop'
+        )
+        for i in range(3)
+    ])
+
+
+class RelayBackend(LocmemEmailBackend):
+    """locmem backend counting connection opens; rejects recipients in ``failing``"""
+    opened = 0
+    failing = set()
+
+    def open(self):
+        RelayBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.failing.intersection(message.to):
+                raise ConnectionRefusedError(f'Relay refused {message.to}')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='core.tests.RelayBackend',
+    EMAIL_USE_OUTBOX=True,
+    EMAIL_OUTBOX_BATCH_SIZE=10,
+    EMAIL_OUTBOX_MESSAGES_PER_CONNECTION=4,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS=30,
+    EMAIL_OUTBOX_RETRY_MAX_SECONDS=3600,
+)
+class EmailOutboxTests(TestCase):
+
+    def setUp(self):
+        RelayBackend.opened = 0
+        RelayBackend.failing = set()
+
+    def test_send_email_queues_until_drained(self):
+        result = email_service.send_email(
+            'Fee reminder', ['parent@example.com'], html_content='<p>Fees are <b>due</b></p>',
+            attachments=[('invoice.txt', b'INV-1', 'text/plain')]
+        )
+        self.assertEqual(result['backend'], 'outbox')
+        self.assertEqual(mail.outbox, [])
+
+        counts = OutboxSender().drain()
+
+        self.assertEqual(counts, {'sent': 1, 'retried': 0, 'failed': 0})
+        [message] = mail.outbox
+        self.assertEqual(message.to, ['parent@example.com'])
+        self.assertEqual(message.body, 'Fees are due')
+        self.assertEqual(message.alternatives, [('<p>Fees are <b>due</b></p>', 'text/html')])
+        self.assertEqual(message.attachments, [('invoice.txt', 'INV-1', 'text/plain')])
+
+        email = OutboundEmail.objects.get(pk=result['id'])
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+        self.assertIsNotNone(email.sent_at)
+
+    def test_immediate_send_bypasses_outbox(self):
+        email_service.send_email('Now', ['a@example.com'], text_content='hi', immediate=True)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_connection_reused_across_batch(self):
+        for i in range(10):
+            enqueue_email(f'Notice {i}', [f'user{i}@example.com'], text_content='hello')
+
+        sender = OutboxSender()
+        counts = sender.drain()
+        sender.close()
+
+        self.assertEqual(counts['sent'], 10)
+        self.assertEqual(len(mail.outbox), 10)
+        # Reopened every EMAIL_OUTBOX_MESSAGES_PER_CONNECTION messages
+        self.assertEqual(RelayBackend.opened, 3)
+
+    def test_failures_back_off_then_give_up(self):
+        RelayBackend.failing = {'bounce@example.com'}
+        enqueue_email('Bad', ['bounce@example.com'], text_content='x')
+        good = enqueue_email('Good', ['ok@example.com'], text_content='x')
+        sender = OutboxSender()
+
+        counts = sender.drain()
+        self.assertEqual(counts, {'sent': 1, 'retried': 1, 'failed': 0})
+        self.assertEqual(OutboundEmail.objects.get(pk=good.pk).status, 'sent')
+        # The refused connection was dropped and reopened for the next message
+        self.assertEqual(RelayBackend.opened, 2)
+
+        bad = OutboundEmail.objects.get(subject='Bad')
+        self.assertEqual((bad.status, bad.attempts), ('pending', 1))
+        self.assertIn('ConnectionRefusedError', bad.last_error)
+        delay = (bad.next_attempt_at - timezone.now()).total_seconds()
+        self.assertTrue(25 < delay <= 30, delay)
+
+        # Not due yet: nothing to do
+        self.assertEqual(sender.drain(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+        OutboundEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+        sender.drain()
+        bad.refresh_from_db()
+        self.assertEqual(bad.attempts, 2)
+        delay = (bad.next_attempt_at - timezone.now()).total_seconds()
+        self.assertTrue(55 < delay <= 60, delay)
+
+        OutboundEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(sender.drain(), {'sent': 0, 'retried': 0, 'failed': 1})
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), ('failed', 3))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_stale_claims_are_resent(self):
+        email = enqueue_email('Stuck', ['a@example.com'], text_content='x')
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            status='sending', claimed_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(OutboxSender().drain()['sent'], 1)
+
+    def test_rolled_back_work_sends_nothing(self):
+        try:
+            with transaction.atomic():
+                email_service.send_email('Welcome', ['a@example.com'], text_content='x')
+                raise RuntimeError('registration failed')
+        except RuntimeError:
+            pass
+
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_registration_otp_is_queued(self):
+        response = APIClient(HTTP_HOST='localhost').post(reverse('register-school-admin'), {
+            'username': 'newadmin', 'email': 'newadmin@example.com',
+            'first_name': 'New', 'last_name': 'Admin',
+            'password': 'Str0ng-pass-99', 'password_confirm': 'Str0ng-pass-99',
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboundEmail.objects.get().to, ['newadmin@example.com'])
+
+        call_command('drain_email_outbox', stdout=io.StringIO())
+        self.assertEqual(mail.outbox[0].subject, 'CampusIQ - Verify your email')
+
+
+@override_settings(
+    EMAIL_BACKEND='core.tests.RelayBackend',
+    EMAIL_BULK_CHUNK_SIZE=10,
+    EMAIL_OUTBOX_MESSAGES_PER_CONNECTION=1000,
+)
+class BulkTemplatedEmailTests(TestCase):
+
+    def setUp(self):
+        RelayBackend.opened = 0
+        RelayBackend.failing = set()
+        self.consumed = 0
+
+    def recipients(self, count):
+        for i in range(count):
+            self.consumed += 1
+            yield f'parent{i}@example.com', {
+                'school_name': 'Test School', 'parent_name': f'Parent {i}', 'student_name': f'Student {i}',
+                'invoice_number': f'INV-{i}', 'amount_due': '1500.00', 'due_date': date(2025, 7, 1),
+            }
+
+    def test_chunks_share_one_connection_and_template(self):
+        chunks_seen = []
+        with mock.patch.object(email_service_module, 'get_template', wraps=email_service_module.get_template) as loader:
+            result = send_bulk_templated_email(
+                'fee_reminder', 'Fee due for {{ student_name }}', self.recipients(25),
+                progress=lambda metrics: chunks_seen.append((metrics['messages'], self.consumed)),
+            )
+
+        loader.assert_called_once_with('email_templates/fee_reminder.html')
+        self.assertEqual(RelayBackend.opened, 1)
+        self.assertEqual((result['sent'], result['failed'], result['errors']), (25, 0, []))
+        self.assertEqual([c['messages'] for c in result['chunks']], [10, 10, 5])
+        for chunk in result['chunks']:
+            self.assertGreater(chunk['messages_per_second'], 0)
+        # Recipients are rendered as each chunk is sent, not all up front
+        self.assertEqual(chunks_seen, [(10, 10), (10, 20), (5, 25)])
+
+        self.assertEqual(len(mail.outbox), 25)
+        message = mail.outbox[3]
+        self.assertEqual(message.to, ['parent3@example.com'])
+        self.assertEqual(message.subject, 'Fee due for Student 3')
+        self.assertIn('INV-3', message.body)
+        self.assertIn('01 Jul 2025', message.alternatives[0][0])
+
+    def test_subject_and_text_body_are_not_html_escaped(self):
+        recipients = [('parent@example.com', {
+            'school_name': 'Test School', 'parent_name': "O'Brien & co", 'student_name': "Sean O'Brien",
+            'invoice_number': 'INV-1', 'amount_due': '1500.00', 'due_date': date(2025, 7, 1),
+        })]
+
+        send_bulk_templated_email('fee_reminder', 'Fee due for {{ student_name }}', recipients)
+
+        message = mail.outbox[0]
+        self.assertEqual(message.subject, "Fee due for Sean O'Brien")
+        self.assertIn("O'Brien & co", message.body)
+        self.assertNotIn('&amp;', message.body)
+        # The HTML part stays escaped
+        self.assertIn('O&#x27;Brien &amp; co', message.alternatives[0][0])
+
+    def test_missing_template_fails_before_sending(self):
+        with self.assertRaises(TemplateDoesNotExist):
+            send_bulk_templated_email('no_such_template', 'Hi', self.recipients(5))
+
+        self.assertEqual(self.consumed, 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_failed_chunk_reopens_connection(self):
+        RelayBackend.failing = {'parent12@example.com'}
+
+        result = send_bulk_templated_email('fee_reminder', 'Fees', self.recipients(25))
+
+        self.assertEqual([c['sent'] for c in result['chunks']], [10, 0, 5])
+        self.assertEqual((result['sent'], result['failed']), (15, 10))
+        self.assertEqual(len(result['errors']), 1)
+        self.assertEqual(RelayBackend.opened, 2)
+
+    @override_settings(EMAIL_OUTBOX_MESSAGES_PER_CONNECTION=20)
+    def test_connection_recycled_between_chunks(self):
+        send_bulk_templated_email('fee_reminder', 'Fees', self.recipients(45))
+
+        self.assertEqual(RelayBackend.opened, 3)
+        self.assertEqual(len(mail.outbox), 45)
+
+    def test_parent_mailings(self):
+        school, admin, class_obj, section = seed_school('MAILING')
+        students = seed_students(school, class_obj, section, 4)
+        ParentProfile.objects.bulk_create([
+            ParentProfile(school=school, student=student, relation=relation, name=f'{relation} {i}',
+                          email=f'{relation}{i}@example.com' if i < 3 else '')
+            for i, student in enumerate(students)
+            for relation in ('father', 'mother')
+        ])
+
+        structure = FeeStructure.objects.create(
+            school=school, name='Annual', academic_year='2025-26', class_obj=class_obj, total_amount=Decimal('1000')
+        )
+        Invoice.objects.bulk_create([
+            Invoice(
+                school=school, invoice_number=f'INV-{i}', student=student, fee_structure=structure,
+                total_amount=Decimal('1000'), paid_amount=Decimal(paid), remaining_amount=Decimal(1000 - paid),
+                status=status, due_date=date(2025, 7, 1), created_by=admin
+            )
+            for i, (student, paid, status) in enumerate(zip(students, (0, 400, 1000, 0), ('pending', 'partial', 'paid', 'pending')))
+        ])
+
+        call_command('send_parent_mailing', 'fee-reminders', school='MAILING', stdout=io.StringIO())
+
+        # Students 0 and 1 owe fees; student 3's parents have no email
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [
+            'father0@example.com', 'father1@example.com', 'mother0@example.com', 'mother1@example.com'
+        ])
+        reminder = next(m for m in mail.outbox if m.to == ['father1@example.com'])
+        self.assertEqual(reminder.subject, 'Fee reminder for Student 1 - INV-1')
+        self.assertIn('600.00', reminder.body)
+
+        mail.outbox = []
+        subject = Subject.objects.create(school=school, name='Maths', code='MATH', type='core')
+        exam = Exam.objects.create(school=school, name='Term 1', exam_type='mid_term', academic_year='2025-26')
+        ExamResult.objects.create(
+            school=school, exam=exam, student=students[2], subject=subject,
+            marks_obtained=Decimal('80'), max_marks=Decimal('100'), entered_by=admin
+        )
+
+        call_command('send_parent_mailing', 'report-cards', school='MAILING', exam=exam.pk, stdout=io.StringIO())
+
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['father2@example.com', 'mother2@example.com'])
+        self.assertEqual(mail.outbox[0].subject, 'Term 1 report card for Student 2')
+
+
+class StubPushHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        service = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with service.lock:
+            service.active += 1
+            service.max_active = max(service.max_active, service.active)
+            service.requests.append((self.path, dict(self.headers), body))
+            service.clients.add(self.client_address)
+            tries = service.tries[self.path] = service.tries.get(self.path, 0) + 1
+        sleep(0.01)
+
+        kind = self.path.split('/')[1]
+        if kind == 'gone':
+            status = 410
+        elif kind == 'bad':
+            status = 400
+        elif kind == 'down' or (kind == 'flaky' and tries == 1):
+            status = 503
+        else:
+            status = 201
+
+        with service.lock:
+            service.active -= 1
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubPushService(ThreadingHTTPServer):
+    """
+    Local push service. By first path segment: /gone/ answers 410, /bad/ 400,
+    /down/ 503, /flaky/ 503 on the first try then 201, anything else 201.
+    Records requests, client connections and peak concurrency.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubPushHandler)
+        self.lock = threading.Lock()
+        self.requests, self.clients, self.tries = [], set(), {}
+        self.active = self.max_active = 0
+        self.url = f'http://127.0.0.1:{self.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+@override_settings(
+    PUSH_MAX_WORKERS=4,
+    PUSH_MAX_ATTEMPTS=3,
+    PUSH_RETRY_BASE_SECONDS=0,
+    WEBPUSH_VAPID_PRIVATE_KEY='',
+)
+class PushDeliveryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section = seed_school('PUSH')
+        other_section = Section.objects.create(school=cls.school, class_obj=cls.class_obj, name='B', code='C10-B')
+        student_a, student_b = seed_students(cls.school, cls.class_obj, cls.section, 2)
+        StudentProfile.objects.filter(pk=student_b.pk).update(section=other_section)
+
+        def user(name, role, **extra):
+            return User.objects.create_user(
+                username=name, email=f'{name}@push.local', password=None, role=role, school=cls.school, **extra
+            )
+
+        cls.users = {
+            'admin': cls.admin,
+            'teacher': user('teacher', 'teacher'),
+            'student_a': user('student_a', 'student'),
+            'student_b': user('student_b', 'student'),
+            'parent_a': user('parent_a', 'parent'),
+            'inactive': user('inactive', 'teacher', is_active=False),
+        }
+        StudentProfile.objects.filter(pk=student_a.pk).update(user=cls.users['student_a'])
+        StudentProfile.objects.filter(pk=student_b.pk).update(user=cls.users['student_b'])
+        ParentProfile.objects.create(
+            school=cls.school, student=student_a, relation='mother', name='Parent A', user=cls.users['parent_a']
+        )
+
+    def subscribe(self, base_url, paths=None):
+        """One subscription per user, or one per given (user, path); returns {endpoint: user name}"""
+        rows = paths or [(name, f'/ok/{name}') for name in self.users]
+        return {
+            NotificationSubscription.objects.create(
+                school=self.school, user=self.users[name], endpoint=f'{base_url}{path}'
+            ).endpoint: name
+            for name, path in rows
+        }
+
+    def event(self, **fields):
+        return Event.objects.create(
+            school=self.school, title='Sports Day', start_datetime=timezone.now() + timedelta(days=3),
+            created_by=self.admin, **fields
+        )
+
+    def test_audience_resolved_in_one_query(self):
+        endpoints = self.subscribe('https://push.example.com')
+        cases = [
+            (self.event(audience='global'), ['admin', 'parent_a', 'student_a', 'student_b', 'teacher']),
+            (self.event(audience='staff'), ['admin', 'teacher']),
+            (self.event(audience='class', target_class=self.class_obj, target_section=self.section),
+             ['admin', 'parent_a', 'student_a', 'teacher']),
+            (self.event(audience='class', target_class=self.class_obj),
+             ['admin', 'parent_a', 'student_a', 'student_b', 'teacher']),
+        ]
+
+        for event, expected in cases:
+            with self.subTest(audience=event.audience, section=event.target_section_id):
+                with self.assertNumQueries(1):
+                    rows = list(event_subscriptions(event))
+                self.assertEqual(sorted(endpoints[row[1]] for row in rows), expected)
+
+    def test_fan_out_retries_and_prunes(self):
+        with StubPushService() as service:
+            paths = [('admin', f'/ok/{i}') for i in range(30)] + [
+                ('admin', '/gone/1'), ('teacher', '/gone/2'), ('admin', '/bad/1'),
+                ('admin', '/flaky/1'), ('admin', '/down/1'),
+            ]
+            self.subscribe(service.url, paths)
+            rows = event_subscriptions(self.event(audience='global'))
+
+            result = PushSender().send(rows, {'title': 'Sports Day'})
+
+        self.assertEqual(result, {'delivered': 31, 'failed': 2, 'pruned': 2})
+        self.assertFalse(NotificationSubscription.objects.filter(endpoint__contains='/gone/').exists())
+        self.assertEqual(NotificationSubscription.objects.count(), 33)
+
+        self.assertEqual(service.tries['/flaky/1'], 2)
+        self.assertEqual(service.tries['/down/1'], 3)
+        self.assertEqual(service.tries['/bad/1'], 1)
+        # Bounded concurrency over keep-alive connections
+        self.assertLessEqual(service.max_active, 4)
+        self.assertLessEqual(len(service.clients), 4 + 3)
+
+        path, headers, body = service.requests[0]
+        self.assertEqual(headers['TTL'], '86400')
+        self.assertEqual(body, b'')
+
+    def test_new_event_is_pushed_after_commit(self):
+        client = api_client(self.admin)
+
+        with StubPushService() as service:
+            self.subscribe(service.url)
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = client.post(reverse('event-list'), {
+                    'title': 'Staff Meeting', 'audience': 'staff', 'event_type': 'meeting',
+                    'start_datetime': (timezone.now() + timedelta(days=1)).isoformat(),
+                }, format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(callbacks), 1)
+            self.assertEqual(service.requests, [])
+
+            # The callback starts a thread; run the push inline to stay in this transaction
+            result = push_event(response.data['id'])
+
+        self.assertEqual(result, {'delivered': 2, 'failed': 0, 'pruned': 0})
+        self.assertEqual(sorted(path for path, _, _ in service.requests), ['/ok/admin', '/ok/teacher'])
+
+
+class EventFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section = seed_school('FEED')
+        other_class = Class.objects.create(school=cls.school, name='Class 9', code='C9', academic_year='2025-26')
+        other_section = Section.objects.create(school=cls.school, class_obj=cls.class_obj, name='B', code='C10-B')
+        cls.student_user = User.objects.create_user(
+            username='feed_student', email='feed_student@feed.local', password=None, role='student', school=cls.school
+        )
+        cls.parent_user = User.objects.create_user(
+            username='feed_parent', email='feed_parent@feed.local', password=None, role='parent', school=cls.school
+        )
+        [student] = seed_students(cls.school, cls.class_obj, cls.section, 1)
+        StudentProfile.objects.filter(pk=student.pk).update(user=cls.student_user)
+        ParentProfile.objects.create(
+            school=cls.school, student=student, relation='father', name='Feed Parent', user=cls.parent_user
+        )
+        cls.other_school = seed_school('FEEDOTHER')[0]
+        cls.super_admin = User.objects.create_user(
+            username='feed_super', email='feed_super@feed.local', password=None, role='super_admin',
+            school=cls.other_school
+        )
+
+        # Noon on consecutive days from 2025-06-01
+        start = timezone.make_aware(datetime(2025, 6, 1, 12))
+        targets = [
+            {'audience': 'global'},
+            {'audience': 'staff'},
+            {'audience': 'class', 'target_class': cls.class_obj},
+            {'audience': 'class', 'target_class': cls.class_obj, 'target_section': cls.section},
+            {'audience': 'class', 'target_class': cls.class_obj, 'target_section': other_section},
+            {'audience': 'class', 'target_class': other_class},
+        ]
+        Event.objects.bulk_create([
+            Event(
+                school=cls.school, title=f'Event {i}', start_datetime=start + timedelta(days=i // 2),
+                created_by=cls.admin, **targets[i % len(targets)]
+            )
+            for i in range(60)
+        ] + [
+            Event(school=cls.school, title='Cancelled', start_datetime=start, is_active=False, created_by=cls.admin),
+            Event(
+                school=cls.school, title='Summer camp', start_datetime=start - timedelta(days=10),
+                end_datetime=start + timedelta(days=2), created_by=cls.admin
+            ),
+        ])
+
+    def feed_titles(self, user, page_size=7):
+        client = api_client(user)
+        titles, pages = [], 0
+        url = f"{reverse('event-feed')}?page_size={page_size}"
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            titles.extend(event['title'] for event in response.data['results'])
+            url, pages = response.data['next'], pages + 1
+        return titles, pages
+
+    def test_students_and_parents_see_only_their_class(self):
+        # global, whole class 10, and section A events: i % 6 in (0, 2, 3)
+        expected = sorted(f'Event {i}' for i in range(60) if i % 6 in (0, 2, 3)) + ['Summer camp']
+        for user in (self.student_user, self.parent_user):
+            with self.subTest(role=user.role):
+                titles, _ = self.feed_titles(user)
+                self.assertEqual(sorted(titles), sorted(expected))
+
+    def test_feed_pages_cover_everything_once_newest_first(self):
+        titles, pages = self.feed_titles(self.admin)
+
+        self.assertEqual(len(titles), 61)
+        self.assertEqual(len(set(titles)), 61)
+        self.assertEqual(pages, 9)
+        starts = list(
+            Event.objects.all_tenants().filter(title__in=titles).order_by('-start_datetime', '-id').values_list('title', flat=True)
+        )
+        self.assertEqual(titles, starts)
+
+    def test_feed_page_query_count_is_flat(self):
+        client = api_client(self.student_user)
+        url = f"{reverse('event-feed')}?page_size=5"
+        counts = []
+        for _ in range(3):
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+            counts.append(len(ctx.captured_queries))
+            url = response.data['next']
+        # school (tenant), viewer scope, page
+        self.assertEqual(counts, [3, 3, 3])
+
+    async def test_async_feed_loads_an_uncached_school(self):
+        token = await sync_to_async(lambda: str(TenantRefreshToken.for_user(self.super_admin).access_token))()
+        # The token's school claim is now stale, so the authenticator doesn't
+        # attach user.school, and resolve_tenant() skips super admins
+        await User.objects.filter(pk=self.super_admin.pk).aupdate(school=self.school)
+        await sync_to_async(cache_school)(self.other_school)
+
+        response = await self.async_client.get(
+            reverse('async-events-feed'), headers={'authorization': f'Bearer {token}'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 61)
+
+    def test_calendar_returns_window_only(self):
+        client = api_client(self.student_user)
+        response = client.get(reverse('event-calendar'), {'start': '2025-06-02', 'end': '2025-06-03'})
+
+        self.assertEqual(response.status_code, 200)
+        # Days 2 and 3 hold events 2-5; summer camp runs until day 3
+        self.assertEqual(
+            [event['title'] for event in response.data],
+            ['Summer camp', 'Event 2', 'Event 3']
+        )
+
+        for params in ({'start': '2025-06-02'}, {'start': '2025-06-05', 'end': '2025-06-01'},
+                       {'start': '2025-01-01', 'end': '2025-12-31'}, {'start': '2025-02-30', 'end': '2025-03-01'}):
+            with self.subTest(params=params):
+                self.assertEqual(client.get(reverse('event-calendar'), params).status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section = seed_school('ETAG')
+        cls.teacher = User.objects.create_user(
+            username='etag_teacher', email='etag_teacher@etag.local', password=None, role='teacher', school=cls.school
+        )
+        Period.objects.create(school=cls.school, name='Period 1', order=1, start_time=time(9), end_time=time(9, 45))
+
+    def setUp(self):
+        cache.clear()
+        self.client = api_client(self.admin)
+
+    def test_unchanged_data_answers_304_without_queries(self):
+        response = self.client.get(reverse('period-list'))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('period-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(reverse('period-list'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_last_modified_advances_on_writes_within_one_second(self):
+        url = reverse('period-list')
+        with mock.patch('core.conditional.time.time', return_value=1_750_000_000.25):
+            last_modified = self.client.get(url)['Last-Modified']
+            for order in (2, 3):
+                with self.captureOnCommitCallbacks(execute=True):
+                    Period.objects.create(
+                        school=self.school, name=f'Period {order}', order=order, start_time=time(9), end_time=time(9, 45)
+                    )
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(parse_http_date(response['Last-Modified']), parse_http_date(last_modified))
+                last_modified = response['Last-Modified']
+
+    def test_etag_covers_url_and_role(self):
+        etag = self.client.get(reverse('class-list'))['ETag']
+
+        self.assertNotEqual(self.client.get(reverse('class-list'), {'status': 'active'})['ETag'], etag)
+        self.assertNotEqual(api_client(self.teacher).get(reverse('class-list'))['ETag'], etag)
+        response = self.client.get(reverse('class-detail', kwargs={'pk': self.class_obj.pk}), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_change_the_etag(self):
+        urls = [reverse('period-list'), reverse('timetable-list'), reverse('class-list')]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('period-list'), {
+                'name': 'Period 2', 'order': 2, 'start_time': '10:00', 'end_time': '10:45'
+            })
+        self.assertEqual(response.status_code, 201)
+
+        period, timetable, classes = [self.client.get(url, HTTP_IF_NONE_MATCH=etag) for url, etag in zip(urls, etags)]
+        self.assertEqual(period.status_code, 200)
+        self.assertEqual(len(period.data['results']), 2)
+        self.assertEqual(timetable.status_code, 200)
+        # Classes don't show periods
+        self.assertEqual(classes.status_code, 304)
+
+    def test_user_names_change_class_etag_but_logins_do_not(self):
+        url = reverse('class-list')
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.last_login = timezone.now()
+            self.teacher.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.first_name = 'Renamed'
+            self.teacher.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_admission_form_by_section_is_conditional(self):
+        call_command('setup_admission_form', school_id=self.school.pk, stdout=io.StringIO())
+        url = reverse('admission-form-config-by-section')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class RequestMetricsFlushTests(TestCase):
+
+    def test_record_leaves_flushing_to_a_background_thread(self):
+        registry = _Registry()
+        labels = ('events-list', 'GET', '200', '1')
+        with mock.patch('core.instrumentation.threading.Thread') as thread, \
+                mock.patch.object(registry, 'flush') as flush:
+            registry.record(labels, 0.02, RequestMetrics(), 100)
+            registry.record(labels, 0.3, RequestMetrics(), 100)
+
+        flush.assert_not_called()
+        thread.assert_called_once_with(target=registry.flush_periodically, name='request-metrics-flush', daemon=True)
+        self.assertEqual(registry.snapshot()[labels][:1], [2])
+
+    def test_failed_flush_is_logged_not_raised(self):
+        registry = _Registry()
+        broken_cache = mock.Mock(**{'set.side_effect': ConnectionError('cache unavailable')})
+        with mock.patch('core.instrumentation.cache', broken_cache), \
+                self.assertLogs('core.instrumentation', 'ERROR'):
+            registry.flush()
+
+
+class TenantAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, _, _ = seed_school('AUTHCLAIMS')
+        cls.other_school = seed_school('AUTHCLAIMSB')[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def move_to_other_school(self):
+        User.objects.filter(pk=self.admin.pk).update(school=self.other_school)
+
+    def test_claims_user_is_built_without_queries(self):
+        token = TenantRefreshToken.for_user(self.admin).access_token
+        cache_school(self.school)
+
+        with self.assertNumQueries(0):
+            user = ClaimsJWTAuthentication().get_user(token)
+            self.assertEqual((user.pk, user.role, user.school), (self.admin.pk, 'admin', self.school))
+            self.assertFalse(user.can_access_school(self.other_school))
+
+    def test_stale_school_claim_is_not_attached_to_the_user(self):
+        token = TenantRefreshToken.for_user(self.admin).access_token
+        cache_school(self.school)
+        self.move_to_other_school()
+
+        user = TenantJWTAuthentication().get_user(token)
+
+        self.assertEqual(user.school, self.other_school)
+        self.assertFalse(user.can_access_school(self.school))
+
+    def test_claims_user_full_user_ignores_a_stale_school_claim(self):
+        token = TenantRefreshToken.for_user(self.admin).access_token
+        user = ClaimsJWTAuthentication().get_user(token)
+        user.school
+        self.move_to_other_school()
+
+        # The full user keeps its own school, not the one named in the claim
+        self.assertEqual(user.full_user.school, self.other_school)
+
+    def test_refresh_reissues_the_school_claim(self):
+        refresh = TenantRefreshToken.for_user(self.admin)
+        self.move_to_other_school()
+
+        response = APIClient(HTTP_HOST='localhost').post(
+            reverse('token-refresh'), {'refresh': str(refresh)}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        access = AccessToken(response.data['access'])
+        self.assertEqual(access[SCHOOL_ID_CLAIM], self.other_school.pk)
+        self.assertFalse(ClaimsJWTAuthentication().get_user(access).can_access_school(self.school))
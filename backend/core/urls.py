@@ -1,11 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import EventViewSet, NotificationSubscriptionViewSet
+from .async_views import dashboard_stats, events_feed
 
 router = DefaultRouter()
 router.register(r'events', EventViewSet, basename='event')
 router.register(r'push-subscriptions', NotificationSubscriptionViewSet, basename='push-subscription')
 
 urlpatterns = [
+    # Async (ASGI) read endpoints
+    path('async/events/', events_feed, name='async-events-feed'),
+    path('async/dashboard/stats/', dashboard_stats, name='async-dashboard-stats'),
     path('', include(router.urls)),
 ]
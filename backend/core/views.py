@@ -1,11 +1,13 @@
 from rest_framework import viewsets
-from core.tenant import TenantContext
+from core.tenant import TenantContext, resolve_tenant
+from core.instrumentation import InstrumentedViewMixin
 
 
-class TenantMixin:
+class TenantMixin(InstrumentedViewMixin):
     """
     Mixin to set tenant context for DRF views.
     Sets the context in initial() which runs after authentication.
+    Also records serializer time and the tenant for request metrics.
     """
     def initial(self, request, *args, **kwargs):
         super().initial(request, *args, **kwargs)
@@ -13,63 +15,88 @@ class TenantMixin:
         # Clear any existing context
         TenantContext.clear_tenant()
         
-        # Set tenant from authenticated user
+        # Set tenant from authenticated user (super admins get no tenant restriction)
         user = request.user
-        print(f"DEBUG: TenantMixin - User: {user}, Auth: {user.is_authenticated}")
-        if user and user.is_authenticated:
-            if hasattr(user, 'is_super_admin') and user.is_super_admin():
-                print("DEBUG: TenantMixin - Super Admin (No Tenant)")
-                TenantContext.set_current_tenant(None)
-            elif hasattr(user, 'school'):
-                print(f"DEBUG: TenantMixin - Setting Tenant: {user.school}")
-                TenantContext.set_current_tenant(user.school)
+        if user and user.is_authenticated and hasattr(user, 'is_super_admin'):
+            TenantContext.set_current_tenant(resolve_tenant(user))
     
     def finalize_response(self, request, response, *args, **kwargs):
         # Clear context after request is processed
         TenantContext.clear_tenant()
         return super().finalize_response(request, response, *args, **kwargs)
 
-from rest_framework import viewsets, permissions
+from datetime import datetime, time, timedelta
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from .models import Event, NotificationSubscription
+from .pagination import EventFeedPagination
 from .serializers import EventSerializer, NotificationSubscriptionSerializer
-from django.db.models import Q
 from rest_framework.exceptions import PermissionDenied
+from .authentication import ClaimsReadMixin
+from .services.push import schedule_event_push
+
+# Longest window the calendar endpoint serves (a quarter)
+CALENDAR_MAX_DAYS = 93
 
-class EventViewSet(TenantMixin, viewsets.ModelViewSet):
+
+class EventViewSet(ClaimsReadMixin, TenantMixin, viewsets.ModelViewSet):
     """
     ViewSet for scheduling and viewing events.
     Enforces role-based visibility and creation logic.
+    Reads authenticate from token claims (no user query).
     """
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        school = user.school
-        
-        if not school:
-            return Event.objects.none()
+        return Event.visible_to(user, user.school).select_related(
+            'target_class', 'target_section', 'created_by'
+        )
 
-        queryset = Event.objects.filter(school=school, is_active=True)
+    @action(detail=False, methods=['get'], pagination_class=EventFeedPagination)
+    def feed(self, request):
+        """
+        Visible events, newest first, with keyset (cursor) pagination
+        GET /api/v1/events/feed/?page_size=N, then follow `next`
+        """
+        return self.list(request)
 
-        if user.role in ['admin', 'super_admin']:
-            return queryset
-        
-        elif user.role == 'teacher':
-            # Teachers see: Global + Staff + Any class targeted events
-            return queryset.filter(
-                Q(audience='global') | 
-                Q(audience='staff') | 
-                Q(audience='class')
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Visible events overlapping a date window (inclusive), oldest first, unpaginated
+        GET /api/v1/events/calendar/?start=YYYY-MM-DD&end=YYYY-MM-DD
+        """
+        try:
+            start = parse_date(request.query_params.get('start') or '')
+            end = parse_date(request.query_params.get('end') or '')
+        except ValueError:
+            start = end = None
+        if not start or not end:
+            return Response(
+                {'error': 'start and end must be valid dates (YYYY-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        
-        else:
-            # Students/Parents see: Global + Class specific
-            return queryset.filter(
-                Q(audience='global') | 
-                Q(audience='class')
+        if end < start or (end - start).days >= CALENDAR_MAX_DAYS:
+            return Response(
+                {'error': f'end must be on or after start and at most {CALENDAR_MAX_DAYS} days later'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
+        window_start = timezone.make_aware(datetime.combine(start, time.min))
+        window_end = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        events = self.get_queryset().filter(start_datetime__lt=window_end).filter(
+            Q(end_datetime__gte=window_start)
+            | Q(end_datetime__isnull=True, start_datetime__gte=window_start)
+        ).order_by('start_datetime', 'id')
+
+        return Response(self.get_serializer(events, many=True).data)
+
     def perform_create(self, serializer):
         user = self.request.user
         audience = serializer.validated_data.get('audience', 'global')
@@ -77,7 +104,9 @@ class EventViewSet(TenantMixin, viewsets.ModelViewSet):
         if audience in ['global', 'staff'] and user.role not in ['admin', 'super_admin']:
             raise PermissionDenied("Only admins can create global or staff-only events.")
         
-        serializer.save(created_by=user, school=user.school)
+        event = serializer.save(created_by=user, school=user.school)
+        if event.is_active:
+            schedule_event_push(event)
 
 
 class NotificationSubscriptionViewSet(TenantMixin, viewsets.ModelViewSet):
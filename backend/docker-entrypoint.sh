@@ -25,7 +25,10 @@ else:
 EOF
 
 echo "Starting server..."
-if [ "$ENVIRONMENT" = "production" ]; then
+# In production, SERVER_INTERFACE=asgi serves school_erp.asgi through uvicorn workers
+if [ "$ENVIRONMENT" = "production" ] && [ "$SERVER_INTERFACE" = "asgi" ]; then
+    exec gunicorn school_erp.asgi:application --bind 0.0.0.0:8000 --workers 3 -k uvicorn.workers.UvicornWorker
+elif [ "$ENVIRONMENT" = "production" ]; then
     exec gunicorn school_erp.wsgi:application --bind 0.0.0.0:8000 --workers 3
 else
     python manage.py runserver 0.0.0.0:8000
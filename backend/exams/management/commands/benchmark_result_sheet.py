@@ -0,0 +1,77 @@
+from datetime import date, time
+from decimal import Decimal
+from random import Random
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.benchmarking import rolled_back, seed_school, seed_students, format_table
+from academic.models import Subject
+from exams.models import Exam, ExamResult, ExamSchedule, grade_marks
+from exams.result_sheet import build_result_sheet, export_result_sheet
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the consolidated result sheet (build and CSV/XLSX export)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000, help='Students in the class')
+        parser.add_argument('--subjects', type=int, default=12, help='Subjects in the exam')
+
+    def handle(self, *args, **options):
+        n_students = options['students']
+        n_subjects = options['subjects']
+        rng = Random(42)
+        rows = []
+
+        with rolled_back():
+            school, admin, class_obj, section = seed_school('BENCHRES')
+            students = seed_students(school, class_obj, section, n_students)
+
+            exam = Exam.objects.create(
+                school=school, name='Benchmark Exam', exam_type='final',
+                academic_year='2025-26', class_obj=class_obj
+            )
+            subjects = Subject.objects.bulk_create([
+                Subject(school=school, name=f'Subject {i}', code=f'S{i:02d}', type='core')
+                for i in range(n_subjects)
+            ])
+            ExamSchedule.objects.bulk_create([
+                ExamSchedule(
+                    exam=exam, subject=subject, date=date(2026, 3, 1 + i % 28),
+                    start_time=time(9), end_time=time(12)
+                )
+                for i, subject in enumerate(subjects)
+            ])
+
+            # Every cell filled except ~2% absentees
+            cells = [
+                (student, subject, Decimal(rng.randint(0, 10000)) / 100)
+                for student in students
+                for subject in subjects
+                if rng.random() > 0.02
+            ]
+            grades = grade_marks([(marks, Decimal('100')) for _, _, marks in cells])
+            ExamResult.objects.bulk_create([
+                ExamResult(
+                    school=school, exam=exam, student=student, subject=subject,
+                    marks_obtained=marks, max_marks=Decimal('100'), grade=grade,
+                    entered_by=admin
+                )
+                for (student, subject, marks), grade in zip(cells, grades)
+            ], batch_size=2000)
+
+            with CaptureQueriesContext(connection) as ctx:
+                started = perf_counter()
+                sheet = build_result_sheet(exam, school)
+                elapsed_ms = (perf_counter() - started) * 1000
+            rows.append(['build', len(ctx.captured_queries), len(sheet['results']), f'{elapsed_ms:.1f}'])
+
+            for file_format in ('csv', 'xlsx'):
+                started = perf_counter()
+                content, _, _ = export_result_sheet(sheet, file_format)
+                elapsed_ms = (perf_counter() - started) * 1000
+                rows.append([f'export {file_format}', 0, len(content), f'{elapsed_ms:.1f}'])
+
+        self.stdout.write(f'{n_students} students x {n_subjects} subjects ({len(cells)} results)')
+        self.stdout.write(format_table(['step', 'queries', 'rows/bytes', 'ms'], rows))
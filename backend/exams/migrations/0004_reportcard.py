@@ -0,0 +1,38 @@
+# Generated by Django 5.0.14 on 2026-10-17 06:01
+
+import django.db.models.deletion
+import rest_framework.utils.encoders
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_school_created_by_alter_school_updated_by'),
+        ('exams', '0003_examschedule_exam_class_obj_and_more'),
+        ('students', '0006_alter_studentprofile_admission_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportCard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('percentage', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('overall_grade', models.CharField(choices=[('A+', 'A+'), ('A', 'A'), ('B+', 'B+'), ('B', 'B'), ('C+', 'C+'), ('C', 'C'), ('D', 'D'), ('F', 'F')], max_length=5)),
+                ('payload', models.JSONField(encoder=rest_framework.utils.encoders.JSONEncoder, help_text='Rendered report card as served by the API')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_cards', to='exams.exam')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_cards', to='accounts.school')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_cards', to='students.studentprofile')),
+            ],
+            options={
+                'verbose_name': 'Report Card',
+                'verbose_name_plural': 'Report Cards',
+                'db_table': 'report_cards',
+                'indexes': [models.Index(fields=['school', 'exam'], name='report_card_school__11a0d3_idx')],
+                'unique_together': {('exam', 'student')},
+            },
+        ),
+    ]
@@ -2,6 +2,40 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from core.models import TenantAwareModel,  TimeStampedModel
 from decimal import Decimal
+from bisect import bisect_right
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Lower percentage bound for each grade, ascending
+GRADE_THRESHOLDS = [
+    (Decimal('33'), 'D'),
+    (Decimal('40'), 'C'),
+    (Decimal('50'), 'C+'),
+    (Decimal('60'), 'B'),
+    (Decimal('70'), 'B+'),
+    (Decimal('80'), 'A'),
+    (Decimal('90'), 'A+'),
+]
+_GRADE_BOUNDS = [bound for bound, _ in GRADE_THRESHOLDS]
+_GRADE_LABELS = ['F'] + [grade for _, grade in GRADE_THRESHOLDS]
+
+
+def grade_for_percentage(percentage):
+    """Map a percentage to its letter grade"""
+    return _GRADE_LABELS[bisect_right(_GRADE_BOUNDS, percentage)]
+
+
+def grade_marks(marks):
+    """
+    Grade a whole array of (marks_obtained, max_marks) pairs in one pass.
+    
+    Returns:
+        List of grades in the same order as the input
+    """
+    return [
+        _GRADE_LABELS[bisect_right(_GRADE_BOUNDS, (obtained / maximum) * 100 if maximum > 0 else 0)]
+        for obtained, maximum in marks
+    ]
 
 
 class Exam(TenantAwareModel):
@@ -176,20 +210,42 @@ class ExamResult(TimeStampedModel):
     
     def calculate_grade(self):
         """Auto-calculate grade based on percentage"""
-        percentage = self.get_percentage()
-        if percentage >= 90:
-            return 'A+'
-        elif percentage >= 80:
-            return 'A'
-        elif percentage >= 70:
-            return 'B+'
-        elif percentage >= 60:
-            return 'B'
-        elif percentage >= 50:
-            return 'C+'
-        elif percentage >= 40:
-            return 'C'
-        elif percentage >= 33:
-            return 'D'
-        else:
-            return 'F'
+        return grade_for_percentage(self.get_percentage())
+
+
+class ReportCard(TimeStampedModel):
+    """
+    Materialized report card for one student in one exam.
+    Built by exams.report_cards and dropped whenever the underlying results change.
+    """
+    school = models.ForeignKey(
+        'accounts.School',
+        on_delete=models.CASCADE,
+        related_name='report_cards'
+    )
+    exam = models.ForeignKey(
+        Exam,
+        on_delete=models.CASCADE,
+        related_name='report_cards'
+    )
+    student = models.ForeignKey(
+        'students.StudentProfile',
+        on_delete=models.CASCADE,
+        related_name='report_cards'
+    )
+    percentage = models.DecimalField(max_digits=5, decimal_places=2)
+    overall_grade = models.CharField(max_length=5, choices=ExamResult.GRADE_CHOICES)
+    # Encoded like API responses, so stored cards render identically to freshly built ones
+    payload = models.JSONField(encoder=JSONEncoder, help_text="Rendered report card as served by the API")
+    
+    class Meta:
+        db_table = 'report_cards'
+        verbose_name = 'Report Card'
+        verbose_name_plural = 'Report Cards'
+        unique_together = [('exam', 'student')]
+        indexes = [
+            models.Index(fields=['school', 'exam']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.get_full_name()} - {self.exam.name} ({self.overall_grade})"
@@ -0,0 +1,146 @@
+"""
+Report card generation.
+
+Cards for any number of students in an exam are computed in one pass over the
+exam's results and stored as ReportCard rows, so repeat requests are served
+from the stored payload. Cards are dropped when anything they show changes
+(results, the exam, student/class/section/subject names; see exams.signals
+and exams.services.bulk_enter_results) and rebuilt on the next request.
+
+Invalidation runs after the writing transaction commits and first bumps a
+per-school build generation. A build that saw the generation change while it
+ran may have read the old data, so it deletes what it just stored.
+"""
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from .models import ExamResult, ReportCard, grade_for_percentage
+from .serializers import ExamSerializer, ExamResultSerializer
+
+
+REPORT_CARD_UPSERT_FIELDS = ['percentage', 'overall_grade', 'payload', 'updated_at']
+
+
+def _generation_key(school_id):
+    return f'report_card_generation:{school_id}'
+
+
+def _build_generation(school_id):
+    # An evicted key reads as 0, which only makes a running build discard its cards
+    return cache.get(_generation_key(school_id), 0)
+
+
+def _bump_build_generation(school_id):
+    key = _generation_key(school_id)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, None)
+
+
+def build_report_cards(exam, student_ids=None):
+    """
+    Compute and store report cards for an exam.
+
+    Args:
+        exam: Exam to build cards for
+        student_ids: Optional iterable of student IDs (default: every student with results)
+
+    Returns:
+        Dict of {student_id: payload}; students without results get no card
+    """
+    generation = _build_generation(exam.school_id)
+    results = ExamResult.objects.filter(exam=exam, school=exam.school).select_related(
+        'subject', 'student__class_obj', 'student__section'
+    ).order_by('student_id', '-created_at')
+    if student_ids is not None:
+        results = results.filter(student_id__in=list(student_ids))
+    results = list(results)
+
+    if not results:
+        return {}
+
+    exam_data = ExamSerializer(exam).data
+    serialized = ExamResultSerializer(results, many=True).data
+
+    grouped = {}
+    for result, data in zip(results, serialized):
+        grouped.setdefault(result.student_id, (result.student, []))[1].append((result, data))
+
+    payloads = {}
+    cards = []
+    for student_id, (student, rows) in grouped.items():
+        total_marks = sum((result.max_marks for result, _ in rows), Decimal('0'))
+        marks_obtained = sum((result.marks_obtained for result, _ in rows), Decimal('0'))
+        percentage = (marks_obtained / total_marks * 100) if total_marks > 0 else Decimal('0')
+        overall_grade = grade_for_percentage(percentage)
+        percentage = round(percentage, 2)
+
+        payload = {
+            'exam': exam_data,
+            'student': {
+                'id': student.id,
+                'admission_number': student.admission_number,
+                'name': student.get_full_name(),
+                'class': student.class_obj.name,
+                'section': student.section.name if student.section_id else None
+            },
+            'results': [data for _, data in rows],
+            'total_marks': total_marks,
+            'marks_obtained': marks_obtained,
+            'percentage': percentage,
+            'overall_grade': overall_grade
+        }
+        payloads[student_id] = payload
+        cards.append(ReportCard(
+            school=exam.school,
+            exam=exam,
+            student_id=student_id,
+            percentage=percentage,
+            overall_grade=overall_grade,
+            payload=payload,
+        ))
+
+    ReportCard.objects.bulk_create(
+        cards,
+        update_conflicts=True,
+        unique_fields=['exam', 'student'],
+        update_fields=REPORT_CARD_UPSERT_FIELDS,
+    )
+    if _build_generation(exam.school_id) != generation:
+        # Invalidated while building: the stored cards may predate the change
+        ReportCard.objects.filter(exam=exam, student_id__in=list(payloads)).delete()
+    return payloads
+
+
+def get_report_cards(exam, student_ids):
+    """
+    Stored report cards for the given students, building any that are missing.
+
+    Returns:
+        Dict of {student_id: payload} for students that have results
+    """
+    student_ids = list(student_ids)
+    payloads = dict(
+        ReportCard.objects.filter(exam=exam, student_id__in=student_ids).values_list('student_id', 'payload')
+    )
+
+    missing = [student_id for student_id in student_ids if student_id not in payloads]
+    if missing:
+        payloads.update(build_report_cards(exam, missing))
+
+    return payloads
+
+
+def invalidate_report_cards(school_id, **lookups):
+    """
+    Drop a school's stored cards matching ReportCard ``lookups`` once the
+    current transaction commits, e.g. ``exam_id=1, student_id__in=[...]``.
+    """
+    def drop():
+        _bump_build_generation(school_id)
+        ReportCard.objects.filter(school_id=school_id, **lookups).delete()
+
+    transaction.on_commit(drop)
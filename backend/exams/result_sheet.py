@@ -0,0 +1,175 @@
+"""
+Consolidated (class-wise) result sheet built as a students x subjects matrix.
+
+Results are pulled as columns with one values_list query and scattered into
+dense numpy arrays; totals, percentages and dense ranks are computed with
+array operations instead of per-cell Python loops. Marks are held as integer
+hundredths so sums stay exact.
+"""
+import csv
+import io
+import numpy as np
+from students.models import StudentProfile
+from .models import ExamResult, ExamSchedule
+
+
+SHEET_EXPORT_FORMATS = ('csv', 'xlsx')
+
+
+def _cents(values):
+    # Decimal(5,2) -> exact integer hundredths
+    return np.fromiter((int(v * 100) for v in values), dtype=np.int64, count=len(values))
+
+
+def build_result_sheet(exam, school):
+    """
+    Build the consolidated result sheet for an exam's class.
+
+    Args:
+        exam: Exam linked to a class
+        school: School the students and results belong to
+
+    Returns:
+        Dict with exam_name, class_name, subjects and results, where results
+        are ordered by total marks (descending) and carry a dense rank
+        (equal totals share a rank, the next total takes the next rank).
+    """
+    students = list(
+        StudentProfile.objects.filter(
+            class_obj=exam.class_obj,
+            status='active',
+            school=school
+        ).order_by('id').values_list('id', 'first_name', 'last_name', 'admission_number', 'section__name')
+    )
+    subjects = list(
+        ExamSchedule.objects.filter(exam=exam).values_list('subject_id', 'subject__name')
+    )
+
+    n_students, n_subjects = len(students), len(subjects)
+    student_ids = np.fromiter((s[0] for s in students), dtype=np.int64, count=n_students)
+    subject_index = {subject_id: col for col, (subject_id, _) in enumerate(subjects)}
+
+    obtained = np.zeros((n_students, n_subjects), dtype=np.int64)
+    maximum = np.zeros((n_students, n_subjects), dtype=np.int64)
+    present = np.zeros((n_students, n_subjects), dtype=bool)
+    grades = np.full((n_students, n_subjects), 'N/A', dtype=object)
+
+    rows = list(
+        ExamResult.objects.filter(exam=exam, school=school).values_list(
+            'student_id', 'subject_id', 'marks_obtained', 'max_marks', 'grade'
+        )
+    )
+
+    if rows and n_students and n_subjects:
+        result_students, result_subjects, marks, max_marks, result_grades = zip(*rows)
+
+        # Map ids to matrix coordinates; drop results for students/subjects not on the sheet
+        result_students = np.fromiter(result_students, dtype=np.int64, count=len(rows))
+        row_idx = np.searchsorted(student_ids, result_students).clip(max=n_students - 1)
+        col_idx = np.fromiter(
+            (subject_index.get(s, -1) for s in result_subjects), dtype=np.int64, count=len(rows)
+        )
+        keep = (student_ids[row_idx] == result_students) & (col_idx >= 0)
+        row_idx, col_idx = row_idx[keep], col_idx[keep]
+
+        obtained[row_idx, col_idx] = _cents(marks)[keep]
+        maximum[row_idx, col_idx] = _cents(max_marks)[keep]
+        present[row_idx, col_idx] = True
+        grades[row_idx, col_idx] = np.asarray(result_grades, dtype=object)[keep]
+
+    total_obtained = obtained.sum(axis=1)
+    total_max = maximum.sum(axis=1)
+    percentage = np.divide(
+        total_obtained * 100.0, total_max,
+        out=np.zeros(n_students), where=total_max > 0
+    ).round(2)
+
+    # Dense rank on total marks, highest first
+    _, rank = np.unique(-total_obtained, return_inverse=True)
+    rank = rank.reshape(-1) + 1
+    order = np.argsort(-total_obtained, kind='stable')
+
+    obtained_values = (obtained / 100).tolist()
+    max_values = (maximum / 100).tolist()
+    present_values = present.tolist()
+    grade_values = grades.tolist()
+    total_obtained_values = (total_obtained / 100).tolist()
+    total_max_values = (total_max / 100).tolist()
+    percentage_values = percentage.tolist()
+    rank_values = rank.tolist()
+
+    results = []
+    for i in order.tolist():
+        student_id, first_name, last_name, admission_number, section_name = students[i]
+        results.append({
+            'student_id': student_id,
+            'student_name': f"{first_name} {last_name}",
+            'admission_number': admission_number,
+            'section': section_name,
+            'marks': [
+                {
+                    'subject_id': subject_id,
+                    'subject_name': subject_name,
+                    'marks': obtained_values[i][j] if present_values[i][j] else None,
+                    'max': max_values[i][j] if present_values[i][j] else None,
+                    'grade': grade_values[i][j],
+                }
+                for j, (subject_id, subject_name) in enumerate(subjects)
+            ],
+            'total_obtained': total_obtained_values[i],
+            'total_max': total_max_values[i],
+            'percentage': percentage_values[i],
+            'rank': rank_values[i],
+        })
+
+    return {
+        'exam_name': exam.name,
+        'class_name': exam.class_obj.name,
+        'subjects': [{'id': subject_id, 'name': name} for subject_id, name in subjects],
+        'results': results,
+    }
+
+
+def _sheet_rows(sheet):
+    """Flatten a result sheet into a header row followed by one row per student"""
+    yield (
+        ['Rank', 'Admission Number', 'Student', 'Section']
+        + [subject['name'] for subject in sheet['subjects']]
+        + ['Total', 'Max', 'Percentage']
+    )
+    for entry in sheet['results']:
+        yield (
+            [entry['rank'], entry['admission_number'], entry['student_name'], entry['section']]
+            + [cell['marks'] if cell['marks'] is not None else 'N/A' for cell in entry['marks']]
+            + [entry['total_obtained'], entry['total_max'], entry['percentage']]
+        )
+
+
+def export_result_sheet(sheet, file_format):
+    """
+    Render a result sheet as CSV or XLSX.
+
+    Returns:
+        (content bytes, content type, file extension)
+    """
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(_sheet_rows(sheet))
+        return buffer.getvalue().encode('utf-8'), 'text/csv', 'csv'
+
+    if file_format == 'xlsx':
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(title='Results')
+        for row in _sheet_rows(sheet):
+            worksheet.append(row)
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return (
+            buffer.getvalue(),
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            'xlsx',
+        )
+
+    raise ValueError(f"Unsupported export format '{file_format}'")
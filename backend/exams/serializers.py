@@ -27,6 +27,21 @@ class ExamScheduleSerializer(serializers.ModelSerializer):
             'start_time', 'end_time', 'max_marks', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+    
+    def validate(self, data):
+        """Exam and subject must belong to the requesting user's school"""
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if user is None or user.is_super_admin():
+            return data
+        
+        exam = data.get('exam', getattr(self.instance, 'exam', None))
+        subject = data.get('subject', getattr(self.instance, 'subject', None))
+        if exam is not None and exam.school_id != user.school_id:
+            raise serializers.ValidationError({'exam': 'Exam not found in your school.'})
+        if subject is not None and subject.school_id != user.school_id:
+            raise serializers.ValidationError({'subject': 'Subject not found in your school.'})
+        return data
 
 
 class ExamResultSerializer(serializers.ModelSerializer):
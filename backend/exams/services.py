@@ -0,0 +1,147 @@
+"""
+Set-based exam result operations.
+"""
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from students.models import ParentProfile, StudentProfile
+from .models import Exam, ExamResult, grade_marks
+from .report_cards import invalidate_report_cards
+
+
+RESULT_UPSERT_FIELDS = [
+    'marks_obtained', 'max_marks', 'grade', 'remarks',
+    'entered_by', 'updated_at',
+]
+
+
+def _to_decimal(value):
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def bulk_enter_results(school, user, exam_id, subject_id, records):
+    """
+    Enter marks for a whole cohort in a fixed number of queries.
+
+    Students are validated in one query, every row is graded in one pass
+    and all rows are upserted with a single INSERT ... ON CONFLICT on
+    (school, exam, student, subject). Grades are always recomputed from
+    the submitted marks.
+
+    Args:
+        school: School the results belong to
+        user: User entering the results
+        exam_id: Exam ID
+        subject_id: Subject ID
+        records: List of dicts with student_id, marks_obtained, max_marks
+            and optional remarks
+
+    Returns:
+        Dict with created, updated and errors (same shape as the API payload)
+    """
+    errors = []
+
+    if not Exam.objects.filter(id=exam_id, school=school).exists():
+        return {'created': 0, 'updated': 0, 'errors': [f"Exam with ID {exam_id} not found"]}
+
+    # Last record wins when a student is submitted twice in one payload
+    records_by_student = {}
+    for record in records:
+        records_by_student[record['student_id']] = record
+
+    valid_ids = set(
+        StudentProfile.objects.filter(
+            id__in=list(records_by_student.keys()),
+            school=school
+        ).values_list('id', flat=True)
+    )
+
+    student_ids = []
+    marks = []
+    remarks = []
+    for student_id, record in records_by_student.items():
+        if student_id not in valid_ids:
+            errors.append(f"Student with ID {student_id} not found")
+            continue
+        try:
+            marks.append((_to_decimal(record['marks_obtained']), _to_decimal(record['max_marks'])))
+        except (InvalidOperation, TypeError, ValueError):
+            errors.append(f"Error for student {student_id}: invalid marks")
+            continue
+        student_ids.append(student_id)
+        remarks.append(record.get('remarks', ''))
+
+    if not student_ids:
+        return {'created': 0, 'updated': 0, 'errors': errors}
+
+    grades = grade_marks(marks)
+
+    rows = [
+        ExamResult(
+            school=school,
+            exam_id=exam_id,
+            subject_id=subject_id,
+            student_id=student_id,
+            marks_obtained=obtained,
+            max_marks=maximum,
+            grade=grade,
+            remarks=remark,
+            entered_by=user,
+        )
+        for student_id, (obtained, maximum), grade, remark in zip(student_ids, marks, grades, remarks)
+    ]
+
+    existing_count = ExamResult.objects.filter(
+        school=school,
+        exam_id=exam_id,
+        subject_id=subject_id,
+        student_id__in=student_ids
+    ).count()
+
+    try:
+        ExamResult.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['school', 'exam', 'student', 'subject'],
+            update_fields=RESULT_UPSERT_FIELDS,
+        )
+    except Exception as e:
+        errors.append(f"Error saving results: {str(e)}")
+        return {'created': 0, 'updated': 0, 'errors': errors}
+
+    # bulk_create bypasses the post_save signal that drops stale report cards
+    invalidate_report_cards(school.id, exam_id=exam_id, student_id__in=student_ids)
+
+    return {
+        'created': len(rows) - existing_count,
+        'updated': existing_count,
+        'errors': errors,
+    }
+
+
+def report_card_notice_recipients(exam, chunk_size=None):
+    """
+    (email, context) pairs for every parent of a student with results in the exam,
+    streamed in one query for send_bulk_templated_email('report_card_notice', ...).
+    """
+    rows = (
+        ParentProfile.objects.all_tenants()
+        .filter(
+            school=exam.school,
+            email__gt='',
+            student__in=ExamResult.objects.filter(exam=exam).values('student_id'),
+        )
+        .values(
+            'name', 'email',
+            'student__first_name', 'student__last_name', 'student__admission_number',
+        )
+        .order_by('student_id', 'id')
+        .iterator(chunk_size=chunk_size or settings.EMAIL_BULK_CHUNK_SIZE)
+    )
+    for row in rows:
+        yield row['email'], {
+            'school_name': exam.school.name,
+            'parent_name': row['name'],
+            'student_name': f"{row['student__first_name']} {row['student__last_name']}",
+            'admission_number': row['student__admission_number'],
+            'exam_name': exam.name,
+        }
@@ -0,0 +1,46 @@
+"""
+Drop materialized report cards when the data they were built from changes.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from academic.models import Class, Section, Subject
+from students.models import StudentProfile
+from .models import Exam, ExamResult
+from .report_cards import invalidate_report_cards
+
+
+@receiver([post_save, post_delete], sender=ExamResult)
+def invalidate_student_report_card(sender, instance, **kwargs):
+    invalidate_report_cards(instance.school_id, exam_id=instance.exam_id, student_id=instance.student_id)
+
+
+@receiver(post_save, sender=Exam)
+def invalidate_exam_report_cards(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_report_cards(instance.school_id, exam_id=instance.id)
+
+
+# Cards embed student, class, section and subject names
+
+@receiver(post_save, sender=StudentProfile)
+def invalidate_student_report_cards(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_report_cards(instance.school_id, student_id=instance.id)
+
+
+@receiver(post_save, sender=Class)
+def invalidate_class_report_cards(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_report_cards(instance.school_id, student__class_obj_id=instance.id)
+
+
+@receiver(post_save, sender=Section)
+def invalidate_section_report_cards(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_report_cards(instance.school_id, student__section_id=instance.id)
+
+
+@receiver(post_save, sender=Subject)
+def invalidate_subject_report_cards(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_report_cards(instance.school_id, exam__results__subject_id=instance.id)
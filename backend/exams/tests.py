@@ -1,3 +1,325 @@
+import csv
+import io
+from datetime import date, time
+from decimal import Decimal
+from unittest import mock
 from django.test import TestCase
+from django.urls import reverse
+from openpyxl import load_workbook
+from academic.models import Subject
+from core.benchmarking import seed_school, seed_students
+from core.testing import api_client
+from students.models import StudentProfile
+from .models import Exam, ExamResult, ExamSchedule, ReportCard, grade_for_percentage, grade_marks
+from .report_cards import _bump_build_generation, build_report_cards, get_report_cards
+from .result_sheet import build_result_sheet
+from .services import bulk_enter_results
 
-# Create your tests here.
+
+def seed_exam(school, code='MATH'):
+    subject = Subject.objects.create(school=school, name=f'Subject {code}', code=code, type='core')
+    exam = Exam.objects.create(
+        school=school, name='Term 1', exam_type='mid_term', academic_year='2025-26',
+        start_date=date(2025, 9, 1)
+    )
+    return exam, subject
+
+
+class ExamScheduleTenantTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school_a, cls.admin_a, _, _ = seed_school('EXAMA')
+        cls.school_b, cls.admin_b, _, _ = seed_school('EXAMB')
+        cls.exam_a, cls.subject_a = seed_exam(cls.school_a)
+        cls.exam_b, cls.subject_b = seed_exam(cls.school_b)
+        cls.schedule_a = ExamSchedule.objects.create(
+            exam=cls.exam_a, subject=cls.subject_a, date=date(2025, 9, 1), start_time=time(9), end_time=time(12)
+        )
+
+    def payload(self, exam, subject):
+        return {
+            'exam': exam.pk, 'subject': subject.pk, 'date': '2025-09-02',
+            'start_time': '09:00', 'end_time': '12:00', 'max_marks': '100.00',
+        }
+
+    def test_create_in_own_school(self):
+        science = Subject.objects.create(school=self.school_a, name='Science', code='SCI', type='core')
+        response = api_client(self.admin_a).post(
+            reverse('exam-schedule-list'), self.payload(self.exam_a, science)
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_cannot_create_on_another_schools_exam_or_subject(self):
+        client = api_client(self.admin_a)
+        for exam, subject in ((self.exam_b, self.subject_b), (self.exam_a, self.subject_b), (self.exam_b, self.subject_a)):
+            with self.subTest(exam=exam.school.code, subject=subject.school.code):
+                response = client.post(reverse('exam-schedule-list'), self.payload(exam, subject))
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(ExamSchedule.objects.filter(exam=self.exam_b).exists())
+
+    def test_cannot_move_schedule_to_another_school(self):
+        response = api_client(self.admin_a).patch(
+            reverse('exam-schedule-detail', kwargs={'pk': self.schedule_a.pk}),
+            {'exam': self.exam_b.pk}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.schedule_a.refresh_from_db()
+        self.assertEqual(self.schedule_a.exam_id, self.exam_a.pk)
+
+    def test_other_school_cannot_see_or_edit_schedule(self):
+        client = api_client(self.admin_b)
+        url = reverse('exam-schedule-detail', kwargs={'pk': self.schedule_a.pk})
+
+        self.assertEqual(client.get(url).status_code, 404)
+        self.assertEqual(client.patch(url, {'max_marks': '50.00'}).status_code, 404)
+
+
+class ReportCardInvalidationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, class_obj, section = seed_school('CARDS')
+        cls.student = seed_students(cls.school, class_obj, section, 1)[0]
+        cls.exam, cls.subject = seed_exam(cls.school)
+        ExamResult.objects.bulk_create([ExamResult(
+            school=cls.school, exam=cls.exam, student=cls.student, subject=cls.subject,
+            marks_obtained=Decimal('45'), max_marks=Decimal('50'), grade='A+', entered_by=cls.admin,
+        )])
+
+    def stored_card(self):
+        return ReportCard.objects.filter(exam=self.exam, student=self.student).first()
+
+    def test_student_rename_drops_card(self):
+        get_report_cards(self.exam, [self.student.id])
+        self.assertIsNotNone(self.stored_card())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.first_name = 'Renamed'
+            self.student.save()
+        self.assertIsNone(self.stored_card())
+
+        payload = get_report_cards(self.exam, [self.student.id])[self.student.id]
+        self.assertTrue(payload['student']['name'].startswith('Renamed '))
+
+    def test_subject_rename_drops_card(self):
+        get_report_cards(self.exam, [self.student.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subject.name = 'Mathematics'
+            self.subject.save()
+        self.assertIsNone(self.stored_card())
+
+        payload = get_report_cards(self.exam, [self.student.id])[self.student.id]
+        self.assertEqual(payload['results'][0]['subject_name'], 'Mathematics')
+
+    def test_build_invalidated_midway_does_not_store(self):
+        def grade_during_invalidation(percentage):
+            # Another request commits a change while this build is running
+            _bump_build_generation(self.school.id)
+            return grade_for_percentage(percentage)
+
+        with mock.patch('exams.report_cards.grade_for_percentage', side_effect=grade_during_invalidation):
+            payloads = build_report_cards(self.exam)
+
+        self.assertIn(self.student.id, payloads)
+        self.assertIsNone(self.stored_card())
+
+        build_report_cards(self.exam)
+        self.assertIsNotNone(self.stored_card())
+
+
+class ClassReportCardsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, cls.section = seed_school('CLASSCARDS')
+        student = seed_students(cls.school, cls.class_obj, cls.section, 1)[0]
+        cls.exam, subject = seed_exam(cls.school)
+        ExamResult.objects.create(
+            exam=cls.exam, student=student, subject=subject, marks_obtained=Decimal('40'),
+            max_marks=Decimal('50'), entered_by=cls.admin,
+        )
+
+    def report_cards(self, **params):
+        return api_client(self.admin).get(reverse('class-report-cards', args=[self.exam.id]), params)
+
+    def test_cards_for_a_class_section(self):
+        response = self.report_cards(class_id=self.class_obj.id, section_id=self.section.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_malformed_or_missing_ids_are_rejected(self):
+        for params in ({'class_id': self.class_obj.id, 'section_id': 'abc'}, {'class_id': '1.5'}, {}):
+            with self.subTest(params=params):
+                self.assertEqual(self.report_cards(**params).status_code, 400)
+
+
+class BulkResultEntryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, class_obj, section = seed_school('RESULTS')
+        cls.students = seed_students(cls.school, class_obj, section, 4)
+        cls.exam, cls.subject = seed_exam(cls.school)
+        other_school = seed_school('RESULTSB')[0]
+        cls.other_exam, _ = seed_exam(other_school)
+
+    def enter(self, records, exam=None):
+        return bulk_enter_results(self.school, self.admin, (exam or self.exam).id, self.subject.id, records)
+
+    def grades(self):
+        return dict(ExamResult.objects.filter(exam=self.exam).values_list('student_id', 'grade'))
+
+    def test_grade_marks_matches_row_grading(self):
+        marks = [
+            (Decimal(obtained), Decimal(maximum)) for obtained, maximum in
+            [('90', '100'), ('89.99', '100'), ('45', '50'), ('33', '100'), ('32.99', '100'), ('0', '100'), ('5', '0')]
+        ]
+        expected = [
+            ExamResult(marks_obtained=obtained, max_marks=maximum).calculate_grade() for obtained, maximum in marks
+        ]
+
+        self.assertEqual(grade_marks(marks), expected)
+        self.assertEqual(expected, ['A+', 'A', 'A+', 'D', 'F', 'F', 'F'])
+
+    def test_reentry_updates_and_regrades(self):
+        first = self.enter([
+            {'student_id': s.id, 'marks_obtained': 95, 'max_marks': 100} for s in self.students[:3]
+        ])
+        self.assertEqual(first, {'created': 3, 'updated': 0, 'errors': []})
+
+        second = self.enter([
+            {'student_id': self.students[0].id, 'marks_obtained': '41.5', 'max_marks': 100, 'grade': 'A+'},
+            {'student_id': self.students[3].id, 'marks_obtained': 20, 'max_marks': 25},
+            {'student_id': self.students[1].id, 'marks_obtained': 'n/a', 'max_marks': 100},
+            {'student_id': 999999, 'marks_obtained': 50, 'max_marks': 100},
+        ])
+
+        self.assertEqual((second['created'], second['updated']), (1, 1))
+        self.assertEqual(second['errors'], [
+            f"Error for student {self.students[1].id}: invalid marks", "Student with ID 999999 not found"
+        ])
+        grades = self.grades()
+        # Submitted grades are ignored; every grade comes from the marks
+        self.assertEqual(grades[self.students[0].id], 'C')
+        self.assertEqual(grades[self.students[1].id], 'A+')
+        self.assertEqual(grades[self.students[3].id], 'A')
+        self.assertEqual(ExamResult.objects.filter(exam=self.exam).count(), 4)
+
+    def test_other_schools_exam_is_rejected(self):
+        result = self.enter([{'student_id': self.students[0].id, 'marks_obtained': 10, 'max_marks': 10}], self.other_exam)
+
+        self.assertEqual(result['errors'], [f"Exam with ID {self.other_exam.id} not found"])
+        self.assertFalse(ExamResult.objects.exists())
+
+    def test_entry_drops_stored_report_cards(self):
+        self.enter([{'student_id': self.students[0].id, 'marks_obtained': 95, 'max_marks': 100}])
+        get_report_cards(self.exam, [self.students[0].id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enter([{'student_id': self.students[0].id, 'marks_obtained': 30, 'max_marks': 100}])
+
+        payload = get_report_cards(self.exam, [self.students[0].id])[self.students[0].id]
+        self.assertEqual(payload['overall_grade'], 'F')
+
+
+class ResultSheetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, class_obj, section = seed_school('SHEET')
+        cls.students = seed_students(cls.school, class_obj, section, 5)
+        left = cls.students.pop()
+        StudentProfile.objects.filter(pk=left.pk).update(status='inactive')
+        cls.exam = Exam.objects.create(
+            school=cls.school, name='Term 1', exam_type='mid_term', academic_year='2025-26',
+            start_date=date(2025, 9, 1), class_obj=class_obj
+        )
+        cls.maths = Subject.objects.create(school=cls.school, name='Maths', code='MATH', type='core')
+        cls.science = Subject.objects.create(school=cls.school, name='Science', code='SCI', type='core')
+        unscheduled = Subject.objects.create(school=cls.school, name='Art', code='ART', type='elective')
+        for subject in (cls.maths, cls.science):
+            ExamSchedule.objects.create(
+                exam=cls.exam, subject=subject, date=date(2025, 9, 1), start_time=time(9), end_time=time(12)
+            )
+
+        s0, s1, s2, s3 = cls.students
+        for student, subject, marks, maximum in [
+            (s0, cls.maths, '90.00', '100'), (s0, cls.science, '90.00', '100'),
+            (s1, cls.maths, '75.10', '100'), (s1, cls.science, '74.90', '100'),
+            (s2, cls.maths, '80.00', '100'), (s2, cls.science, '70.00', '100'),
+            (s3, cls.maths, '20.00', '30'),
+            # Not on the sheet: an inactive student and an unscheduled subject
+            (left, cls.maths, '100.00', '100'), (s3, unscheduled, '30.00', '30'),
+        ]:
+            ExamResult.objects.create(
+                exam=cls.exam, student=student, subject=subject, marks_obtained=Decimal(marks),
+                max_marks=Decimal(maximum), entered_by=cls.admin,
+            )
+
+    def sheet(self):
+        return build_result_sheet(self.exam, self.school)
+
+    def test_totals_are_dense_ranked_with_ties_in_student_order(self):
+        results = self.sheet()['results']
+
+        self.assertEqual(
+            [(entry['student_id'], entry['total_obtained'], entry['rank']) for entry in results],
+            [
+                (self.students[0].id, 180.0, 1),
+                (self.students[1].id, 150.0, 2),
+                (self.students[2].id, 150.0, 2),
+                (self.students[3].id, 20.0, 3),
+            ]
+        )
+
+    def test_results_off_the_sheet_are_dropped(self):
+        sheet = self.sheet()
+
+        self.assertEqual([subject['name'] for subject in sheet['subjects']], ['Maths', 'Science'])
+        self.assertEqual(len(sheet['results']), 4)
+        self.assertEqual((sheet['results'][-1]['total_obtained'], sheet['results'][-1]['total_max']), (20.0, 30.0))
+
+    def test_missing_cell_and_percentage_rounding(self):
+        last = self.sheet()['results'][-1]
+
+        self.assertEqual(
+            last['marks'][1],
+            {'subject_id': self.science.id, 'subject_name': 'Science', 'marks': None, 'max': None, 'grade': 'N/A'}
+        )
+        # 20 / 30 from integer hundredths
+        self.assertEqual(last['percentage'], 66.67)
+        self.assertEqual(self.sheet()['results'][1]['percentage'], 75.0)
+
+    def export(self, **params):
+        url = reverse('exam-export-consolidated-results', args=[self.exam.id])
+        return api_client(self.admin).get(url, params)
+
+    def test_csv_export(self):
+        response = self.export(file_format='csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'exam-{self.exam.id}-results.csv', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(response.content.decode())))
+        self.assertEqual(rows[0], ['Rank', 'Admission Number', 'Student', 'Section', 'Maths', 'Science', 'Total', 'Max', 'Percentage'])
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[2][4:], ['75.1', '74.9', '150.0', '200.0', '75.0'])
+        self.assertEqual(rows[4][4:], ['20.0', 'N/A', '20.0', '30.0', '66.67'])
+
+    def test_xlsx_export(self):
+        response = self.export(file_format='XLSX')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        rows = list(load_workbook(io.BytesIO(response.content))['Results'].iter_rows(values_only=True))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][:3], (1, self.students[0].admission_number, self.students[0].get_full_name()))
+        self.assertEqual(rows[4][4:], (20, 'N/A', 20, 30, 66.67))
+
+    def test_unknown_export_format_is_rejected(self):
+        self.assertEqual(self.export(file_format='pdf').status_code, 400)
@@ -1,13 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ExamViewSet, ExamResultViewSet, enter_results_bulk, student_report_card
+from .views import (
+    ExamViewSet, ExamResultViewSet, ExamScheduleViewSet, enter_results_bulk, student_report_card,
+    class_report_cards, generate_report_cards
+)
 
 router = DefaultRouter()
-router.register(r'exams', ExamViewSet, basename='exam')
+# More specific prefixes first, or exams/<pk>/ would swallow them
 router.register(r'exams/results', ExamResultViewSet, basename='examresult')
+router.register(r'exams', ExamViewSet, basename='exam')
+router.register(r'exam-schedules', ExamScheduleViewSet, basename='exam-schedule')
 
 urlpatterns = [
     path('exams/results/bulk-entry/', enter_results_bulk, name='bulk-result-entry'),
     path('exams/<int:exam_id>/report-card/<int:student_id>/', student_report_card, name='student-report-card'),
+    path('exams/<int:exam_id>/report-cards/', class_report_cards, name='class-report-cards'),
+    path('exams/<int:exam_id>/report-cards/generate/', generate_report_cards, name='generate-report-cards'),
     path('', include(router.urls)),
 ]
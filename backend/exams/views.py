@@ -1,8 +1,11 @@
+from django.http import HttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from accounts.permissions import IsAdmin, IsActiveTeacher
+from core.authentication import ClaimsReadMixin
+from core.views import TenantMixin
 from django.db.models import Sum, Avg
 from .models import Exam, ExamResult, ExamSchedule
 from students.models import StudentProfile
@@ -10,6 +13,15 @@ from .serializers import (
     ExamSerializer, ExamResultSerializer, BulkResultEntrySerializer, StudentReportCardSerializer,
     ExamScheduleSerializer
 )
+from .services import bulk_enter_results
+from .report_cards import build_report_cards, get_report_cards
+from .result_sheet import SHEET_EXPORT_FORMATS, build_result_sheet, export_result_sheet
+
+
+def _id_param(request, name):
+    """Optional integer ID query parameter; raises ValueError if malformed"""
+    value = request.query_params.get(name)
+    return int(value) if value else None
 
 
 class ExamViewSet(viewsets.ModelViewSet):
@@ -72,85 +84,35 @@ class ExamViewSet(viewsets.ModelViewSet):
         """
         exam = self.get_object()
         
-        # Get all active students in the class this exam belongs to
         if not exam.class_obj:
             return Response({'error': 'This exam is not linked to a specific class'}, status=status.HTTP_400_BAD_REQUEST)
-            
-        students = StudentProfile.objects.filter(
-            class_obj=exam.class_obj,
-            status='active',
-            school=request.user.school
-        ).select_related('section', 'user')
         
-        # Get all subjects for this exam from ExamSchedule
-        schedules = ExamSchedule.objects.filter(exam=exam).select_related('subject')
-        subjects = [s.subject for s in schedules]
+        return Response(build_result_sheet(exam, request.user.school))
+    
+    @action(detail=True, methods=['get'], url_path='consolidated_results/export')
+    def export_consolidated_results(self, request, pk=None):
+        """
+        Download the consolidated result sheet as CSV or XLSX
+        GET /api/v1/exams/{id}/consolidated_results/export/?file_format=xlsx
+        """
+        exam = self.get_object()
         
-        # Get all results for this exam
-        all_results = ExamResult.objects.filter(exam=exam, school=request.user.school)
+        if not exam.class_obj:
+            return Response({'error': 'This exam is not linked to a specific class'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Build marked map: {student_id: {subject_id: marks}}
-        result_map = {}
-        for res in all_results:
-            if res.student_id not in result_map:
-                result_map[res.student_id] = {}
-            result_map[res.student_id][res.subject_id] = {
-                'marks': res.marks_obtained,
-                'max': res.max_marks,
-                'grade': res.grade
-            }
-            
-        consolidated_data = []
-        for student in students:
-            student_marks = []
-            total_obtained = 0
-            total_max = 0
-            
-            for subject in subjects:
-                res = result_map.get(student.id, {}).get(subject.id)
-                if res:
-                    student_marks.append({
-                        'subject_id': subject.id,
-                        'subject_name': subject.name,
-                        'marks': res['marks'],
-                        'max': res['max'],
-                        'grade': res['grade']
-                    })
-                    total_obtained += res['marks']
-                    total_max += res['max']
-                else:
-                    student_marks.append({
-                        'subject_id': subject.id,
-                        'subject_name': subject.name,
-                        'marks': None,
-                        'max': None,
-                        'grade': 'N/A'
-                    })
-            
-            percentage = (total_obtained / total_max * 100) if total_max > 0 else 0
-            
-            consolidated_data.append({
-                'student_id': student.id,
-                'student_name': student.get_full_name(),
-                'admission_number': student.admission_number,
-                'section': student.section.name,
-                'marks': student_marks,
-                'total_obtained': total_obtained,
-                'total_max': total_max,
-                'percentage': round(percentage, 2)
-            })
-            
-        # Sort by total_obtained descending for ranking
-        consolidated_data.sort(key=lambda x: x['total_obtained'], reverse=True)
-        for i, entry in enumerate(consolidated_data):
-            entry['rank'] = i + 1
-            
-        return Response({
-            'exam_name': exam.name,
-            'class_name': exam.class_obj.name,
-            'subjects': [{'id': s.id, 'name': s.name} for s in subjects],
-            'results': consolidated_data
-        })
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in SHEET_EXPORT_FORMATS:
+            return Response(
+                {'error': f"file_format must be one of: {', '.join(SHEET_EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        sheet = build_result_sheet(exam, request.user.school)
+        content, content_type, extension = export_result_sheet(sheet, file_format)
+        
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="exam-{exam.id}-results.{extension}"'
+        return response
 
 
 @api_view(['POST'])
@@ -170,50 +132,20 @@ def enter_results_bulk(request):
     subject_id = data['subject_id']
     results = data['results']
     
-    created_count = 0
-    updated_count = 0
-    errors = []
-    
-    for record in results:
-        student_id = record['student_id']
-        marks_obtained = record['marks_obtained']
-        max_marks = record['max_marks']
-        remarks = record.get('remarks', '')
-        
-        try:
-            # Filter student by school
-            student = StudentProfile.objects.get(id=student_id, user__school=request.user.school)
-            
-            # Create or update result
-            result, created = ExamResult.objects.update_or_create(
-                exam_id=exam_id,
-                student=student,
-                subject_id=subject_id,
-                school=request.user.school,  # Set school explicitly
-                defaults={
-                    'marks_obtained': marks_obtained,
-                    'max_marks': max_marks,
-                    'remarks': remarks,
-                    'entered_by': request.user
-                }
-            )
-            
-            if created:
-                created_count += 1
-            else:
-                updated_count += 1
-                
-        except StudentProfile.DoesNotExist:
-            errors.append(f"Student with ID {student_id} not found")
-        except Exception as e:
-            errors.append(f"Error for student {student_id}: {str(e)}")
+    result = bulk_enter_results(
+        school=request.user.school,
+        user=request.user,
+        exam_id=exam_id,
+        subject_id=subject_id,
+        records=results
+    )
     
     return Response({
         'message': 'Results entered successfully',
-        'created': created_count,
-        'updated': updated_count,
-        'errors': errors
-    }, status=status.HTTP_201_CREATED if created_count > 0 else status.HTTP_200_OK)
+        'created': result['created'],
+        'updated': result['updated'],
+        'errors': result['errors']
+    }, status=status.HTTP_201_CREATED if result['created'] > 0 else status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -224,57 +156,79 @@ def student_report_card(request, exam_id, student_id):
     GET /api/v1/exams/{exam_id}/report-card/{student_id}/
     """
     try:
-        exam = Exam.objects.get(id=exam_id, school=request.user.school)
-        student = StudentProfile.objects.get(id=student_id, user__school=request.user.school)
-    except (Exam.DoesNotExist, StudentProfile.DoesNotExist) as e:
+        exam = Exam.objects.select_related('school').get(id=exam_id, school=request.user.school)
+    except Exam.DoesNotExist:
         return Response({'error': 'Exam or Student not found in your school'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Get all results for this student in this exam
-    results = ExamResult.objects.filter(exam=exam, student=student).select_related('subject')
+    report_card = get_report_cards(exam, [student_id]).get(student_id)
     
-    if not results.exists():
+    if report_card is None:
+        if not StudentProfile.objects.filter(id=student_id, school=request.user.school).exists():
+            return Response({'error': 'Exam or Student not found in your school'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'error': 'No results found for this student'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Calculate totals
-    total_marks = sum(r.max_marks for r in results)
-    marks_obtained = sum(r.marks_obtained for r in results)
-    percentage = (marks_obtained / total_marks * 100) if total_marks > 0 else 0
+    return Response(report_card)
+
+
+@api_view(['GET'])
+@permission_classes([IsActiveTeacher | IsAdmin])
+def class_report_cards(request, exam_id):
+    """
+    Get report cards for every active student of a class in one request
+    GET /api/v1/exams/{exam_id}/report-cards/?class_id=1&section_id=1
+    (class_id defaults to the exam's class)
+    """
+    try:
+        exam = Exam.objects.select_related('school').get(id=exam_id, school=request.user.school)
+    except Exam.DoesNotExist:
+        return Response({'error': 'Exam not found in your school'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Determine overall grade
-    if percentage >= 90:
-        overall_grade = 'A+'
-    elif percentage >= 80:
-        overall_grade = 'A'
-    elif percentage >= 70:
-        overall_grade = 'B+'
-    elif percentage >= 60:
-        overall_grade = 'B'
-    elif percentage >= 50:
-        overall_grade = 'C+'
-    elif percentage >= 40:
-        overall_grade = 'C'
-    elif percentage >= 33:
-        overall_grade = 'D'
-    else:
-        overall_grade = 'F'
+    try:
+        class_id = _id_param(request, 'class_id') or exam.class_obj_id
+        section_id = _id_param(request, 'section_id')
+    except ValueError:
+        return Response({'error': 'class_id and section_id must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not class_id:
+        return Response({'error': 'class_id is required for exams not linked to a class'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    students = StudentProfile.objects.filter(
+        school=request.user.school,
+        class_obj_id=class_id,
+        status='active'
+    )
+    if section_id:
+        students = students.filter(section_id=section_id)
+    student_ids = list(students.order_by('admission_number').values_list('id', flat=True))
     
-    report_data = {
+    report_cards = get_report_cards(exam, student_ids)
+    
+    return Response({
         'exam': ExamSerializer(exam).data,
-        'student': {
-            'id': student.id,
-            'admission_number': student.admission_number,
-            'name': student.get_full_name(),
-            'class': student.class_obj.name,
-            'section': student.section.name
-        },
-        'results': ExamResultSerializer(results, many=True).data,
-        'total_marks': total_marks,
-        'marks_obtained': marks_obtained,
-        'percentage': round(percentage, 2),
-        'overall_grade': overall_grade
-    }
+        'count': len(report_cards),
+        'missing_results': [student_id for student_id in student_ids if student_id not in report_cards],
+        'report_cards': [report_cards[student_id] for student_id in student_ids if student_id in report_cards]
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def generate_report_cards(request, exam_id):
+    """
+    (Re)build and store report cards for every student with results in an exam
+    POST /api/v1/exams/{exam_id}/report-cards/generate/
+    """
+    try:
+        exam = Exam.objects.select_related('school').get(id=exam_id, school=request.user.school)
+    except Exam.DoesNotExist:
+        return Response({'error': 'Exam not found in your school'}, status=status.HTTP_404_NOT_FOUND)
+    
+    report_cards = build_report_cards(exam)
     
-    return Response(report_data)
+    return Response({
+        'message': f'Generated {len(report_cards)} report cards',
+        'generated': len(report_cards)
+    })
 
 
 class ExamResultViewSet(viewsets.ModelViewSet):
@@ -333,8 +287,12 @@ class ExamResultViewSet(viewsets.ModelViewSet):
         serializer.save(entered_by=self.request.user)
 
 
-class ExamScheduleViewSet(viewsets.ModelViewSet):
-    """ViewSet for ExamSchedule management"""
+class ExamScheduleViewSet(ClaimsReadMixin, TenantMixin, viewsets.ModelViewSet):
+    """
+    ViewSet for ExamSchedule management
+    Reads authenticate from token claims (no user query).
+    Writes are limited to the user's school's exams and subjects.
+    """
     queryset = ExamSchedule.objects.select_related('exam', 'subject').all()
     serializer_class = ExamScheduleSerializer
     ordering = ['date', 'start_time']
@@ -345,8 +303,13 @@ class ExamScheduleViewSet(viewsets.ModelViewSet):
         return [IsAuthenticated()]
     
     def get_queryset(self):
+        user = self.request.user
         queryset = ExamSchedule.objects.select_related('exam', 'subject').all()
         
+        # Schedules have no school of their own; scope them through the exam
+        if not user.is_super_admin():
+            queryset = queryset.filter(exam__school_id=user.school_id)
+        
         # Filter by exam
         exam_id = self.request.query_params.get('exam_id')
         if exam_id:
@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from fees.services import run_invoice_job, runnable_invoice_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run pending background invoice generation jobs and resume stalled ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new jobs instead of exiting when the queue is empty',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds between polls in --loop mode',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            pending = list(
+                runnable_invoice_jobs()
+                .order_by('created_at')
+                .values_list('id', flat=True)
+            )
+
+            for job_id in pending:
+                self.stdout.write(f'Running invoice job #{job_id}...')
+                run_invoice_job(job_id)
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Invoice job queue drained'))
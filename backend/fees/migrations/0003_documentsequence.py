@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-17 05:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_school_created_by_alter_school_updated_by'),
+        ('fees', '0002_remove_feestructure_fee_structu_class_o_b9d694_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('invoice', 'Invoice'), ('receipt', 'Receipt')], max_length=20)),
+                ('academic_year', models.CharField(max_length=10)),
+                ('last_value', models.PositiveBigIntegerField(default=0, help_text='Last number handed out')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_sequences', to='accounts.school')),
+            ],
+            options={
+                'verbose_name': 'Document Sequence',
+                'verbose_name_plural': 'Document Sequences',
+                'db_table': 'document_sequences',
+                'unique_together': {('school', 'kind', 'academic_year')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.14 on 2026-10-17 05:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_school_created_by_alter_school_updated_by'),
+        ('fees', '0003_documentsequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceGenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Student selection: student_ids, class_id, section_id')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total', models.IntegerField(default=0, help_text='Eligible students at enqueue time')),
+                ('processed', models.IntegerField(default=0)),
+                ('created_count', models.IntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_created', to=settings.AUTH_USER_MODEL)),
+                ('fee_structure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generation_jobs', to='fees.feestructure')),
+                ('school', models.ForeignKey(blank=True, help_text='School this record belongs to', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_set', to='accounts.school')),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Invoice Generation Job',
+                'verbose_name_plural': 'Invoice Generation Jobs',
+                'db_table': 'invoice_generation_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['school', 'status'], name='invoice_gen_school__c2b7fa_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
 from django.core.validators import MinValueValidator
 from core.models import TenantAwareModel, TimeStampedModel
 from decimal import Decimal
@@ -122,6 +123,26 @@ class Invoice(TenantAwareModel):
         else:
             self.status = 'pending'
         self.save()
+    
+    @classmethod
+    def apply_payment_delta(cls, invoice_id, delta):
+        """
+        Adjust an invoice's balance by ``delta`` in a single UPDATE.
+        
+        paid_amount, remaining_amount and status are all computed by the
+        database from the row's current values, and the UPDATE locks the row,
+        so concurrent payments against the same invoice never lose an update.
+        """
+        paid = F('paid_amount') + delta
+        cls.objects.all_tenants().filter(pk=invoice_id).update(
+            paid_amount=paid,
+            remaining_amount=F('total_amount') - paid,
+            status=Case(
+                When(Q(total_amount__lte=paid), then=Value('paid')),
+                When(Q(paid_amount__gt=-delta), then=Value('partial')),
+                default=Value('pending'),
+            ),
+        )
 
 
 class Payment(TimeStampedModel):
@@ -168,8 +189,99 @@ class Payment(TimeStampedModel):
         return f"{self.receipt_number} - ₹{self.amount}"
     
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update invoice paid amount and status
-        self.invoice.paid_amount = sum(p.amount for p in self.invoice.payments.all())
-        self.invoice.remaining_amount = self.invoice.total_amount - self.invoice.paid_amount
-        self.invoice.update_status()
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                # Lock the stored payment so concurrent edits see each other's amounts
+                previous = Payment.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('invoice_id', 'amount').first()
+            
+            super().save(*args, **kwargs)
+            
+            # Bulk entry may pass the amount through as a string
+            amount = Decimal(str(self.amount))
+            
+            # Update invoice paid amount and status from the change in this payment only
+            if previous is None:
+                Invoice.apply_payment_delta(self.invoice_id, amount)
+            else:
+                previous_invoice_id, previous_amount = previous
+                if previous_invoice_id == self.invoice_id:
+                    if amount != previous_amount:
+                        Invoice.apply_payment_delta(self.invoice_id, amount - previous_amount)
+                else:
+                    Invoice.apply_payment_delta(previous_invoice_id, -previous_amount)
+                    Invoice.apply_payment_delta(self.invoice_id, amount)
+        
+        # Keep an already loaded invoice in sync with the row
+        if 'invoice' in self._state.fields_cache:
+            self.invoice.refresh_from_db(fields=['paid_amount', 'remaining_amount', 'status'])
+
+
+class DocumentSequence(TimeStampedModel):
+    """
+    Per-school, per-academic-year counter for invoice and receipt numbers.
+    Numbers are reserved in blocks via fees.services.reserve_numbers.
+    """
+    KIND_CHOICES = [
+        ('invoice', 'Invoice'),
+        ('receipt', 'Receipt'),
+    ]
+    
+    school = models.ForeignKey(
+        'accounts.School',
+        on_delete=models.CASCADE,
+        related_name='document_sequences'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    academic_year = models.CharField(max_length=10)
+    last_value = models.PositiveBigIntegerField(default=0, help_text="Last number handed out")
+    
+    class Meta:
+        db_table = 'document_sequences'
+        verbose_name = 'Document Sequence'
+        verbose_name_plural = 'Document Sequences'
+        unique_together = [('school', 'kind', 'academic_year')]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.academic_year} @ {self.last_value} - {self.school.name}"
+
+
+class InvoiceGenerationJob(TenantAwareModel):
+    """
+    Background invoice generation run for large student selections.
+    Progress is updated after every chunk so clients can poll it.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    fee_structure = models.ForeignKey(
+        FeeStructure,
+        on_delete=models.CASCADE,
+        related_name='generation_jobs'
+    )
+    params = models.JSONField(default=dict, blank=True, help_text="Student selection: student_ids, class_id, section_id")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total = models.IntegerField(default=0, help_text="Eligible students at enqueue time")
+    processed = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'invoice_generation_jobs'
+        verbose_name = 'Invoice Generation Job'
+        verbose_name_plural = 'Invoice Generation Jobs'
+        indexes = [
+            models.Index(fields=['school', 'status']),
+        ]
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Invoice job #{self.pk} ({self.get_status_display()}) - {self.school.name}"
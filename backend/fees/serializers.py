@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import FeeStructure, FeeItem, Invoice, Payment
+from .models import FeeStructure, FeeItem, Invoice, Payment, InvoiceGenerationJob
 from students.models import StudentProfile
 
 
@@ -56,6 +56,27 @@ class GenerateInvoicesSerializer(serializers.Serializer):
     student_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
     class_id = serializers.IntegerField(required=False)
     section_id = serializers.IntegerField(required=False)
+    run_async = serializers.BooleanField(required=False, default=False)
+
+
+class InvoiceGenerationJobSerializer(serializers.ModelSerializer):
+    """Serializer for background invoice generation progress"""
+    fee_structure_name = serializers.CharField(source='fee_structure.name', read_only=True)
+    progress = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = InvoiceGenerationJob
+        fields = [
+            'id', 'fee_structure', 'fee_structure_name', 'status', 'total',
+            'processed', 'created_count', 'progress', 'errors',
+            'started_at', 'finished_at', 'created_at'
+        ]
+        read_only_fields = fields
+    
+    def get_progress(self, obj):
+        if not obj.total:
+            return 100.0 if obj.status == 'completed' else 0.0
+        return round(obj.processed / obj.total * 100, 1)
 
 
 class PaymentSerializer(serializers.ModelSerializer):
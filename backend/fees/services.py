@@ -0,0 +1,317 @@
+"""
+Fee document numbering and batch operations.
+"""
+import logging
+import threading
+from datetime import timedelta
+from itertools import islice
+from django.conf import settings
+from django.db import IntegrityError, transaction, connections
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from core.tenant import tenant_context
+from students.models import StudentProfile
+from .models import DocumentSequence, Invoice, InvoiceGenerationJob
+
+logger = logging.getLogger(__name__)
+
+
+def _year_digits(academic_year):
+    return academic_year.replace('-', '')
+
+
+def format_invoice_number(academic_year, value):
+    """e.g. INV-202425-0001 (unique per school)"""
+    return f"INV-{_year_digits(academic_year)}-{value:04d}"
+
+
+def format_receipt_number(school, academic_year, value):
+    """e.g. RCP-ABC-202425-00001 (globally unique, so it carries the school code)"""
+    return f"RCP-{school.code}-{_year_digits(academic_year)}-{value:05d}"
+
+
+def _initial_value(school, kind, academic_year):
+    """
+    Highest number already issued before the counter existed.
+    Only runs once per (school, kind, academic_year).
+    """
+    if kind != 'invoice':
+        # Receipt numbers changed format along with the counter, nothing to resume from
+        return 0
+
+    prefix = f"INV-{_year_digits(academic_year)}-"
+    issued = Invoice.objects.all_tenants().filter(
+        school=school,
+        invoice_number__startswith=prefix
+    ).values_list('invoice_number', flat=True)
+
+    highest = 0
+    for number in issued:
+        suffix = number[len(prefix):]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def reserve_numbers(school, kind, academic_year, count=1):
+    """
+    Reserve a contiguous block of ``count`` numbers for a document kind.
+
+    The counter row is bumped with a single UPDATE ... SET last_value = last_value + count,
+    which takes a row lock only for the duration of the surrounding transaction.
+    Concurrent workers therefore never receive overlapping ranges.
+
+    Returns:
+        range of reserved integer values
+    """
+    if count < 1:
+        return range(0)
+
+    lookup = {'school': school, 'kind': kind, 'academic_year': academic_year}
+
+    with transaction.atomic():
+        bumped = DocumentSequence.objects.filter(**lookup).update(
+            last_value=F('last_value') + count
+        )
+
+        if not bumped:
+            try:
+                with transaction.atomic():
+                    DocumentSequence.objects.create(
+                        last_value=_initial_value(school, kind, academic_year) + count,
+                        **lookup
+                    )
+            except IntegrityError:
+                # Another worker created the counter first
+                DocumentSequence.objects.filter(**lookup).update(
+                    last_value=F('last_value') + count
+                )
+
+        last_value = DocumentSequence.objects.filter(**lookup).values_list('last_value', flat=True).get()
+
+    return range(last_value - count + 1, last_value + 1)
+
+
+def next_invoice_numbers(school, academic_year, count=1):
+    """Reserve ``count`` invoice numbers for a school and academic year"""
+    return [
+        format_invoice_number(academic_year, value)
+        for value in reserve_numbers(school, 'invoice', academic_year, count)
+    ]
+
+
+def next_receipt_numbers(school, academic_year, count=1):
+    """Reserve ``count`` receipt numbers for a school and academic year"""
+    return [
+        format_receipt_number(school, academic_year, value)
+        for value in reserve_numbers(school, 'receipt', academic_year, count)
+    ]
+
+
+def eligible_students(school, student_ids=None, class_id=None, section_id=None):
+    """
+    Active students of a school selected for invoicing.
+    Returns None when no selection criteria are given.
+    """
+    students = StudentProfile.objects.all_tenants().filter(status='active', user__school=school)
+    if student_ids:
+        return students.filter(id__in=student_ids)
+    if class_id and section_id:
+        return students.filter(class_obj_id=class_id, section_id=section_id)
+    if class_id:
+        return students.filter(class_obj_id=class_id)
+    return None
+
+
+def generate_invoices_batch(fee_structure, students, school, created_by, chunk_size=None, progress=None):
+    """
+    Create one invoice per student, a chunk at a time.
+
+    The due date is resolved once for the fee structure, students are streamed
+    from the database in chunks, and every chunk reserves its invoice numbers
+    in one call and is written with a single bulk_create.
+
+    Args:
+        fee_structure: FeeStructure being invoiced
+        students: StudentProfile queryset
+        school: School the invoices belong to
+        created_by: User recorded as creator
+        chunk_size: Students per chunk (defaults to settings.INVOICE_BATCH_SIZE)
+        progress: Optional callable(processed, created, errors) run after each chunk
+
+    Returns:
+        Dict with the created invoice numbers and per-chunk errors
+    """
+    chunk_size = chunk_size or settings.INVOICE_BATCH_SIZE
+    created = []
+    errors = []
+
+    # FeeItem default ordering is (installment, due_date)
+    due_date = fee_structure.fee_items.values_list('due_date', flat=True).first()
+    if due_date is None:
+        return {'invoices': created, 'errors': ['Fee structure has no fee items to take a due date from']}
+
+    rows = students.order_by('id').values_list('id', 'admission_number').iterator(chunk_size=chunk_size)
+    processed = 0
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        try:
+            with transaction.atomic():
+                numbers = next_invoice_numbers(school, fee_structure.academic_year, len(chunk))
+                Invoice.objects.bulk_create([
+                    Invoice(
+                        invoice_number=number,
+                        student_id=student_id,
+                        fee_structure=fee_structure,
+                        school=school,
+                        total_amount=fee_structure.total_amount,
+                        remaining_amount=fee_structure.total_amount,
+                        due_date=due_date,
+                        created_by=created_by,
+                    )
+                    for (student_id, _), number in zip(chunk, numbers)
+                ])
+            created.extend(numbers)
+        except Exception as e:
+            errors.append(
+                f"Error for students {chunk[0][1]}..{chunk[-1][1]}: {str(e)}"
+            )
+
+        processed += len(chunk)
+        if progress:
+            progress(processed, len(created), errors)
+
+    return {'invoices': created, 'errors': errors}
+
+
+def fee_reminder_recipients(school, chunk_size=None):
+    """
+    (email, context) pairs for every parent of a student with an unpaid invoice,
+    streamed in one query for send_bulk_templated_email('fee_reminder', ...).
+    """
+    rows = (
+        Invoice.objects.all_tenants()
+        .filter(school=school, status__in=['pending', 'partial', 'overdue'], remaining_amount__gt=0)
+        .values(
+            'invoice_number', 'remaining_amount', 'due_date',
+            'student__first_name', 'student__last_name',
+            parent_name=F('student__parents__name'),
+            parent_email=F('student__parents__email'),
+        )
+        .filter(parent_email__gt='')
+        .order_by('due_date', 'id')
+        .iterator(chunk_size=chunk_size or settings.EMAIL_BULK_CHUNK_SIZE)
+    )
+    for row in rows:
+        yield row['parent_email'], {
+            'school_name': school.name,
+            'parent_name': row['parent_name'],
+            'student_name': f"{row['student__first_name']} {row['student__last_name']}",
+            'invoice_number': row['invoice_number'],
+            'amount_due': row['remaining_amount'],
+            'due_date': row['due_date'],
+        }
+
+
+def enqueue_invoice_job(fee_structure, school, created_by, params, total):
+    """
+    Record a background invoice generation job.
+    The job starts in a worker thread once the current transaction commits,
+    unless settings.INVOICE_JOBS_RUN_IN_THREAD is off (then run
+    ``manage.py process_invoice_jobs``).
+    """
+    job = InvoiceGenerationJob.objects.create(
+        school=school,
+        fee_structure=fee_structure,
+        params=params,
+        total=total,
+        created_by=created_by,
+    )
+
+    if settings.INVOICE_JOBS_RUN_IN_THREAD:
+        transaction.on_commit(
+            lambda: threading.Thread(target=_run_invoice_job_in_thread, args=(job.pk,), daemon=True).start()
+        )
+
+    return job
+
+
+def _stale_job_cutoff():
+    return timezone.now() - timedelta(seconds=settings.INVOICE_JOB_CLAIM_TIMEOUT)
+
+
+def runnable_invoice_jobs():
+    """Pending jobs plus running ones whose worker stopped reporting progress"""
+    return InvoiceGenerationJob.objects.all_tenants().filter(
+        Q(status='pending') | Q(status='running', updated_at__lt=_stale_job_cutoff())
+    )
+
+
+def run_invoice_job(job_id):
+    """
+    Claim and run a pending invoice generation job.
+    Safe to call from several workers: only the one that flips the job
+    from pending to running processes it.
+
+    A running job refreshes updated_at after every chunk. One that hasn't for
+    INVOICE_JOB_CLAIM_TIMEOUT seconds (its worker died) is claimed again and
+    resumed, skipping students it already invoiced.
+    """
+    jobs = InvoiceGenerationJob.objects.all_tenants()
+
+    now = timezone.now()
+    resumed = False
+    claimed = jobs.filter(pk=job_id, status='pending').update(
+        status='running', started_at=now, updated_at=now
+    )
+    if not claimed:
+        claimed = jobs.filter(pk=job_id, status='running', updated_at__lt=_stale_job_cutoff()).update(
+            started_at=now, updated_at=now
+        )
+        resumed = True
+    if not claimed:
+        return
+
+    job = jobs.select_related('school', 'fee_structure', 'created_by').get(pk=job_id)
+    done = 0
+
+    def progress(processed, created, errors):
+        jobs.filter(pk=job_id).update(
+            processed=done + processed, created_count=done + created, errors=errors, updated_at=timezone.now()
+        )
+
+    try:
+        with tenant_context(job.school):
+            students = eligible_students(job.school, **job.params)
+            if resumed:
+                invoiced = Invoice.objects.all_tenants().filter(
+                    student=OuterRef('pk'), fee_structure=job.fee_structure, created_at__gte=job.created_at
+                )
+                done = students.filter(Exists(invoiced)).count()
+                students = students.exclude(Exists(invoiced))
+            result = generate_invoices_batch(
+                job.fee_structure, students, job.school, job.created_by, progress=progress
+            )
+    except Exception as e:
+        logger.exception(f"Invoice job {job_id} failed")
+        jobs.filter(pk=job_id).update(status='failed', errors=[str(e)], finished_at=timezone.now())
+        return
+
+    jobs.filter(pk=job_id).update(
+        status='completed',
+        created_count=done + len(result['invoices']),
+        errors=result['errors'],
+        finished_at=timezone.now(),
+    )
+
+
+def _run_invoice_job_in_thread(job_id):
+    try:
+        run_invoice_job(job_id)
+    finally:
+        # The thread owns its database connection; don't leak it
+        connections.close_all()
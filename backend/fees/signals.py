@@ -0,0 +1,15 @@
+"""
+Take a deleted payment's amount back off its invoice. Payment.save() applies
+its own changes; this covers single deletes, QuerySet.delete() and the admin.
+"""
+from decimal import Decimal
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import Invoice, Payment
+
+
+@receiver(post_delete, sender=Payment)
+def reverse_deleted_payment(sender, instance, **kwargs):
+    with transaction.atomic():
+        Invoice.apply_payment_delta(instance.invoice_id, -Decimal(str(instance.amount)))
@@ -1,3 +1,227 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from core.benchmarking import seed_school, seed_students
+from core.testing import api_client
+from .models import FeeItem, FeeStructure, Invoice, InvoiceGenerationJob, Payment
+from .services import (
+    next_invoice_numbers, next_receipt_numbers, reserve_numbers, run_invoice_job, runnable_invoice_jobs
+)
 
-# Create your tests here.
+
+ACADEMIC_YEAR = '2025-26'
+
+
+def seed_fee_structure(school, class_obj, amount=Decimal('1500.00')):
+    structure = FeeStructure.objects.create(
+        school=school, name='Annual Fee', academic_year=ACADEMIC_YEAR, class_obj=class_obj, total_amount=amount
+    )
+    FeeItem.objects.create(fee_structure=structure, name='Tuition', amount=amount, due_date=date(2025, 7, 1))
+    return structure
+
+
+def seed_enrolled_students(school, class_obj, section, count):
+    """Students with login accounts (invoicing selects students by their user's school)"""
+    students = seed_students(school, class_obj, section, count)
+    for student in students:
+        student.user = User.objects.create_user(
+            username=f'{student.admission_number.lower()}', email='', password=None, role='student', school=school
+        )
+        student.save(update_fields=['user'])
+    return students
+
+
+class DocumentNumberTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, section = seed_school('NUMBERS')
+        cls.other_school = seed_school('NUMBERSB')[0]
+        cls.structure = seed_fee_structure(cls.school, cls.class_obj)
+        cls.student = seed_students(cls.school, cls.class_obj, section, 1)[0]
+
+    def test_blocks_are_contiguous_and_never_overlap(self):
+        first = reserve_numbers(self.school, 'invoice', ACADEMIC_YEAR, 3)
+        second = reserve_numbers(self.school, 'invoice', ACADEMIC_YEAR, 2)
+
+        self.assertEqual((list(first), list(second)), ([1, 2, 3], [4, 5]))
+        self.assertEqual(list(reserve_numbers(self.school, 'invoice', ACADEMIC_YEAR, 0)), [])
+
+    def test_counters_are_per_school_kind_and_year(self):
+        reserve_numbers(self.school, 'invoice', ACADEMIC_YEAR, 5)
+
+        self.assertEqual(list(reserve_numbers(self.school, 'receipt', ACADEMIC_YEAR)), [1])
+        self.assertEqual(list(reserve_numbers(self.school, 'invoice', '2026-27')), [1])
+        self.assertEqual(list(reserve_numbers(self.other_school, 'invoice', ACADEMIC_YEAR)), [1])
+
+    def test_counter_resumes_after_existing_invoice_numbers(self):
+        Invoice.objects.create(
+            invoice_number='INV-202526-0041', student=self.student, fee_structure=self.structure, school=self.school,
+            total_amount=Decimal('1500.00'), remaining_amount=Decimal('1500.00'), due_date=date(2025, 7, 1),
+            created_by=self.admin,
+        )
+
+        self.assertEqual(next_invoice_numbers(self.school, ACADEMIC_YEAR, 2), ['INV-202526-0042', 'INV-202526-0043'])
+        self.assertEqual(next_receipt_numbers(self.school, ACADEMIC_YEAR), ['RCP-NUMBERS-202526-00001'])
+
+
+class PaymentBalanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, section = seed_school('PAYMENTS')
+        cls.structure = seed_fee_structure(cls.school, cls.class_obj, amount=Decimal('1000.00'))
+        cls.student = seed_students(cls.school, cls.class_obj, section, 1)[0]
+
+    def setUp(self):
+        self.invoice = self.create_invoice()
+        self.receipts = iter(range(1, 100))
+
+    def create_invoice(self):
+        return Invoice.objects.create(
+            invoice_number=next_invoice_numbers(self.school, ACADEMIC_YEAR)[0], student=self.student,
+            fee_structure=self.structure, school=self.school, total_amount=Decimal('1000.00'),
+            remaining_amount=Decimal('1000.00'), due_date=date(2025, 7, 1), created_by=self.admin,
+        )
+
+    def pay(self, amount, invoice=None):
+        return Payment.objects.create(
+            invoice=invoice or self.invoice, receipt_number=f'RCP-{self.invoice.pk}-{next(self.receipts)}',
+            amount=amount, payment_date=date(2025, 7, 1), payment_mode='cash', created_by=self.admin,
+        )
+
+    def balance(self, invoice=None):
+        invoice = Invoice.objects.all_tenants().get(pk=(invoice or self.invoice).pk)
+        return invoice.paid_amount, invoice.remaining_amount, invoice.status
+
+    def test_payments_move_invoice_to_partial_then_paid(self):
+        self.pay(Decimal('400.00'))
+        self.assertEqual(self.balance(), (Decimal('400.00'), Decimal('600.00'), 'partial'))
+
+        # Bulk entry passes amounts through as strings
+        self.pay('600.00')
+        self.assertEqual(self.balance(), (Decimal('1000.00'), Decimal('0.00'), 'paid'))
+
+    def test_editing_a_payment_applies_only_the_difference(self):
+        payment = self.pay(Decimal('700.00'))
+        self.pay(Decimal('100.00'))
+
+        payment.amount = Decimal('900.00')
+        payment.save()
+        self.assertEqual(self.balance(), (Decimal('1000.00'), Decimal('0.00'), 'paid'))
+
+        payment.amount = Decimal('200.00')
+        payment.save()
+        self.assertEqual(self.balance(), (Decimal('300.00'), Decimal('700.00'), 'partial'))
+
+    def test_repointing_a_payment_moves_its_amount(self):
+        other = self.create_invoice()
+        payment = self.pay(Decimal('250.00'))
+
+        payment.invoice = other
+        payment.save()
+
+        self.assertEqual(self.balance(), (Decimal('0.00'), Decimal('1000.00'), 'pending'))
+        self.assertEqual(self.balance(other), (Decimal('250.00'), Decimal('750.00'), 'partial'))
+        # The loaded invoice is refreshed from the row
+        self.assertEqual(payment.invoice.paid_amount, Decimal('250.00'))
+
+    def test_deleting_payments_restores_the_balance(self):
+        kept = self.pay(Decimal('400.00'))
+        self.pay(Decimal('600.00'))
+        self.assertEqual(self.balance()[2], 'paid')
+
+        Payment.objects.filter(invoice=self.invoice, amount=Decimal('600.00')).delete()
+        self.assertEqual(self.balance(), (Decimal('400.00'), Decimal('600.00'), 'partial'))
+
+        kept.delete()
+        self.assertEqual(self.balance(), (Decimal('0.00'), Decimal('1000.00'), 'pending'))
+
+    def test_only_admins_delete_payments(self):
+        payment = self.pay(Decimal('400.00'))
+        teacher = User.objects.create_user(
+            username='payments_teacher', email='', password=None, role='teacher', school=self.school
+        )
+        url = reverse('payment-detail', args=[payment.pk])
+
+        self.assertEqual(api_client(teacher).delete(url).status_code, 403)
+        self.assertEqual(api_client(self.admin).delete(url).status_code, 204)
+        self.assertEqual(self.balance(), (Decimal('0.00'), Decimal('1000.00'), 'pending'))
+
+    def test_query_count_does_not_grow_with_payment_history(self):
+        counts = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as ctx:
+                self.pay(Decimal('10.00'))
+            counts.append(len(ctx.captured_queries))
+            for _ in range(5):
+                self.pay(Decimal('10.00'))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.balance()[0], Decimal('120.00'))
+
+
+@override_settings(INVOICE_JOB_CLAIM_TIMEOUT=60)
+class InvoiceJobReclaimTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school, cls.admin, cls.class_obj, section = seed_school('FEEJOBS')
+        cls.structure = seed_fee_structure(cls.school, cls.class_obj)
+        cls.students = seed_enrolled_students(cls.school, cls.class_obj, section, 3)
+
+    def create_job(self, status, idle_seconds):
+        job = InvoiceGenerationJob.objects.create(
+            school=self.school, fee_structure=self.structure, params={'class_id': self.class_obj.id},
+            total=len(self.students), created_by=self.admin, status=status,
+        )
+        InvoiceGenerationJob.objects.all_tenants().filter(pk=job.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=idle_seconds)
+        )
+        return job
+
+    def invoices(self):
+        return Invoice.objects.all_tenants().filter(fee_structure=self.structure)
+
+    def test_stalled_job_is_resumed_without_duplicates(self):
+        job = self.create_job('running', idle_seconds=120)
+        # The dead worker got as far as the first student
+        Invoice.objects.create(
+            invoice_number=next_invoice_numbers(self.school, ACADEMIC_YEAR)[0], student=self.students[0],
+            fee_structure=self.structure, school=self.school, total_amount=Decimal('1500.00'),
+            remaining_amount=Decimal('1500.00'), due_date=date(2025, 7, 1), created_by=self.admin,
+        )
+        self.assertIn(job.pk, runnable_invoice_jobs().values_list('pk', flat=True))
+
+        run_invoice_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.processed, job.created_count), (3, 3))
+        self.assertEqual(
+            sorted(self.invoices().values_list('student_id', flat=True)), [s.id for s in self.students]
+        )
+
+    def test_job_reporting_progress_is_not_reclaimed(self):
+        job = self.create_job('running', idle_seconds=10)
+
+        self.assertNotIn(job.pk, runnable_invoice_jobs().values_list('pk', flat=True))
+        run_invoice_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+        self.assertFalse(self.invoices().exists())
+
+    def test_pending_job_runs(self):
+        job = self.create_job('pending', idle_seconds=0)
+
+        run_invoice_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created_count), ('completed', 3))
+        self.assertEqual(self.invoices().count(), 3)
@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import FeeStructureViewSet, InvoiceViewSet, PaymentViewSet, generate_invoices
+from .views import (
+    FeeStructureViewSet, InvoiceViewSet, PaymentViewSet, generate_invoices,
+    invoice_generation_job_status
+)
 
 router = DefaultRouter()
 router.register(r'fees/structures', FeeStructureViewSet, basename='feestructure')
@@ -9,5 +12,6 @@ router.register(r'fees/payments', PaymentViewSet, basename='payment')
 
 urlpatterns = [
     path('fees/invoices/generate/', generate_invoices, name='generate-invoices'),
+    path('fees/invoices/generate/jobs/<int:job_id>/', invoice_generation_job_status, name='invoice-generation-job'),
     path('', include(router.urls)),
 ]
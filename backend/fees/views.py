@@ -4,17 +4,22 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from accounts.permissions import IsAdmin
 from django.db.models import Sum
-from .models import FeeStructure, Invoice, Payment
+from django.conf import settings
+from .models import FeeStructure, Invoice, Payment, InvoiceGenerationJob
 from students.models import StudentProfile, ParentProfile
 from rest_framework.decorators import action
 from .serializers import (
-    FeeStructureSerializer, InvoiceSerializer, PaymentSerializer, GenerateInvoicesSerializer
+    FeeStructureSerializer, InvoiceSerializer, PaymentSerializer, GenerateInvoicesSerializer,
+    InvoiceGenerationJobSerializer
+)
+from .services import (
+    next_receipt_numbers, eligible_students, generate_invoices_batch, enqueue_invoice_job
 )
 
 
 class FeeStructureViewSet(viewsets.ModelViewSet):
     """ViewSet for FeeStructure management"""
-    queryset = FeeStructure.objects.prefetch_related('fee_items').all()
+    queryset = FeeStructure.objects.select_related('class_obj').prefetch_related('fee_items').all()
     serializer_class = FeeStructureSerializer
     ordering = ['-created_at']
     
@@ -25,7 +30,7 @@ class FeeStructureViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
-        queryset = FeeStructure.objects.prefetch_related('fee_items').all()
+        queryset = FeeStructure.objects.select_related('class_obj').prefetch_related('fee_items').all()
         
         # Super admin sees all fee structures
         if user.is_super_admin():
@@ -76,53 +81,47 @@ def generate_invoices(request):
         return Response({'error': 'Fee structure not found in your school'}, status=status.HTTP_404_NOT_FOUND)
     
     # Get students list (filtered by school)
-    if student_ids:
-        students = StudentProfile.objects.filter(id__in=student_ids, status='active', user__school=request.user.school)
-    elif class_id and section_id:
-        students = StudentProfile.objects.filter(
-            class_obj_id=class_id,
-            section_id=section_id,
-            status='active',
-            user__school=request.user.school
-        )
-    elif class_id:
-        students = StudentProfile.objects.filter(class_obj_id=class_id, status='active', user__school=request.user.school)
-    else:
+    params = {'student_ids': student_ids, 'class_id': class_id, 'section_id': section_id}
+    students = eligible_students(request.user.school, **params)
+    if students is None:
         return Response(
             {'error': 'Provide either student_ids or class_id/section_id'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    created_invoices = []
-    errors = []
+    # Large runs are handed to a background job so the request returns immediately
+    total = students.count()
+    if data.get('run_async') or total > settings.INVOICE_ASYNC_THRESHOLD:
+        job = enqueue_invoice_job(fee_structure, request.user.school, request.user, params, total)
+        return Response({
+            'message': f'Invoice generation queued for {total} students',
+            'job': InvoiceGenerationJobSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED)
     
-    for student in students:
-        try:
-            # Generate invoice number
-            invoice_count = Invoice.objects.count() + 1
-            invoice_number = f"INV-{fee_structure.academic_year.replace('-', '')}-{invoice_count:04d}"
-            
-            invoice = Invoice.objects.create(
-                invoice_number=invoice_number,
-                student=student,
-                fee_structure=fee_structure,
-                school=request.user.school,  # Set school explicitly
-                total_amount=fee_structure.total_amount,
-                remaining_amount=fee_structure.total_amount,
-                due_date=fee_structure.fee_items.first().due_date if fee_structure.fee_items.exists() else None,
-                created_by=request.user
-            )
-            created_invoices.append(invoice_number)
-        except Exception as e:
-            errors.append(f"Error for student {student.admission_number}: {str(e)}")
+    result = generate_invoices_batch(fee_structure, students, request.user.school, request.user)
     
     return Response({
-        'message': f'Generated {len(created_invoices)} invoices',
-        'invoices': created_invoices,
-        'errors': errors
+        'message': f"Generated {len(result['invoices'])} invoices",
+        'invoices': result['invoices'],
+        'errors': result['errors']
     }, status=status.HTTP_201_CREATED)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def invoice_generation_job_status(request, job_id):
+    """
+    Poll the progress of a background invoice generation job
+    GET /api/v1/fees/invoices/generate/jobs/{id}/
+    """
+    try:
+        job = InvoiceGenerationJob.objects.all_tenants().get(id=job_id, school=request.user.school)
+    except InvoiceGenerationJob.DoesNotExist:
+        return Response({'error': 'Job not found in your school'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(InvoiceGenerationJobSerializer(job).data)
+
+
 class InvoiceViewSet(viewsets.ModelViewSet):
     """ViewSet for Invoice management"""
     queryset = Invoice.objects.select_related('student', 'fee_structure').all()
@@ -169,7 +168,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
     ordering = ['-payment_date']
     
     def get_permissions(self):
-        if self.action in ['create']:
+        if self.action in ['create', 'destroy']:
             return [IsAdmin()]
         return [IsAuthenticated()]
     
@@ -219,8 +218,31 @@ class PaymentViewSet(viewsets.ModelViewSet):
         from django.db import transaction
         from datetime import date
         
+        def as_id(value):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+        
+        school = request.user.school
+        invoices = Invoice.objects.select_related('fee_structure').filter(
+            school=school
+        ).in_bulk([as_id(item.get('invoice_id')) for item in payments_data])
+        
         try:
             with transaction.atomic():
+                # Reserve one block of receipt numbers per academic year
+                needed = {}
+                for pay_item in payments_data:
+                    invoice = invoices.get(as_id(pay_item.get('invoice_id')))
+                    if invoice:
+                        year = invoice.fee_structure.academic_year
+                        needed[year] = needed.get(year, 0) + 1
+                receipt_numbers = {
+                    year: iter(next_receipt_numbers(school, year, count))
+                    for year, count in needed.items()
+                }
+                
                 for pay_item in payments_data:
                     invoice_id = pay_item.get('invoice_id')
                     amount = pay_item.get('amount')
@@ -228,11 +250,11 @@ class PaymentViewSet(viewsets.ModelViewSet):
                     payment_mode = pay_item.get('payment_mode', 'cash')
                     
                     try:
-                        invoice = Invoice.objects.get(id=invoice_id, school=request.user.school)
+                        invoice = invoices.get(as_id(invoice_id))
+                        if invoice is None:
+                            raise Invoice.DoesNotExist
                         
-                        # Generate receipt number
-                        payment_count = Payment.objects.count() + 1
-                        receipt_number = f"RCP-2026-{payment_count:05d}"
+                        receipt_number = next(receipt_numbers[invoice.fee_structure.academic_year])
                         
                         payment = Payment.objects.create(
                             invoice=invoice,
@@ -255,7 +277,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_201_CREATED)
     
     def perform_create(self, serializer):
-        # Generate receipt number
-        payment_count = Payment.objects.count() + 1
-        receipt_number = f"RCP-2026-{payment_count:05d}"
+        invoice = serializer.validated_data['invoice']
+        receipt_number = next_receipt_numbers(
+            invoice.school, invoice.fee_structure.academic_year
+        )[0]
         serializer.save(receipt_number=receipt_number, created_by=self.request.user)
@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.RequestMetricsMiddleware",  # Per-request query/latency metrics (/metrics/)
     "corsheaders.middleware.CorsMiddleware",  # CORS middleware
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -112,9 +113,23 @@ else:
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
+# EmailBackend extends ModelBackend and already matches usernames, so a
+# second ModelBackend entry would only repeat the lookup and password hash
+# on every failed login
 AUTHENTICATION_BACKENDS = [
     'accounts.backends.EmailBackend',
-    'django.contrib.auth.backends.ModelBackend',
+]
+
+# PBKDF2 iterations for new password hashes (0 = Django's default).
+# Existing hashes stay valid and are re-hashed on the user's next login.
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 0))
+
+PASSWORD_HASHERS = [
+    'accounts.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
 ]
 
 # Password validation
@@ -155,6 +170,34 @@ else:
 
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@campusiq.com')
 
+# Outgoing email goes through the database outbox (core.services.email_outbox),
+# delivered by `manage.py drain_email_outbox --loop`. Failed sends are retried
+# with exponential backoff (base * 2^(attempt-1), capped) up to MAX_ATTEMPTS.
+EMAIL_USE_OUTBOX = os.getenv('EMAIL_USE_OUTBOX', 'True') == 'True'
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 100))
+EMAIL_OUTBOX_MESSAGES_PER_CONNECTION = int(os.getenv('EMAIL_OUTBOX_MESSAGES_PER_CONNECTION', 50))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 6))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30))
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = int(os.getenv('EMAIL_OUTBOX_RETRY_MAX_SECONDS', 3600))
+# A message left "sending" this long (worker died mid-send) is sent again
+EMAIL_OUTBOX_CLAIM_TIMEOUT = int(os.getenv('EMAIL_OUTBOX_CLAIM_TIMEOUT', 300))
+# Messages per send_messages() call in send_bulk_templated_email
+EMAIL_BULK_CHUNK_SIZE = int(os.getenv('EMAIL_BULK_CHUNK_SIZE', 100))
+
+# Web Push (core.services.push): new events are pushed to their audience
+# from a background thread. Payload encryption and VAPID signing need the
+# optional pywebpush package and a VAPID key pair.
+PUSH_NOTIFICATIONS_ENABLED = os.getenv('PUSH_NOTIFICATIONS_ENABLED', 'True') == 'True'
+PUSH_MAX_WORKERS = int(os.getenv('PUSH_MAX_WORKERS', 16))
+PUSH_TIMEOUT_SECONDS = int(os.getenv('PUSH_TIMEOUT_SECONDS', 10))
+PUSH_MAX_ATTEMPTS = int(os.getenv('PUSH_MAX_ATTEMPTS', 3))
+PUSH_RETRY_BASE_SECONDS = float(os.getenv('PUSH_RETRY_BASE_SECONDS', 1))
+PUSH_RETRY_MAX_SECONDS = float(os.getenv('PUSH_RETRY_MAX_SECONDS', 30))
+# How long the push service keeps an undelivered message (device offline)
+PUSH_TTL_SECONDS = int(os.getenv('PUSH_TTL_SECONDS', 86400))
+WEBPUSH_VAPID_PRIVATE_KEY = os.getenv('WEBPUSH_VAPID_PRIVATE_KEY', '')
+WEBPUSH_VAPID_SUBJECT = os.getenv('WEBPUSH_VAPID_SUBJECT', 'mailto:noreply@campusiq.com')
+
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / os.getenv('STATIC_ROOT', 'staticfiles')
@@ -169,7 +212,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.TenantJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -204,8 +247,65 @@ SIMPLE_JWT = {
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    # Re-reads role/school claims on refresh (see core.authentication)
+    'TOKEN_REFRESH_SERIALIZER': 'core.authentication.TenantTokenRefreshSerializer',
 }
 
+# Fee invoice generation
+INVOICE_BATCH_SIZE = int(os.getenv('INVOICE_BATCH_SIZE', 500))
+# Selections larger than this run as a background job
+INVOICE_ASYNC_THRESHOLD = int(os.getenv('INVOICE_ASYNC_THRESHOLD', 500))
+# Start background jobs in a thread of the web worker; disable to use `manage.py process_invoice_jobs`
+INVOICE_JOBS_RUN_IN_THREAD = os.getenv('INVOICE_JOBS_RUN_IN_THREAD', 'True') == 'True'
+# A running job that reported no progress this long (worker died) is resumed by process_invoice_jobs
+INVOICE_JOB_CLAIM_TIMEOUT = int(os.getenv('INVOICE_JOB_CLAIM_TIMEOUT', 600))
+
+# Timetable generator
+TIMETABLE_WORKING_DAYS = [int(d) for d in os.getenv('TIMETABLE_WORKING_DAYS', '1,2,3,4,5,6').split(',') if d.strip()]
+# Seconds the solver may search before returning its best partial timetable
+TIMETABLE_GENERATOR_TIME_BUDGET = float(os.getenv('TIMETABLE_GENERATOR_TIME_BUDGET', 10))
+# Largest time_budget the generate endpoint accepts; it runs in the request, so keep it under the worker timeout
+TIMETABLE_GENERATOR_MAX_TIME_BUDGET = float(os.getenv('TIMETABLE_GENERATOR_MAX_TIME_BUDGET', 20))
+
+# Cache Configuration
+# Shared Redis cache in production (REDIS_URL), per-process memory cache otherwise
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'campusiq',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'campusiq',
+        }
+    }
+
+# Dashboard statistics are cached per school for this many seconds (writes invalidate earlier)
+DASHBOARD_STATS_CACHE_TTL = int(os.getenv('DASHBOARD_STATS_CACHE_TTL', 300))
+
+# Request tenants (schools) are cached for this many seconds (school writes invalidate earlier)
+TENANT_SCHOOL_CACHE_TTL = int(os.getenv('TENANT_SCHOOL_CACHE_TTL', 60))
+
+# Request metrics (core.instrumentation), served in Prometheus format at /metrics/.
+# Each worker flushes its totals to the cache this often (seconds); set
+# METRICS_TOKEN to require "Authorization: Bearer <token>" (required outside DEBUG).
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'True') == 'True'
+REQUEST_METRICS_FLUSH_INTERVAL = int(os.getenv('REQUEST_METRICS_FLUSH_INTERVAL', 15))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Slow-request log (logger "core.slow_requests"), off when both thresholds are 0.
+# Logs requests slower than the time or query threshold with their query
+# fingerprints repeated at least SLOW_REQUEST_REPEATED_QUERY_MIN times (N+1s).
+SLOW_REQUEST_THRESHOLD_MS = int(os.getenv('SLOW_REQUEST_THRESHOLD_MS', 0))
+SLOW_REQUEST_QUERY_THRESHOLD = int(os.getenv('SLOW_REQUEST_QUERY_THRESHOLD', 0))
+SLOW_REQUEST_REPEATED_QUERY_MIN = int(os.getenv('SLOW_REQUEST_REPEATED_QUERY_MIN', 3))
+
 # CORS Configuration
 if DEBUG:
     CORS_ALLOW_ALL_ORIGINS = True
@@ -317,6 +417,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'core.slow_requests': {
+            'handlers': ['console', 'file'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
     'root': {
         'level': 'INFO',
@@ -6,7 +6,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
-from core.health import health_check
+from core.health import health_check, metrics
 
 urlpatterns = [
     # Admin
@@ -14,6 +14,7 @@ urlpatterns = [
     
     # Health check
     path("health/", health_check, name="health-check"),
+    path("metrics/", metrics, name="metrics"),
     
     # API v1
     path("api/v1/", include("accounts.urls")),
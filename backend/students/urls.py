@@ -3,8 +3,9 @@ from rest_framework.routers import DefaultRouter
 from .views import StudentViewSet, AdmissionFormConfigViewSet
 
 router = DefaultRouter()
-router.register(r'students', StudentViewSet, basename='student')
+# More specific prefixes first, or students/<pk>/ would swallow them
 router.register(r'students/admission-form-config', AdmissionFormConfigViewSet, basename='admission-form-config')
+router.register(r'students', StudentViewSet, basename='student')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,3 +1,5 @@
+from core.authentication import ClaimsReadMixin
+from core.conditional import ConditionalGetMixin
 from core.views import TenantMixin
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
@@ -11,12 +13,14 @@ from .serializers import (
 )
 
 
-class AdmissionFormConfigViewSet(TenantMixin, viewsets.ModelViewSet):
+class AdmissionFormConfigViewSet(ConditionalGetMixin, ClaimsReadMixin, TenantMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing admission form configuration.
     Allows school admins to customize which fields are visible/required.
+    Reads authenticate from token claims and answer conditional GETs with 304.
     """
     queryset = AdmissionFormConfig.objects.all()
+    version_models = [AdmissionFormConfig]
     serializer_class = AdmissionFormConfigSerializer
     permission_classes = [IsAdmin]
     
@@ -61,6 +65,9 @@ class AdmissionFormConfigViewSet(TenantMixin, viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='by-section')
     def by_section(self, request):
         """Get form configuration grouped by section"""
+        return self.conditional_response(request, self._by_section)
+    
+    def _by_section(self, request):
         configs = self.get_queryset()
         
         # Group by section